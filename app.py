@@ -1,23 +1,25 @@
 import streamlit as st
 import pandas as pd
-import sys, os
-import itertools
+import sys, os, json
 
 # Add parent directory to import local modules
 sys.path.append(os.path.abspath(".."))
 
 # Custom imports
 import ec2_sp_backend
+import exporters
+import metrics
+import result_pages
 from ec2_pricing_data_fetch import (
     get_all_instance_types,
     get_all_regions,
     load_dynamic_filter_options,
     load_family_options,
-    fetch_pricing,
+    fetch_pricing_regions,
 )
 
 # --- Constants ---
-PAGE_SIZE = 20
+EXPORT_LABELS = {"csv": "CSV", "parquet": "Parquet", "xlsx": "Excel (sheet per region)"}
 st.set_page_config(page_title="AWS EC2 Pricing Tool", layout="wide")
 st.title("💸 AWS EC2 Pricing Tool")
 
@@ -32,6 +34,7 @@ mode = st.radio(
 
 
 # --- Cache Static Data ---
+# Loaded where a section first needs it, not at import: the catalog may have to be built first
 @st.cache_data
 def get_instance_types():
     return get_all_instance_types()
@@ -40,12 +43,98 @@ def get_instance_types():
 # def get_regions():
 #     return get_all_regions()
 
-instance_types = get_instance_types()
 # all_regions = get_regions()
 
+def export_buttons(frames, file_stem, key):
+    # `data` is a callable, so a file is only generated when its button is clicked: chunk by chunk
+    # into a temporary file that Streamlit reads once. `frames` returns the chunks to write
+    for col, fmt in zip(st.columns(len(EXPORT_LABELS)), EXPORT_LABELS):
+        col.download_button(
+            label=f"📥 Download {EXPORT_LABELS[fmt]}",
+            data=lambda fmt=fmt: exporters.export_frames(frames(), fmt),
+            file_name=f"{file_stem}.{fmt}",
+            mime=exporters.MIME_TYPES[fmt],
+            key=f"{key}_{fmt}",
+        )
+
+def store_result(state_key, df):
+    # Only a cursor is kept in the session; the rows live in a result file on disk
+    if st.session_state.get(state_key):
+        result_pages.delete_result(st.session_state[state_key])
+    st.session_state[state_key] = result_pages.save_result(df)
+
+def show_paged_result(state_key, file_stem):
+    """Sort / filter controls, one page of rows and downloads for the result behind a cursor."""
+    cursor = st.session_state[state_key]
+    before = (cursor["sort_by"], cursor["ascending"], dict(cursor["filters"]))
+
+    c1, c2, c3, c4 = st.columns([3, 1, 3, 5])
+    sort_options = ["(as fetched)"] + cursor["columns"]
+    sort_by = c1.selectbox("Sort by", sort_options, key=f"{state_key}_sort")
+    cursor["sort_by"] = None if sort_by == sort_options[0] else sort_by
+    cursor["ascending"] = not c2.checkbox("Descending", key=f"{state_key}_desc")
+    filter_col = c3.selectbox("Filter column", ["(none)"] + cursor["columns"], key=f"{state_key}_fcol")
+    if filter_col in cursor["numeric_columns"]:
+        low, high = cursor["filters"].get(filter_col, (None, None))
+        lo_col, hi_col = c4.columns(2)
+        low = lo_col.number_input("Min", value=low, key=f"{state_key}_min_{filter_col}")
+        high = hi_col.number_input("Max", value=high, key=f"{state_key}_max_{filter_col}")
+        if low is None and high is None:
+            cursor["filters"].pop(filter_col, None)
+        else:
+            cursor["filters"][filter_col] = (low if low is not None else float("-inf"),
+                                             high if high is not None else float("inf"))
+    elif filter_col != "(none)":
+        values = c4.multiselect("Values", result_pages.distinct_values(cursor, filter_col),
+                                default=cursor["filters"].get(filter_col, []), key=f"{state_key}_in_{filter_col}")
+        if values:
+            cursor["filters"][filter_col] = values
+        else:
+            cursor["filters"].pop(filter_col, None)
+    if (cursor["sort_by"], cursor["ascending"], cursor["filters"]) != before:
+        cursor["page"] = 1
+
+    total, pages = result_pages.matching_rows(cursor), result_pages.page_count(cursor)
+    n1, n2, n3, n4 = st.columns([1, 1, 4, 2])
+    if n1.button("⬅️ Prev", key=f"{state_key}_prev") and cursor["page"] > 1:
+        cursor["page"] -= 1
+    if n2.button("➡️ Next", key=f"{state_key}_next") and cursor["page"] < pages:
+        cursor["page"] += 1
+    cursor["page"] = min(cursor["page"], pages)
+    filtered = f" (filtered from {cursor['rows']})" if cursor["filters"] else ""
+    n3.markdown(f"**🔢 Total records: {total}{filtered}** — page {cursor['page']} of {pages}")
+    if cursor["filters"] and n4.button("✖️ Clear filters", key=f"{state_key}_clear"):
+        cursor["filters"] = {}
+        cursor["page"] = 1
+        st.rerun()
+
+    st.dataframe(result_pages.read_page(cursor), use_container_width=True)
+    export_buttons(lambda: result_pages.iter_frames(cursor), file_stem, key=f"{state_key}_download")
+
+def show_query_report(report_key):
+    """Where the last query spent its time, and what it downloaded, scanned and looked up."""
+    report = st.session_state.get(report_key)
+    if not report:
+        return
+    with st.expander(f"⏱️ Query timing ({report['seconds']:.2f}s)"):
+        spans = pd.DataFrame(
+            [(name, s["count"], s["seconds"], s["max_seconds"]) for name, s in report["spans"].items()],
+            columns=["Step", "Calls", "Seconds", "Max (s)"],
+        )
+        counters = pd.DataFrame(list(report["counters"].items()), columns=["Counter", "Value"])
+        c1, c2 = st.columns([3, 2])
+        c1.dataframe(spans.sort_values("Seconds", ascending=False), hide_index=True, use_container_width=True)
+        c2.dataframe(counters, hide_index=True, use_container_width=True)
+        st.download_button("📥 Report (JSON)", json.dumps(report, indent=2), file_name=f"{report['name']}_report.json",
+                           mime="application/json", key=f"{report_key}_download")
+
 # --- Session State ---
-for k, v in {"data": pd.DataFrame(), "page": 1, "is_loading": False}.items():
+for k, v in {"od_cursor": None, "sp_cursor": None, "od_report": None, "sp_report": None, "is_loading": False}.items():
     st.session_state.setdefault(k, v)
+
+# Process-wide counters and timings, for monitoring
+st.sidebar.download_button("📈 Metrics (JSON)", data=lambda: json.dumps(metrics.snapshot(), indent=2),
+                           file_name="ec2_pricing_metrics.json", mime="application/json", key="metrics_download")
 # if mode == "":
 #     st.title("💸 AWS EC2 Pricing Tool")
 # ================================================================================
@@ -64,11 +153,12 @@ if mode == "💰 Savings Plan":
     terms = ["1yr", "3yr"]
     purchasing_options = ["No Upfront", "Partial Upfront", "All Upfront"]
     family =  load_family_options()
+    instance_types = get_instance_types()
     # Sidebar filters
     selected_regions = st.sidebar.multiselect("AWS Region (e.g. us-east-1, ap-south-1)", aws_regions, key="sp_region")
     selected_os = st.sidebar.multiselect("Operating System (e.g. Linux/UNIX, Windows)", operating_systems, key="sp_os")
     selected_tenancy = st.sidebar.multiselect("Tenancy (e.g. Shared, Dedicated Host)", tenancy_options, key="sp_tenancy")
-    seleted_instance_family = st.sidebar.multiselect("Instance Family (e.g. t3, m5, c7g)", load_family_options(), key="sp_family")
+    seleted_instance_family = st.sidebar.multiselect("Instance Family (e.g. t3, m5, c7g)", family, key="sp_family")
     selected_instance_types = st.sidebar.multiselect("Instance Type (e.g. t3.medium, m5.large)", instance_types, key="sp_instance")
     selected_sp_types = st.sidebar.multiselect("Savings Plan Type (e.g. ComputeSavingsPlans, EC2InstanceSavingsPlans)", sp_types, key="sp_type")
     selected_terms = st.sidebar.multiselect("Term (e.g. 1yr, 3yr)", terms, key="sp_term")
@@ -85,10 +175,9 @@ if mode == "💰 Savings Plan":
     selected_purchasing = selected_purchasing or purchasing_options
 
     if st.sidebar.button("💡 Get Savings Plan Pricing", key="btn_sp"):
-        results = []
-
-        with st.spinner("Fetching savings plan data..."):
-            combinations = itertools.product(
+        with st.spinner("Fetching savings plan data..."), metrics.query_report("savings_plan", regions=len(selected_regions)) as report:
+            # One relational pass over the SP and On-Demand rate tables for the whole grid
+            result_df = ec2_sp_backend.get_savings_plan_grid(
                 selected_regions,
                 selected_os,
                 selected_tenancy,
@@ -98,76 +187,13 @@ if mode == "💰 Savings Plan":
                 selected_purchasing
             )
 
-            for region, os_input, tenancy, instance_type, sp_type, term, purchasing_option in combinations:
-                try:
-                    usage_operation = ec2_sp_backend.operation_by_platform_dict[os_input]
-                    instance_family = instance_type.split('.')[0]
-                    ec2_sp_backend.check_input_parameters(usage_operation, tenancy, sp_type, term, purchasing_option)
-
-                    try:
-                        sp_rate = ec2_sp_backend.get_savings_plan_rate(
-                            region_code=region,
-                            usage_operation=usage_operation,
-                            instance_family=instance_family,
-                            instance_type=instance_type,
-                            tenancy=tenancy,
-                            sp_type=sp_type,
-                            term=term,
-                            purchasing_option=purchasing_option
-                        )
-                    except Exception:
-                        sp_rate = None
-
-                    try:
-                        on_demand_rate = ec2_sp_backend.get_on_demand_rate(
-                            region_code=region,
-                            usage_operation=usage_operation,
-                            instance_type=instance_type,
-                            tenancy=tenancy
-                        )
-                        if on_demand_rate == 0:
-                            on_demand_rate = None
-                    except Exception:
-                        on_demand_rate = None
-
-                    if sp_rate is not None and on_demand_rate is not None:
-                        savings_percent = f"{round((1 - (sp_rate / on_demand_rate)) * 100, 1)}%"
-                    else:
-                        savings_percent = "N/A"
-
-                    results.append({
-                        "AWS Region": region,
-                        "Operating System": os_input,
-                        "Instance Type": instance_type,
-                        "Tenancy": tenancy,
-                        "Savings Plan Type": sp_type,
-                        "Term": term,
-                        "Purchasing Option": purchasing_option,
-                        "Savings Plan Rate ($)": sp_rate if sp_rate is not None else "N/A",
-                        "On-Demand Rate ($)": on_demand_rate if on_demand_rate is not None else "N/A",
-                        "Savings over On-Demand (%)": savings_percent
-                    })
-
-                except Exception:
-                    results.append({
-                        "AWS Region": region,
-                        "Operating System": os_input,
-                        "Instance Type": instance_type,
-                        "Tenancy": tenancy,
-                        "Savings Plan Type": sp_type,
-                        "Term": term,
-                        "Purchasing Option": purchasing_option,
-                        "Savings Plan Rate ($)": "N/A",
-                        "On-Demand Rate ($)": "N/A",
-                        "Savings over On-Demand (%)": "N/A"
-                    })
-
-        result_df = pd.DataFrame(results)
+            store_result("sp_cursor", result_df)
+        st.session_state["sp_report"] = report.to_dict()
         st.success("✅ Pricing fetched successfully!")
-        st.dataframe(result_df, use_container_width=True)
 
-        csv_data = result_df.to_csv(index=False).encode("utf-8")
-        st.download_button("📥 Download CSV", data=csv_data, file_name="savings_plan_output.csv", mime="text/csv")
+    if st.session_state["sp_cursor"]:
+        show_query_report("sp_report")
+        show_paged_result("sp_cursor", "savings_plan_output")
 
 # ================================================================================
 # 📊 ON-DEMAND / RESERVED SECTION
@@ -178,7 +204,7 @@ else:
     st.sidebar.header("🔍 Filter Criteria (On-Demand / Reserved)")
     regions_sel = st.sidebar.multiselect("Region (e.g. us-east-1, ap-south-1)", get_all_regions(), key="od_region")
     family_sel = st.sidebar.multiselect("Instance Family (e.g. t3, m5, r6g)", load_family_options(), key="od_family")
-    instance_types_sel = st.sidebar.multiselect("Instance Type (e.g. t3.micro, m5.large)", instance_types, key="od_instance")
+    instance_types_sel = st.sidebar.multiselect("Instance Type (e.g. t3.micro, m5.large)", get_instance_types(), key="od_instance")
 
     # Load dynamic options
     dynamic_opts = load_dynamic_filter_options()
@@ -217,35 +243,25 @@ else:
 
     if st.sidebar.button("🔎 Fetch Pricing", key="btn_od"):
         st.session_state["is_loading"] = True
-        st.session_state["page"] = 1
-        st.session_state["data"] = pd.DataFrame()
 
-        with st.spinner("⏳ Fetching pricing data..."):
-            results = []
+        with st.spinner("⏳ Fetching pricing data..."), metrics.query_report("on_demand_reserved", regions=len(regions_sel)) as report:
             progress_bar = st.progress(0)
-            for idx, region in enumerate(regions_sel):
-                results.extend(fetch_pricing(region, filter_params))
-                progress_bar.progress((idx + 1) / len(regions_sel))
-            st.session_state["data"] = pd.DataFrame(results)
-            st.session_state["is_loading"] = False
-
-    # Show results with pagination
-    df = st.session_state["data"]
+            result = fetch_pricing_regions(
+                regions_sel,
+                filter_params,
+                on_progress=lambda done, total, region: progress_bar.progress(done / total, text=f"Fetched {region} ({done}/{total})"),
+            )
+            store_result("od_cursor", result)
+            del result
+        st.session_state["od_report"] = report.to_dict()
+        st.session_state["is_loading"] = False
+
+    # Show results one page at a time; sort and filters run against the stored result
     if st.session_state["is_loading"]:
         st.info("⏳ Fetching data, please wait...")
-    elif not df.empty:
-        st.markdown(f"**🔢 Total records: {len(df)}**")
-        st.subheader("📊 Full Results")
-        st.dataframe(df, use_container_width=True)
-
-        # CSV Download Button (entire data)
-        csv = df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download Full Data as CSV",
-            data=csv,
-            file_name="on_demand_reserved_pricing.csv",
-            mime="text/csv",
-            key="download_csv"
-        )
+    elif st.session_state["od_cursor"] and st.session_state["od_cursor"]["rows"]:
+        st.subheader("📊 Results")
+        show_query_report("od_report")
+        show_paged_result("od_cursor", "on_demand_reserved_pricing")
     else:
         st.info("ℹ️ No data fetched yet. Use the sidebar to select filters and click 'Fetch Pricing'.")
@@ -0,0 +1,90 @@
+# Benchmark: chunked CSV / Parquet / XLSX export vs whole-frame to_csv().encode().
+# Usage: python benchmarks/bench_export.py [--rows 1000000] [--formats csv parquet xlsx]
+# Each mode runs in its own process; "extra peak" is the peak RSS above the process after the
+# result frame was built, i.e. the memory the export itself needed.
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+REGIONS = ["us-east-1", "us-east-2", "us-west-2", "eu-west-1", "eu-central-1", "ap-south-1", "ap-northeast-1", "sa-east-1"]
+TYPES = [f"{fam}.{size}" for fam in ("t3", "m5", "c5", "r5", "m6g", "c7g", "r6i")
+         for size in ("micro", "large", "xlarge", "4xlarge", "16xlarge")]
+OSES = ["Linux", "Windows", "RHEL", "SUSE"]
+
+
+def synthetic_result(n_rows):
+    """A fetch_pricing-shaped frame: categorical dimensions, numeric specs and prices."""
+    rnd = np.random.default_rng(0)
+    pick = lambda values: pd.Categorical.from_codes(rnd.integers(0, len(values), n_rows), categories=values)
+    return pd.DataFrame({
+        "Region": pd.Categorical.from_codes(np.sort(rnd.integers(0, len(REGIONS), n_rows)), categories=REGIONS),
+        "Instance Type": pick(TYPES),
+        "vCPU": rnd.integers(1, 128, n_rows),
+        "Memory (GiB)": rnd.choice([1.0, 8.0, 16.0, 64.0, 256.0], n_rows),
+        "Tenancy": pick(["Shared", "Dedicated", "Host"]),
+        "Operating System": pick(OSES),
+        "Pre Installed S/W": pick(["NA", "SQL Std", "SQL Ent", "SQL Web"]),
+        "TermType": pick(["OnDemand", "Reserved"]),
+        "PurchaseOption": pick(["", "No Upfront", "Partial Upfront", "All Upfront"]),
+        "LeaseContractLength": pick(["", "1yr", "3yr"]),
+        "Unit": pick(["Hrs", "Quantity"]),
+        "PricePerUnit": rnd.random(n_rows) * 10,
+        "EffectiveDate": pick(["2024-01-01T00:00:00Z", "2024-06-01T00:00:00Z"]),
+    })
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, n_rows, path):
+    import exporters
+
+    df = synthetic_result(n_rows)
+    base = peak_mb()
+    start = time.perf_counter()
+    if mode == "to_csv":
+        data = df.to_csv(index=False).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(data)
+    else:
+        with exporters.open_writer(path, mode) as writer:
+            writer.write(df)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": mode, "rows": n_rows, "seconds": round(elapsed, 2),
+                      "file_mb": round(os.path.getsize(path) / 1e6, 1),
+                      "extra_peak_mb": round(peak_mb() - base, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=["to_csv", "csv", "parquet", "xlsx"])
+    parser.add_argument("--mode")
+    parser.add_argument("--path")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.rows, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.formats:
+            ext = "csv" if mode == "to_csv" else mode
+            subprocess.run([sys.executable, __file__, "--mode", mode, "--rows", str(args.rows),
+                            "--path", os.path.join(tmp, f"{mode}.{ext}")], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Benchmark: cold import time of the backend and the Streamlit app module.
+# Usage: python benchmarks/bench_import_time.py [--runs 5]
+# Each import runs in a fresh interpreter; a failing import is reported instead of timed.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODULES = ["ec2_sp_backend", "ec2_pricing_data_fetch", "app"]
+
+
+def time_import(module, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPO_DIR,
+                              capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1]
+        timings.append(elapsed)
+    return timings, None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline, _ = time_import("sys", args.runs)
+    print(f"{'interpreter startup':24} median {statistics.median(baseline):.3f}s")
+    for module in MODULES:
+        timings, error = time_import(module, args.runs)
+        if error:
+            print(f"{'import ' + module:24} FAILED: {error}")
+        else:
+            print(f"{'import ' + module:24} median {statistics.median(timings):.3f}s  "
+                  f"(min {min(timings):.3f}s, max {max(timings):.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
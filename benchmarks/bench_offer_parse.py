@@ -0,0 +1,114 @@
+# Benchmark: streaming offer-file parse vs json.load on a synthetic AmazonEC2 offer file.
+# Usage: python benchmarks/bench_offer_parse.py [--skus 200000]
+# Each mode runs in its own process so peak RSS is measured in isolation.
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+FAMILIES = ["t3", "m5", "c5", "r5", "m6g", "c7g", "r6i", "x2idn"]
+SIZES = {"micro": (2, 1), "large": (2, 8), "xlarge": (4, 16), "4xlarge": (16, 64), "16xlarge": (64, 256)}
+OSES = ["Linux", "Windows", "RHEL", "SUSE"]
+
+
+def write_synthetic_offer(path, n_skus):
+    rnd = random.Random(0)
+    with open(path, "w") as f:
+        f.write('{"formatVersion":"v1.0","offerCode":"AmazonEC2","version":"20240101000000",'
+                '"publicationDate":"2024-01-01T00:00:00Z","products":{')
+        for i in range(n_skus):
+            fam = rnd.choice(FAMILIES)
+            size, (vcpu, mem) = rnd.choice(list(SIZES.items()))
+            product = {
+                "sku": f"SKU{i}",
+                "productFamily": "Compute Instance",
+                "attributes": {
+                    "servicecode": "AmazonEC2", "location": "US East (N. Virginia)", "locationType": "AWS Region",
+                    "instanceType": f"{fam}.{size}", "currentGeneration": "Yes", "instanceFamily": "General purpose",
+                    "vcpu": str(vcpu), "physicalProcessor": "Intel Xeon Platinum 8175", "clockSpeed": "3.1 GHz",
+                    "memory": f"{mem} GiB", "storage": "EBS only", "networkPerformance": "Up to 10 Gigabit",
+                    "processorArchitecture": "64-bit", "tenancy": "Shared", "operatingSystem": rnd.choice(OSES),
+                    "licenseModel": "No License required", "usagetype": f"BoxUsage:{fam}.{size}",
+                    "operation": "RunInstances", "availabilityzone": "NA", "capacitystatus": "Used",
+                    "classicnetworkingsupport": "false", "dedicatedEbsThroughput": "Up to 2120 Mbps",
+                    "ecu": "10", "enhancedNetworkingSupported": "Yes", "gpuMemory": "NA",
+                    "intelAvxAvailable": "Yes", "intelAvx2Available": "Yes", "intelTurboAvailable": "Yes",
+                    "marketoption": "OnDemand", "normalizationSizeFactor": "4", "preInstalledSw": "NA",
+                    "processorFeatures": "Intel AVX; Intel AVX2; Intel AVX512; Intel Turbo",
+                    "regionCode": "us-east-1", "vpcnetworkingsupport": "true",
+                },
+            }
+            f.write(("," if i else "") + json.dumps(f"SKU{i}") + ":" + json.dumps(product))
+        f.write('},"terms":{')
+        for t_idx, term_type in enumerate(["OnDemand", "Reserved"]):
+            f.write(("," if t_idx else "") + json.dumps(term_type) + ":{")
+            n_terms = 1 if term_type == "OnDemand" else 6
+            for i in range(n_skus):
+                terms = {}
+                for j in range(n_terms):
+                    tid = f"SKU{i}.T{j}"
+                    terms[tid] = {
+                        "offerTermCode": f"T{j}", "sku": f"SKU{i}", "effectiveDate": "2024-01-01T00:00:00Z",
+                        "priceDimensions": {
+                            f"{tid}.D{k}": {
+                                "rateCode": f"{tid}.D{k}", "description": "synthetic rate", "beginRange": "0",
+                                "endRange": "Inf", "unit": "Hrs" if k == 0 else "Quantity", "appliesTo": [],
+                                "pricePerUnit": {"USD": f"{rnd.random():.10f}"},
+                            }
+                            for k in range(1 if term_type == "OnDemand" else 2)
+                        },
+                        "termAttributes": {} if term_type == "OnDemand" else {
+                            "LeaseContractLength": "1yr", "OfferingClass": "standard", "PurchaseOption": "Partial Upfront",
+                        },
+                    }
+                f.write(("," if i else "") + json.dumps(f"SKU{i}") + ":" + json.dumps(terms))
+            f.write("}")
+        f.write("}}")
+
+
+def run_mode(mode, path):
+    import offer_parser
+
+    start = time.perf_counter()
+    if mode == "stream":
+        skus = sum(1 for section, _, _ in offer_parser.iter_offer(path) if section == "products")
+    else:
+        with open(path, "rb") as f:
+            skus = len(json.load(f)["products"])
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "skus": skus, "seconds": round(elapsed, 2), "peak_rss_mb": round(peak_mb, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=200_000)
+    parser.add_argument("--mode", choices=["stream", "json"])
+    parser.add_argument("--path")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.path)
+        return
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        write_synthetic_offer(path, args.skus)
+        print(f"synthetic offer file: {os.path.getsize(path) / 1e6:.1f} MB, {args.skus} SKUs")
+        for mode in ("stream", "json"):
+            subprocess.run([sys.executable, __file__, "--mode", mode, "--path", path], check=True)
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
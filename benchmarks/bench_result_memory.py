@@ -0,0 +1,81 @@
+# Benchmark: memory of a fetch_pricing result as list-of-dicts -> object DataFrame (the old path)
+# vs the compact categorical result built from the pricing store.
+# Usage: python benchmarks/bench_result_memory.py [--skus 50000] [--regions 2]
+# A synthetic offer file is ingested into a temporary store for each region; each mode then
+# runs an unfiltered On-Demand + Reserved query in its own process.
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_offer_parse import write_synthetic_offer
+
+REGIONS = ["us-east-1", "us-east-2", "us-west-2", "eu-west-1", "eu-central-1", "ap-south-1"]
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, regions):
+    import pandas as pd
+    import pricing_filter
+    import pricing_store
+
+    base = peak_mb()
+    start = time.perf_counter()
+    if mode == "dicts":
+        rows = []
+        for region in regions:
+            for term_type in pricing_filter.DEFAULT_TERM_TYPES:
+                table = pricing_store.load_partition(region, term_type).select(pricing_store.RESULT_COLUMNS)
+                rows.extend(table.to_pylist())
+        df = pd.DataFrame(rows)
+        del rows
+    else:
+        df = pricing_filter.concat_results(pricing_filter.query_region(region, {}) for region in regions)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": mode, "rows": len(df), "seconds": round(elapsed, 2),
+                      "frame_mb": round(df.memory_usage(deep=True).sum() / 1e6, 1),
+                      "extra_peak_mb": round(peak_mb() - base, 1)}))
+
+
+def prepare_store(skus, regions):
+    import pricing_store
+
+    path = os.path.join(pricing_store.STORE_DIR, "offer.json")
+    write_synthetic_offer(path, skus)
+    for region in regions:
+        pricing_store.ingest_offer_file(region, path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=50_000)
+    parser.add_argument("--regions", type=int, default=2)
+    parser.add_argument("--mode", choices=["prepare", "dicts", "compact"])
+    args = parser.parse_args()
+    regions = REGIONS[:args.regions]
+
+    if args.mode == "prepare":
+        prepare_store(args.skus, regions)
+    elif args.mode:
+        run_mode(args.mode, regions)
+    else:
+        # Every step is a child of this small process: peak RSS carries over from parent to child
+        with tempfile.TemporaryDirectory() as store:
+            os.environ["EC2_PRICING_STORE_DIR"] = store
+            for mode in ("prepare", "dicts", "compact"):
+                subprocess.run([sys.executable, __file__, "--mode", mode, "--skus", str(args.skus),
+                                "--regions", str(args.regions)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Benchmark: indexed Savings Plan rate lookup vs the previous linear scan.
+# Usage: python benchmarks/bench_sp_rate_index.py [--families 60] [--lookups 20000]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import ec2_sp_backend
+
+SIZES = ["micro", "small", "medium", "large", "xlarge", "2xlarge", "4xlarge", "8xlarge", "16xlarge"]
+TERMS = ["1yr", "3yr"]
+PURCHASE_OPTIONS = ["No Upfront", "Partial Upfront", "All Upfront"]
+OPERATIONS = list(ec2_sp_backend.operation_by_platform_dict.values())
+
+
+def synthetic_sp_document(n_families, region_prefix="USE2"):
+    rnd = random.Random(0)
+    families = [f"f{i}" for i in range(n_families)]
+    products, terms = [], []
+    plans = [("ComputeSavingsPlans", None)] + [("EC2InstanceSavingsPlans", fam) for fam in families]
+    for sp_type, fam in plans:
+        for term in TERMS:
+            for po in PURCHASE_OPTIONS:
+                sku = f"{sp_type}-{fam}-{term}-{po}"
+                attrs = {"purchaseTerm": term, "purchaseOption": po}
+                if fam:
+                    attrs["instanceType"] = fam
+                products.append({"sku": sku, "productFamily": sp_type, "attributes": attrs})
+                rates = []
+                for rate_fam in ([fam] if fam else families):
+                    for op in OPERATIONS:
+                        for size in SIZES:
+                            itype = f"{rate_fam}.{size}"
+                            for usage, target in (("BoxUsage", itype), ("DedicatedUsage", itype), ("HostUsage", rate_fam)):
+                                rates.append({
+                                    "discountedOperation": op,
+                                    "discountedUsageType": f"{region_prefix}-{usage}:{target}",
+                                    "discountedRate": {"price": f"{rnd.random():.6f}"},
+                                })
+                terms.append({"sku": sku, "rates": rates})
+    return {"products": products, "terms": {"savingsPlan": terms}}, families
+
+
+def scan_savings_plan_rate(region_price, region_code, usage_operation, instance_family, instance_type, tenancy, sp_type, term, purchasing_option):
+    # The pre-index implementation of get_savings_plan_rate, kept here for comparison
+    sku = ''
+    for product in region_price['products']:
+        if (product['attributes']['purchaseOption'] == purchasing_option and
+            product['attributes']['purchaseTerm'] == term and
+            product['productFamily'] == sp_type and
+            ((sp_type == "ComputeSavingsPlans") or
+             (sp_type == "EC2InstanceSavingsPlans" and 'instanceType' in product['attributes'] and product['attributes']['instanceType'] == instance_family))):
+            sku = product['sku']
+            break
+    if not sku:
+        return None
+    for term_entry in region_price['terms']['savingsPlan']:
+        if term_entry['sku'] == sku:
+            for rate in term_entry['rates']:
+                if usage_operation == rate['discountedOperation']:
+                    dut = rate['discountedUsageType']
+                    if tenancy == 'Shared':
+                        if dut.endswith("-BoxUsage:" + instance_type):
+                            return float(rate['discountedRate']['price'])
+                        elif region_code == 'us-east-1' and dut == "BoxUsage:" + instance_type:
+                            return float(rate['discountedRate']['price'])
+                    elif tenancy == 'Dedicated Instance' and dut.endswith("DedicatedUsage:" + instance_type):
+                        return float(rate['discountedRate']['price'])
+                    elif tenancy == 'Dedicated Host' and dut.endswith("HostUsage:" + instance_family):
+                        return float(rate['discountedRate']['price'])
+            break
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--families", type=int, default=60)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    region = "us-east-2"
+    doc, families = synthetic_sp_document(args.families)
+    rnd = random.Random(1)
+    queries = []
+    for _ in range(args.lookups):
+        fam = rnd.choice(families)
+        queries.append((region, rnd.choice(OPERATIONS), fam, f"{fam}.{rnd.choice(SIZES)}",
+                        rnd.choice(list(ec2_sp_backend.tenancy_dict.values())),
+                        rnd.choice(["ComputeSavingsPlans", "EC2InstanceSavingsPlans"]),
+                        rnd.choice(TERMS), rnd.choice(PURCHASE_OPTIONS)))
+
+    # The synthetic document stands in for the published version, so the region index is not fetched
+    version_url = f"/savingsPlan/v1.0/aws/AWSComputeSavingsPlan/synthetic/{region}/index.json"
+    ec2_sp_backend.get_sp_version_url = lambda region_code: version_url
+    start = time.perf_counter()
+    ec2_sp_backend.sp_region_cache.put((region, version_url), ec2_sp_backend.build_sp_rate_index(region, doc))
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [ec2_sp_backend.get_savings_plan_rate(*q) for q in queries]
+    indexed_s = time.perf_counter() - start
+
+    scan_n = min(len(queries), 500)
+    start = time.perf_counter()
+    scanned = [scan_savings_plan_rate(doc, *q) for q in queries[:scan_n]]
+    scan_s = (time.perf_counter() - start) * len(queries) / scan_n
+
+    assert scanned == indexed[:scan_n], "indexed lookup disagrees with the linear scan"
+    print(f"index build: {build_s:.3f}s")
+    print(f"{len(queries)} lookups - indexed: {indexed_s:.4f}s, linear scan (extrapolated from {scan_n}): {scan_s:.2f}s, "
+          f"speedup: {scan_s / indexed_s:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# --- Utilization-aware cost model ---
+# Prices an hourly usage profile (instance counts per hour, e.g. a week or a year of samples)
+# as a Savings Plan commitment of c instances plus On-Demand for every hour above c.
+#
+# For one plan with hourly rate s and On-Demand rate o, the cost per profile hour is
+#     s * c + o * sum(max(u_t - c, 0)) / T
+# which is convex and piecewise linear in c, with breakpoints at the profile values. Its slope
+# s - o * #{t: u_t > c} / T changes sign at the floor(T * s / o)-th largest hour, so after
+# one descending sort the optimal commitment of every instance type and plan is a single
+# index, and its overflow a prefix-sum lookup. No per-commitment or per-hour loops.
+
+import numpy as np
+import pandas as pd
+
+from ec2_sp_backend import savings_plan_rates
+
+HOURS_PER_MONTH = 24 * 30
+TERM_MONTHS = {"1yr": 12, "3yr": 36}
+SP_TYPES = ("ComputeSavingsPlans", "EC2InstanceSavingsPlans")
+PURCHASING_OPTIONS = ("No Upfront", "Partial Upfront", "All Upfront")
+
+# Every Savings Plan offer a profile is priced against: (sp_type, term, purchasing_option)
+SP_OPTIONS = [(sp_type, term, option) for sp_type in SP_TYPES for term in TERM_MONTHS for option in PURCHASING_OPTIONS]
+ON_DEMAND = -1  # plan index of "no commitment"
+
+
+def read_profile(profile) -> np.ndarray:
+    """Hourly instance counts from a sequence, Series, or a CSV path (first numeric column)."""
+    if isinstance(profile, str):
+        profile = pd.read_csv(profile).select_dtypes("number").iloc[:, 0]
+    values = np.asarray(profile, dtype=float)
+    if values.ndim != 1 or not len(values):
+        raise ValueError("A usage profile is a non-empty sequence of hourly instance counts")
+    if np.isnan(values).any() or (values < 0).any():
+        raise ValueError("Usage profile counts must be non-negative numbers")
+    return values
+
+
+def profile_curve(profile):
+    """(counts sorted descending with a trailing 0, prefix sums of those counts) for breakpoint lookups."""
+    desc = np.append(np.sort(read_profile(profile))[::-1], 0.0)
+    return desc, np.concatenate(([0.0], np.cumsum(desc[:-1])))
+
+
+def optimal_commitment(curve, ondemand, sp_rate, term_months, horizon_months=None):
+    """
+    Cost-minimizing commitment (in instances) and monthly cost for arrays of On-Demand and
+    Savings Plan hourly rates (broadcast together). With `horizon_months` shorter than the term,
+    the commitment is still paid for the whole term, which raises the break-even utilization.
+    Unavailable rates (NaN) give an infinite cost.
+    """
+    desc, top_sums = curve
+    hours = len(desc) - 1
+    ondemand, sp_rate = np.broadcast_arrays(np.asarray(ondemand, dtype=float), np.asarray(sp_rate, dtype=float))
+    lock_in = 1.0 if horizon_months is None else max(horizon_months, term_months) / horizon_months
+    effective = sp_rate * lock_in
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = effective / ondemand
+    priced = np.isfinite(ratio) & (ondemand > 0)
+    # Hours allowed above the commitment: floor(T * s / o), capped at T (then nothing is committed)
+    above = np.where(priced, np.minimum(np.floor(hours * np.where(priced, ratio, 0)), hours), hours).astype(np.int64)
+    commitment = desc[above]
+    overflow = top_sums[above] - above * commitment
+    hourly = effective * commitment + ondemand * overflow / hours
+    monthly = np.where(priced, hourly * HOURS_PER_MONTH, np.inf)
+    return np.where(priced, commitment, 0.0), monthly
+
+
+def on_demand_cost(curve, ondemand):
+    """Monthly cost of running the whole profile On-Demand (infinite where there is no rate)."""
+    desc, top_sums = curve
+    mean = top_sums[-1] / (len(desc) - 1)
+    ondemand = np.asarray(ondemand, dtype=float)
+    return np.where(np.isnan(ondemand), np.inf, ondemand * mean * HOURS_PER_MONTH)
+
+
+def sp_option_rates(region, usage_operation, instance_types, tenancy="Shared") -> np.ndarray:
+    """(len(SP_OPTIONS), len(instance_types)) Savings Plan hourly rates; NaN rows for offers not published."""
+    rates = np.full((len(SP_OPTIONS), len(instance_types)), np.nan)
+    for k, (sp_type, term, option) in enumerate(SP_OPTIONS):
+        rates[k] = savings_plan_rates(region, usage_operation, instance_types, tenancy, sp_type, term, option)
+    return rates
+
+
+def cheapest_plans(profile, ondemand, sp_rates, horizon_months=None) -> dict:
+    """
+    Cheapest way to run `profile` on each instance type: On-Demand only, or one of SP_OPTIONS
+    (rows of `sp_rates`) with its optimal commitment and On-Demand overflow. Costs are per
+    month, averaged over `horizon_months` when given (see optimal_commitment).
+    Returns arrays over instance types: plan (index into SP_OPTIONS or ON_DEMAND), commitment
+    (instances), hourly commitment ($/hr of Savings Plan), monthly cost, and the On-Demand cost.
+    """
+    curve = profile_curve(profile)
+    ondemand = np.asarray(ondemand, dtype=float)
+    terms = np.array([TERM_MONTHS[term] for _, term, _ in SP_OPTIONS])
+    commitments = np.empty(np.shape(sp_rates))
+    costs = np.empty(np.shape(sp_rates))
+    for term_months in np.unique(terms):
+        rows = terms == term_months
+        commitments[rows], costs[rows] = optimal_commitment(curve, ondemand[None, :], sp_rates[rows],
+                                                            term_months, horizon_months)
+
+    od_cost = on_demand_cost(curve, ondemand)
+    best = costs.argmin(axis=0)
+    columns = np.arange(len(ondemand))
+    best_cost = costs[best, columns]
+    use_sp = best_cost < od_cost
+    return {
+        "plan": np.where(use_sp, best, ON_DEMAND),
+        "commitment": np.where(use_sp, commitments[best, columns], 0.0),
+        "commitment_hourly": np.where(use_sp, commitments[best, columns] * sp_rates[best, columns], 0.0),
+        "monthly_cost": np.minimum(best_cost, od_cost),
+        "on_demand_cost": od_cost,
+    }
+
+
+def plan_label(plan: int) -> str:
+    if plan == ON_DEMAND:
+        return "On-Demand"
+    sp_type, term, option = SP_OPTIONS[plan]
+    return f"{sp_type} {term} {option}"
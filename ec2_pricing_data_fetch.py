@@ -3,18 +3,20 @@
 import streamlit as st
 import pandas as pd
 import boto3
-import requests
 from io import BytesIO
 from openpyxl import Workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-import os
-import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+
+import instance_catalog
+import metrics
+import pricing_filter
+import pricing_store
+import query_cache
 
 # --- Constants ---
 LOG_FILE = "error_log.txt"
-PAGE_SIZE = 50
 MAX_THREADS = 20
 
 #If we failed to fetch regions from AWS boto3 then we will use this 
@@ -26,15 +28,17 @@ region_list = ['ap-south-2', 'ap-south-1', 'eu-south-1', 'eu-south-2', 'me-centr
 
 st.cache_resource.clear()
 # --- Helpers ---
-def log_error(msg: str):
-    with open(LOG_FILE, "a") as f:
-        f.write(f"{datetime.now()} - {msg}\n")
+# One handler for the process: the log file is opened once (on the first error), not per message
+error_logger = logging.getLogger("ec2_pricing.errors")
+if not error_logger.handlers:
+    _error_handler = logging.FileHandler(LOG_FILE, delay=True)
+    _error_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    error_logger.addHandler(_error_handler)
+    error_logger.propagate = False
 
-def parse_memory(mem_str: str) -> float:
-    try:
-        return float(mem_str.replace("GiB", "").strip())
-    except Exception:
-        return math.nan
+def log_error(msg: str):
+    metrics.count("errors")
+    error_logger.error(msg)
 
 @st.cache_resource(show_spinner=False)
 def get_ec2_client():
@@ -56,20 +60,27 @@ def get_all_regions():
 
 @st.cache_data(show_spinner=False)
 def get_all_instance_types():
+    # Served from the offline instance catalog; the EC2 API is only a fallback
+    try:
+        return instance_catalog.load_catalog()["InstanceType"].tolist()
+    except Exception as e:
+        log_error(f"Instance Catalog Error: {e}")
     paginator = get_ec2_client().get_paginator("describe_instance_types")
     types = [it["InstanceType"] for page in paginator.paginate() for it in page["InstanceTypes"]]
     return sorted(types)
 
+def refresh_instance_catalog():
+    """Optional: refresh the offline instance catalog from describe_instance_types."""
+    return instance_catalog.refresh_from_ec2(get_ec2_client())
+
 @st.cache_data(show_spinner=False)
-def fetch_offer_file(region: str):
+def load_catalog_metadata(sample_region="us-east-1"):
+    # Read from the store's sidecar file, built once per offer-file version
     try:
-        url = f"https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AmazonEC2/current/{region}/index.json"
-        r = requests.get(url, timeout=90)
-        r.raise_for_status()
-        return r.json()
+        return pricing_store.load_metadata(sample_region)
     except Exception as e:
-        log_error(f"Offer Fetch Error ({region}): {e}")
-        return {"products": {}, "terms": {}}
+        log_error(f"Catalog Metadata Error ({sample_region}): {e}")
+        return {}
 
 @st.cache_data(show_spinner=False)
 def load_dynamic_filter_options(sample_region="us-east-1"):
@@ -78,159 +89,62 @@ def load_dynamic_filter_options(sample_region="us-east-1"):
             return None
         return val.strip().lower().replace(" ", "")
 
-    data = fetch_offer_file(sample_region)
-    products = data.get("products", {})
-    terms_all = data.get("terms", {})
-
-    raw_sets = {
-        "PurchaseOption": {},
-        "OfferingClass": {},
-        "LeaseContractLength": {},
-        "PreInstalledSw": {},
-        "OperatingSystem": {},
-        "Tenancy": {},
-    }
-
-    for sku, prod in products.items():
-        attr = prod.get("attributes", {})
-        for k, ak in [("OperatingSystem", "operatingSystem"), ("PreInstalledSw", "preInstalledSw"), ("Tenancy", "tenancy")]:
-            val = attr.get(ak)
+    metadata = load_catalog_metadata(sample_region)
+    options = {}
+    for k in ["PurchaseOption", "OfferingClass", "LeaseContractLength", "PreInstalledSw", "OperatingSystem", "Tenancy"]:
+        raw = {}
+        for val in metadata.get(k, []):
             norm = normalize(val)
             if norm:
-                raw_sets[k][norm] = val
-
-        for term_cat in ["Reserved", "OnDemand", "SavingsPlan"]:
-            for term_obj in terms_all.get(term_cat, {}).get(sku, {}).values():
-                term_attr = term_obj.get("termAttributes", {})
-                for k in ["PurchaseOption", "OfferingClass", "LeaseContractLength"]:
-                    val = term_attr.get(k)
-                    norm = normalize(val)
-                    if norm:
-                        raw_sets[k][norm] = val
-
-    return {
-        k: sorted(set(raw_sets[k].values())) for k in raw_sets
-    }
+                raw[norm] = val
+        options[k] = sorted(set(raw.values()))
+    return options
 
 @st.cache_data(show_spinner=False)
 def load_family_options(sample_region="us-east-1"):
-    data = fetch_offer_file(sample_region)
-    families = set()
-    for sku, prod in data.get("products", {}).items():
-        inst = prod.get("attributes", {}).get("instanceType")
-        if inst and "." in inst:
-            families.add(inst.split(".")[0])
-    return sorted(families)
+    return load_catalog_metadata(sample_region).get("Family", [])
 
-def _in_filter(value, allowed_set):
-    return True if not allowed_set else value in allowed_set
+def _fetch_region_pricing(region: str, filters: dict):
+    try:
+        # Served from the columnar store; the offer file is only ingested on first use
+        manifest = pricing_store.ensure_region(region)
+    except Exception as e:
+        log_error(f"Pricing Store Error ({region}): {e}")
+        return pricing_filter.empty_result()
 
-@st.cache_data(show_spinner=False)
-def fetch_pricing(region: str, filters: dict):
-    data = fetch_offer_file(region)
-    products = data.get("products", {})
-    terms_all = data.get("terms", {})
-    itypes = filters.get("instance_types", set())
-    tenancies = filters.get("tenancies", set())
-    op_sys = filters.get("operating_systems", set())
-    purchase_opts = filters.get("purchase_options", set())
-    offer_classes = filters.get("offering_classes", set())
-    lease_terms = filters.get("lease_terms", set())
-    pre_sw = filters.get("pre_sw", set())
-    term_types = filters.get("term_types") or ["OnDemand", "Reserved"]
-    families = filters.get("families", set())
-    vcpu_min, vcpu_max = filters.get("vcpu_range", (0, 128))
-    mem_min, mem_max = filters.get("mem_range", (0.0, 2048.0))
-
-    results = []
-    for sku, product in products.items():
-        attrs = product.get("attributes", {})
-        inst_type = attrs.get("instanceType")
-        if not inst_type:
-            continue
-
-        family = inst_type.split(".")[0]
-        if itypes and inst_type not in itypes:
-            continue
-        if tenancies and attrs.get("tenancy") not in tenancies:
-            continue
-        if op_sys and attrs.get("operatingSystem") not in op_sys:
-            continue
-        if pre_sw and attrs.get("preInstalledSw") not in pre_sw:
-            continue
-        if families and family not in families:
-            continue
-
-        try:
-            vcpu_val = int(attrs.get("vcpu", 0))
-        except:
-            vcpu_val = 0
-        if vcpu_val < vcpu_min or vcpu_val > vcpu_max:
-            continue
-
-        mem_val = parse_memory(attrs.get("memory", "0"))
-        if mem_val < mem_min or mem_val > mem_max:
-            continue
-
-        for term_category in term_types:
-            sku_terms = terms_all.get(term_category, {}).get(sku, {})
-            for term_id, term_data in sku_terms.items():
-                t_attrs = term_data.get("termAttributes", {})
-                if not _in_filter(t_attrs.get("PurchaseOption"), purchase_opts):
-                    continue
-                if not _in_filter(t_attrs.get("OfferingClass"), offer_classes):
-                    continue
-                if not _in_filter(t_attrs.get("LeaseContractLength"), lease_terms):
-                    continue
-                for price_dim in term_data.get("priceDimensions", {}).values():
-                    try:
-                        price = float(price_dim.get("pricePerUnit", {}).get("USD", 0.0))
-                    except:
-                        price = 0.0
-                    results.append({
-                        "Region": region,
-                        "Location": attrs.get("location"),
-                        "Instance Type": inst_type,
-                        "Current Generation": attrs.get("currentGeneration"),
-                        "Instance Family": attrs.get("instanceFamily"),
-                        "Family": family,
-                        "vCPU": vcpu_val,
-                        "Memory": attrs.get("memory"),
-                        "Memory (GiB)": mem_val,
-                        "Storage": attrs.get("storage"),
-                        "Network Performance": attrs.get("networkPerformance"),
-                        "Processor Architecture": attrs.get("processorArchitecture"),
-                        "Storage Media": attrs.get("storageMedia"),
-                        "Tenancy": attrs.get("tenancy"),
-                        "EBS Optimized": attrs.get("ebsOptimized"),
-                        "Dedicated EBS Throughput": attrs.get("dedicatedEbsThroughput"),
-                        "Processor Features": attrs.get("processorFeatures"),
-                        "Physical Processor": attrs.get("physicalProcessor"),
-                        "Operating System": attrs.get("operatingSystem"),
-                        "License Model": attrs.get("licenseModel"),
-                        "Pre Installed S/W": attrs.get("preInstalledSw"),
-                        "Region Code": attrs.get("regionCode"),
-                        "ServiceName": attrs.get("servicecode", "AmazonEC2"),
-                        "TermType": term_category,
-                        "PurchaseOption": t_attrs.get("PurchaseOption"),
-                        "OfferingClass": t_attrs.get("OfferingClass"),
-                        "LeaseContractLength": t_attrs.get("LeaseContractLength"),
-                        "Unit": price_dim.get("unit"),
-                        "PricePerUnit": price,
-                        "EffectiveDate": term_data.get("effectiveDate"),
-                    })
-    return results
+    # Shared across sessions (and worker processes, with QUERY_CACHE_DISK=1); keyed by offer version.
+    # Narrowing an earlier query filters its cached result instead of rescanning the region.
+    return query_cache.cached_query(region, manifest.get("version"), filters,
+                                    lambda: pricing_filter.query_region(region, filters),
+                                    refine=pricing_filter.refine_result)
 
+def fetch_pricing(region: str, filters: dict):
+    return _fetch_region_pricing(region, filters)
+
+def fetch_pricing_regions(regions, filters: dict, on_progress=None, max_workers: int = MAX_THREADS):
+    """Downloads and filters `regions` on a bounded thread pool.
+
+    `on_progress(done, total, region)` is called from the calling thread as each region
+    finishes; the returned frame keeps the order of `regions`.
+    """
+    regions = list(regions)
+    if not regions:
+        return pricing_filter.empty_result()
+
+    frames = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(regions))) as pool:
+        futures = {pool.submit(metrics.in_context(_fetch_region_pricing), region, filters): region for region in regions}
+        for done, future in enumerate(as_completed(futures), start=1):
+            region = futures[future]
+            frames[region] = future.result()
+            if on_progress:
+                on_progress(done, len(regions), region)
+    # Typed categorical result; a plain concat would turn every categorical column into objects
+    with metrics.span("query.concat"):
+        result = pricing_filter.concat_results(frames[region] for region in regions)
+    metrics.count("query.rows_emitted", len(result))
+    return result
 
-@st.cache_data(show_spinner=False)
-def load_family_options(sample_region="us-east-1"):
-    data = fetch_offer_file(sample_region)
-    families = set()
-    for sku, prod in data.get("products", {}).items():
-        inst = prod.get("attributes", {}).get("instanceType")
-        if inst and "." in inst:
-            families.add(inst.split(".")[0])
-    return sorted(families)
 
 
 # --- Streamlit UI ---
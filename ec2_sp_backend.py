@@ -1,16 +1,33 @@
 import requests
 import json
 import boto3
-from pprint import pprint
 import logging
-# Use credentials from environment 
-pricing_client = boto3.client(
-    'pricing',
-    region_name='ss',
-        #aws_access_key_id='s',
-        #aws_secret_access_key='s',
-        #aws_session_token='s',
-)
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import http_cache
+import metrics
+import pricing_store
+from http_cache import CACHE_DIR
+from memory_cache import MemoryBoundedCache
+
+# Use credentials from environment; the client is created on first use, not at import
+@lru_cache(maxsize=None)
+def get_pricing_client():
+    return boto3.client(
+        'pricing',
+        region_name='ss',
+            #aws_access_key_id='s',
+            #aws_secret_access_key='s',
+            #aws_session_token='s',
+    )
 # Log config
 logging.basicConfig(filename='pricing_log.txt',filemode='w',level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 #ref. mapping https://docs.aws.amazon.com/AWSEC2/latest/UserGuide/billing-info-fields.html
@@ -47,76 +64,163 @@ tenancy_friendly_to_api = {
     "Dedicated Host": "host"
 }
 
+MAX_THREADS = 20
+
 #Load region index for Savings Plan pricing
-region_price = {};
+#Compact SP rate indexes by (region, versionUrl), evicted least-recently-used beyond the memory budget
+SP_CACHE_MAX_MB = int(os.environ.get("SP_CACHE_MAX_MB", 512))
+SP_CACHE_MAX_REGIONS = int(os.environ.get("SP_CACHE_MAX_REGIONS", 0)) or None
+sp_region_cache = MemoryBoundedCache(max_bytes=SP_CACHE_MAX_MB * 1024 * 1024, max_entries=SP_CACHE_MAX_REGIONS)
 region_price_index_api_url = "https://pricing.us-east-1.amazonaws.com/savingsPlan/v1.0/aws/AWSComputeSavingsPlan/current/region_index.json"
-response_region_price_index = requests.get(region_price_index_api_url, timeout=5)
-region_price_index = response_region_price_index.json()['regions']
+REGION_INDEX_CACHE_FILE = os.path.join(CACHE_DIR, "sp_region_index.json")
+REGION_INDEX_TTL = int(os.environ.get("SP_REGION_INDEX_TTL", 24 * 3600))  # seconds
+_region_index_lock = threading.Lock()
 
+def get_region_price_index():
+    """
+    Savings Plan region index. It is read from a disk copy on every call (it is a few KB), and
+    the copy is downloaded again once it is older than REGION_INDEX_TTL, so new regions and
+    versionUrls are picked up by a running process. A stale copy is still used if the download fails.
+    """
+    with _region_index_lock:
+        cache_fresh = (os.path.exists(REGION_INDEX_CACHE_FILE) and
+                       time.time() - os.path.getmtime(REGION_INDEX_CACHE_FILE) < REGION_INDEX_TTL)
+        if not cache_fresh:
+            try:
+                response_region_price_index = requests.get(region_price_index_api_url, timeout=5)
+                response_region_price_index.raise_for_status()
+                regions = response_region_price_index.json()['regions']
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                with tempfile.NamedTemporaryFile("w", dir=CACHE_DIR, suffix=".tmp", delete=False) as f:
+                    json.dump(regions, f)
+                os.replace(f.name, REGION_INDEX_CACHE_FILE)
+                return regions
+            except Exception as e:
+                if not os.path.exists(REGION_INDEX_CACHE_FILE):
+                    raise
+                logging.warning(f"Using stale Savings Plan region index, refresh failed: {e}")
+        with open(REGION_INDEX_CACHE_FILE) as f:
+            return json.load(f)
+
+def get_sp_version_url(region_code):
+    """The versionUrl of the region's current Savings Plan document in the region index."""
+    for region in get_region_price_index():
+        if (region['regionCode'] == region_code):
+            return region['versionUrl']
+    raise KeyError(f"No Savings Plan pricing published for region {region_code}")
+
+def get_pricing_by_region(region_code, version_url=None):
+    """Downloads a region's Savings Plan document. Callers keep the compact rate index, not this JSON."""
+    version_url = version_url or get_sp_version_url(region_code)
+    region_price_api_url = "https://pricing.us-east-1.amazonaws.com" + version_url
+    # versionUrl is immutable, so a cached copy of the same version needs no request
+    path, _ = http_cache.fetch_to_cache(region_price_api_url, version_url=version_url, timeout=5)
+    with metrics.span("sp.document_parse"), open(path) as f:
+        return json.load(f)
+
+def _rate_target(region_code, discounted_usage_type):
+    """Maps a discountedUsageType to (tenancy, instance type or family), or None if it is not instance usage."""
+    usage, _, target = discounted_usage_type.rpartition(':')
+    # us-east-1 usage types have no region prefix: BoxUsage:<type> instead of <prefix>-BoxUsage:<type>
+    if usage.endswith("-BoxUsage") or (region_code == 'us-east-1' and usage == "BoxUsage"):
+        return ('Shared', target)
+    if usage.endswith("DedicatedUsage"):
+        return ('Dedicated Instance', target)
+    if usage.endswith("HostUsage"):
+        return ('Dedicated Host', target)
+    return None
+
+@metrics.timed("sp.index_build")
+def build_sp_rate_index(region_code, price_doc):
+    """
+    Indexes a region's Savings Plan document once so rate lookups are hash hits:
+      skus:  (sp_type, term, purchasing_option, instance_family or None) -> sku
+      rates: (sku, usage_operation, tenancy, instance_type or family for Dedicated Host) -> rate
+    First match wins, the same as the linear scan it replaces.
+    """
+    skus = {}
+    for product in price_doc['products']:
+        attrs = product['attributes']
+        sp_type = product['productFamily']
+        key = (sp_type, attrs.get('purchaseTerm'), attrs.get('purchaseOption'))
+        if sp_type == "ComputeSavingsPlans":
+            skus.setdefault(key + (None,), product['sku'])
+        elif sp_type == "EC2InstanceSavingsPlans" and 'instanceType' in attrs:
+            skus.setdefault(key + (attrs['instanceType'],), product['sku'])
+
+    rates = {}
+    indexed_skus = set()
+    for term_entry in price_doc['terms']['savingsPlan']:
+        sku = term_entry['sku']
+        if sku in indexed_skus:  # only the first term entry of a SKU was ever read
+            continue
+        indexed_skus.add(sku)
+        for rate in term_entry['rates']:
+            target = _rate_target(region_code, rate['discountedUsageType'])
+            if target:
+                rates.setdefault((sku, rate['discountedOperation']) + target, float(rate['discountedRate']['price']))
+
+    return _compact_rate_index(skus, rates)
+
+def _composite_key(codes, sizes):
+    key = codes[0]
+    for code, size in zip(codes[1:], sizes[1:]):
+        key = key * size + code
+    return key
+
+def _compact_rate_index(skus, rates):
+    """
+    Packs the rate dict into per-column vocabularies plus one int64 key and one float per rate.
+    That is a fraction of the memory of tuple-keyed dicts, and the grid can join millions of
+    rows against the keys with a single get_indexer call.
+    """
+    vocab = [{}, {}, {}, {}]  # sku, usage_operation, tenancy, target -> code
+    codes = [[], [], [], []]
+    for key in rates:
+        for part, value in enumerate(key):
+            codes[part].append(vocab[part].setdefault(value, len(vocab[part])))
+    sizes = [max(len(v), 1) for v in vocab]
+    return {
+        'skus': skus,
+        'vocab': vocab,
+        'sizes': sizes,
+        'keys': pd.Index(_composite_key([np.asarray(c, dtype=np.int64) for c in codes], sizes)),
+        'rates': np.fromiter(rates.values(), dtype=float, count=len(rates)),
+    }
 
+def _lookup_rate(index, sku, usage_operation, tenancy, target):
+    codes = [vocab.get(value, -1) for vocab, value in zip(index['vocab'], (sku, usage_operation, tenancy, target))]
+    if min(codes) < 0:
+        return None
+    try:
+        return float(index['rates'][index['keys'].get_loc(_composite_key(codes, index['sizes']))])
+    except KeyError:
+        return None
 
-def get_pricing_by_region(region_code):
-    if (region_code not in region_price): #check if region pricing is already loaded
-        for region in region_price_index:
-            if (region['regionCode'] == region_code):
-                region_price_api_url = "https://pricing.us-east-1.amazonaws.com" + region['versionUrl']
-                region_price_response = requests.get(region_price_api_url, timeout=5)
-                #save pricing by region
-                region_price[region_code] = region_price_response.json()
-                break
-    return region_price[region_code]
+def get_sp_rate_index(region_code):
+    """
+    Compact SP rate index for a region, built on first use and held in the bounded region cache.
+    Indexes are keyed by (region, versionUrl), so a newly published version is picked up once the
+    region index is refreshed.
+    """
+    version_url = get_sp_version_url(region_code)
+    return sp_region_cache.get_or_load(
+        (region_code, version_url), lambda: build_sp_rate_index(region_code, get_pricing_by_region(region_code, version_url)))
 
 def get_savings_plan_rate(region_code, usage_operation, instance_family, instance_type, tenancy, sp_type, term, purchasing_option):
-    region_price = get_pricing_by_region(region_code)
-    sku = ''
-    sp_rate = None
-    products = region_price['products']
-
-    # Step 1: Find correct SKU
-    for product in products:
-        if (product['attributes']['purchaseOption'] == purchasing_option and
-            product['attributes']['purchaseTerm'] == term and
-            product['productFamily'] == sp_type and
-            #(sp_type == "ComputeSavingsPlans" or product['attributes']['instanceType'] == instance_family)
-            ((sp_type == "ComputeSavingsPlans") or
-             (sp_type == "EC2InstanceSavingsPlans" and 'instanceType' in product['attributes'] and product['attributes']['instanceType'] == instance_family)
-            )):
-            sku = product['sku']
-            break  # Use the first match
-
-    
+    metrics.count("sp.rate_lookups")
+    index = get_sp_rate_index(region_code)
 
+    # Step 1: Find correct SKU (Compute SPs are not family specific)
+    family_key = None if sp_type == "ComputeSavingsPlans" else instance_family
+    sku = index['skus'].get((sp_type, term, purchasing_option, family_key))
     if not sku:
         logging.warning(f"No SKU found for {sp_type} - {instance_family} in {region_code} ({term}, {purchasing_option})")
         return None
 
-    # Step 2: Find matching savings plan rate using SKU
-    terms = region_price['terms']['savingsPlan']
-    for term_entry in terms:
-        if term_entry['sku'] == sku:
-            for rate in term_entry['rates']:
-                if usage_operation == rate['discountedOperation']:
-                    dut = rate['discountedUsageType']
-
-                    # Tenancy: Shared
-                    if tenancy == 'Shared':
-                        if dut.endswith("-BoxUsage:" + instance_type):
-                            sp_rate = float(rate['discountedRate']['price'])
-                            break
-                        elif region_code == 'us-east-1' and dut == "BoxUsage:" + instance_type:
-                            sp_rate = float(rate['discountedRate']['price'])
-                            break
-
-                    # Tenancy: Dedicated Instance
-                    elif tenancy == 'Dedicated Instance' and dut.endswith("DedicatedUsage:" + instance_type):
-                        sp_rate = float(rate['discountedRate']['price'])
-                        break
-
-                    # Tenancy: Dedicated Host
-                    elif tenancy == 'Dedicated Host' and dut.endswith("HostUsage:" + instance_family):
-                        sp_rate = float(rate['discountedRate']['price'])
-                        break
-            break  # Exit after processing matching SKU
+    # Step 2: Find matching savings plan rate using SKU (Dedicated Host rates are per family)
+    target = instance_family if tenancy == 'Dedicated Host' else instance_type
+    sp_rate = _lookup_rate(index, sku, usage_operation, tenancy, target)
 
     if sp_rate is None:
         logging.warning(f"No rate found for {instance_type} in {region_code} ({sp_type}, {tenancy}, {term}, {purchasing_option})")
@@ -206,17 +310,139 @@ region_name_map = {
     'us-gov-west-1': 'AWS GovCloud (US-West)'
 }
 
-from pprint import pprint  # Add this at the top if not already
+# Mapping: Usage Operation Code → preInstalledSw value in the EC2 offer file / Pricing API
+preinstalled_sw_map = {
+    "RunInstances:0002": "NA",  # Windows
+    "RunInstances:0800": "NA",
+    "RunInstances:0004": "SQL Std",
+    "RunInstances:0006": "SQL Std",
+    "RunInstances:0014": "SQL Std",
+    "RunInstances:0100": "SQL Ent",
+    "RunInstances:0102": "SQL Ent",
+    "RunInstances:0110": "SQL Ent",
+    "RunInstances:0200": "SQL Web",
+    "RunInstances:0202": "SQL Web",
+    "RunInstances:0210": "SQL Web",
+    "RunInstances:0010": "NA",
+    "RunInstances:1010": "NA",
+    "RunInstances:1014": "SQL Std",
+    "RunInstances:1110": "SQL Ent",
+    "RunInstances:000g": "NA",
+    "RunInstances:0g00": "NA"
+}
+
+#On-Demand rate tables built from the stored regional offer files, evicted least-recently-used
+#beyond the memory budget. Tables are keyed by (region, stored offer version), so a refreshed
+#offer is picked up on the next lookup. A region whose table cannot be built is retried after OD_FAILURE_TTL.
+OD_CACHE_MAX_MB = int(os.environ.get("OD_CACHE_MAX_MB", 256))
+OD_CACHE_MAX_REGIONS = int(os.environ.get("OD_CACHE_MAX_REGIONS", 0)) or None
+OD_FAILURE_TTL = int(os.environ.get("OD_FAILURE_TTL", 60))  # seconds
+on_demand_rate_table = MemoryBoundedCache(max_bytes=OD_CACHE_MAX_MB * 1024 * 1024, max_entries=OD_CACHE_MAX_REGIONS)
+_on_demand_table_failures = {}  # region -> time of the last failed build
+
+@metrics.timed("od.table_build")
+def build_on_demand_rate_table(region_code):
+    """
+    Builds (instanceType, operation, tenancy, preInstalledSw) -> On-Demand USD/hr for a region
+    from its offer file in the local pricing store (ingested on first use).
+    Tenancy is keyed in the lowercase Pricing API form (shared / dedicated / host).
+    Only the region's own location is read: its offer file also lists Local Zone and Wavelength
+    SKUs under the same keys, as the Pricing API did before its `location` filter.
+    """
+    location = region_name_map.get(region_code)
+    if not location:
+        raise KeyError(f"Region '{region_code}' not mapped")
+    pricing_store.ensure_region(region_code)
+    columns = ["Location", "Instance Type", "Operation", "Tenancy", "Pre Installed S/W", "CapacityStatus", "Unit",
+               "PricePerUnit"]
+    table = pricing_store.load_partition(region_code, "OnDemand").select(columns).to_pydict()
+
+    rates = {}
+    for sku_location, inst_type, operation, tenancy, pre_sw, capacity, unit, price in zip(*(table[c] for c in columns)):
+        if sku_location != location or capacity != "Used" or unit != "Hrs" or not tenancy:
+            continue
+        rates.setdefault((inst_type, operation, tenancy.lower(), pre_sw), price)
+    return rates
+
+def get_on_demand_rate_table(region_code):
+    """The region's On-Demand rate table, or an empty one (lookups then fall back to the Pricing API)."""
+    failed_at = _on_demand_table_failures.get(region_code)
+    if failed_at is not None and time.time() - failed_at < OD_FAILURE_TTL:
+        return {}
+    try:
+        if region_code not in region_name_map:
+            raise KeyError(f"Region '{region_code}' not mapped")
+        version = pricing_store.ensure_region(region_code).get("version")
+        table = on_demand_rate_table.get_or_load((region_code, version), lambda: build_on_demand_rate_table(region_code))
+    except Exception as e:
+        # Not cached: the build is tried again once OD_FAILURE_TTL has passed
+        logging.error(f"Could not build On-Demand rate table for {region_code}: {e}")
+        _on_demand_table_failures[region_code] = time.time()
+        return {}
+    _on_demand_table_failures.pop(region_code, None)
+    return table
+
+def lookup_on_demand_rate(region_code, usage_operation, instance_type, tenancy):
+    """In-memory On-Demand rate lookup; returns None on a miss."""
+    api_tenancy = tenancy_friendly_to_api.get(tenancy, tenancy.lower())
+    pre_val = preinstalled_sw_map.get(usage_operation, "NA")
+    return get_on_demand_rate_table(region_code).get((instance_type, usage_operation, api_tenancy, pre_val))
+
+def on_demand_rates(region_code, usage_operation, instance_types, tenancy="Shared"):
+    """On-Demand USD/hr for each of `instance_types` from the local rate table; NaN where there is none."""
+    table = get_on_demand_rate_table(region_code)
+    api_tenancy = tenancy_friendly_to_api.get(tenancy, tenancy.lower())
+    pre_val = preinstalled_sw_map.get(usage_operation, "NA")
+    rates = np.array([table.get((it, usage_operation, api_tenancy, pre_val), np.nan) for it in instance_types], dtype=float)
+    metrics.count("od.rate_lookups", len(rates))
+    # A zero rate means "not found", as with get_on_demand_rate
+    rates[rates == 0] = np.nan
+    return rates
+
+def savings_plan_rates(region_code, usage_operation, instance_types, tenancy="Shared",
+                       sp_type="ComputeSavingsPlans", term="1yr", purchasing_option="No Upfront"):
+    """
+    Savings Plan USD/hr for each of `instance_types`, joined against the region's SP rate index
+    in one get_indexer call; NaN where no rate is published.
+    """
+    index = get_sp_rate_index(region_code)
+    sku_vocab, op_vocab, tenancy_vocab, target_vocab = index['vocab']
+    families = [it.split('.')[0] for it in instance_types]
+    metrics.count("sp.rate_lookups", len(instance_types))
+
+    sku_codes = {}
+    for family in set(families):
+        family_key = None if sp_type == "ComputeSavingsPlans" else family
+        sku_codes[family] = sku_vocab.get(index['skus'].get((sp_type, term, purchasing_option, family_key)), -1)
+    # Dedicated Host rates are per family, everything else per instance type
+    targets = families if tenancy == 'Dedicated Host' else instance_types
+    parts = [
+        np.array([sku_codes[family] for family in families], dtype=np.int64),
+        np.full(len(instance_types), op_vocab.get(usage_operation, -1), dtype=np.int64),
+        np.full(len(instance_types), tenancy_vocab.get(tenancy, -1), dtype=np.int64),
+        np.array([target_vocab.get(target, -1) for target in targets], dtype=np.int64),
+    ]
+    valid = np.logical_and.reduce([part >= 0 for part in parts])
+    keys = np.where(valid, _composite_key(parts, index['sizes']), -1)
+    pos = index['keys'].get_indexer(keys)
+    return np.where(pos >= 0, index['rates'][pos], np.nan)
 
 def get_on_demand_rate(region_code, usage_operation, instance_type, tenancy):
     """
-    Fetches the On-Demand rate from AWS Pricing API based on region, instance type, OS, and tenancy.
+    Fetches the On-Demand rate for region, instance type, OS, and tenancy.
+    Served from the local On-Demand rate table; the AWS Pricing API is only queried on a miss.
     """
     location = region_name_map.get(region_code)
     if not location:
         logging.warning(f"Region '{region_code}' not mapped.")
         return 0.0
 
+    metrics.count("od.rate_lookups")
+    price = lookup_on_demand_rate(region_code, usage_operation, instance_type, tenancy)
+    if price is not None:
+        return price
+    metrics.count("od.table_misses")
+
     # Build filters based on OS, tenancy, and optional SQL licensing
     def build_filters(os_friendly, usage_operation, include_operation=True):
         api_tenancy = tenancy_friendly_to_api.get(tenancy, tenancy.lower())
@@ -229,25 +455,6 @@ def get_on_demand_rate(region_code, usage_operation, instance_type, tenancy):
             {"Type": "TERM_MATCH", "Field": "capacitystatus", "Value": "Used"},
         ]
         # Optional SQL licensing filters
-        preinstalled_sw_map = {
-            "RunInstances:0002": "NA",  # Windows
-            "RunInstances:0800": "NA",
-            "RunInstances:0004": "SQL Std",
-            "RunInstances:0006": "SQL Std",
-            "RunInstances:0014": "SQL Std",
-            "RunInstances:0100": "SQL Ent",
-            "RunInstances:0102": "SQL Ent",
-            "RunInstances:0110": "SQL Ent",
-            "RunInstances:0200": "SQL Web",
-            "RunInstances:0202": "SQL Web",
-            "RunInstances:0210": "SQL Web",
-            "RunInstances:0010": "NA",
-            "RunInstances:1010": "NA",
-            "RunInstances:1014": "SQL Std",
-            "RunInstances:1110": "SQL Ent",
-            "RunInstances:000g": "NA",
-            "RunInstances:0g00": "NA"
-        }
         pre_val = preinstalled_sw_map.get(usage_operation)
         if pre_val and pre_val != "NA":
             filters.append({"Type": "TERM_MATCH", "Field": "preInstalledSw", "Value": pre_val})
@@ -263,11 +470,13 @@ def get_on_demand_rate(region_code, usage_operation, instance_type, tenancy):
         filters = build_filters(os_friendly, usage_operation, include_operation)
         try:
             # Query AWS Pricing API
-            response = pricing_client.get_products(
-                ServiceCode='AmazonEC2',
-                Filters=filters,
-                MaxResults=100
-            )
+            metrics.count("od.api_calls")
+            with metrics.span("od.api_call"):
+                response = get_pricing_client().get_products(
+                    ServiceCode='AmazonEC2',
+                    Filters=filters,
+                    MaxResults=100
+                )
             if not response['PriceList']:
                 return None
 
@@ -302,26 +511,6 @@ def get_on_demand_rate(region_code, usage_operation, instance_type, tenancy):
         return price
 
     # DEBUG: Try to inspect what products AWS returns (if any)
-    preinstalled_sw_map = {
-        "RunInstances:0002": "NA",  # Windows
-        "RunInstances:0800": "NA",
-        "RunInstances:0004": "SQL Std",
-        "RunInstances:0006": "SQL Std",
-        "RunInstances:0014": "SQL Std",
-        "RunInstances:0100": "SQL Ent",
-        "RunInstances:0102": "SQL Ent",
-        "RunInstances:0110": "SQL Ent",
-        "RunInstances:0200": "SQL Web",
-        "RunInstances:0202": "SQL Web",
-        "RunInstances:0210": "SQL Web",
-        "RunInstances:0010": "NA",
-        "RunInstances:1010": "NA",
-        "RunInstances:1014": "SQL Std",
-        "RunInstances:1110": "SQL Ent",
-        "RunInstances:000g": "NA",
-        "RunInstances:0g00": "NA"
-    }
-
     debug_filters = [
     {"Type": "TERM_MATCH", "Field": "location", "Value": location},
     {"Type": "TERM_MATCH", "Field": "instanceType", "Value": instance_type},
@@ -342,7 +531,8 @@ def get_on_demand_rate(region_code, usage_operation, instance_type, tenancy):
 
 
     try:
-        debug_resp = pricing_client.get_products(
+        metrics.count("od.api_calls")
+        debug_resp = get_pricing_client().get_products(
             ServiceCode='AmazonEC2',
             Filters=debug_filters,
             MaxResults=100
@@ -356,6 +546,87 @@ def get_on_demand_rate(region_code, usage_operation, instance_type, tenancy):
     return 0.0
 
 
+# Column layout of the Savings Plan comparison grid shown in app.py
+SP_GRID_COLUMNS = ["AWS Region", "Operating System", "Instance Type", "Tenancy", "Savings Plan Type",
+                   "Term", "Purchasing Option", "Savings Plan Rate ($)", "On-Demand Rate ($)",
+                   "Savings over On-Demand (%)"]
+
+def _region_sp_grid(region_code, regions, operating_systems, tenancies, instance_types, sp_types, terms, purchasing_options):
+    shape = (len(operating_systems), len(tenancies), len(instance_types), len(sp_types), len(terms), len(purchasing_options))
+    o, t, i, s, e, p = (axis.ravel() for axis in np.indices(shape, dtype=np.int32))
+    families = [it.split('.')[0] for it in instance_types]
+    usage_operations = [operation_by_platform_dict.get(os_name) for os_name in operating_systems]
+
+    # Savings Plan rate: resolve SKU / operation / tenancy / target per distinct dimension value,
+    # then join every grid row against the encoded rate keys in one vectorized lookup
+    sp_rate = np.full(len(o), np.nan)
+    metrics.count("sp.rate_lookups", len(o))
+    try:
+        index = get_sp_rate_index(region_code)
+        sku_vocab, op_vocab, tenancy_vocab, target_vocab = index['vocab']
+
+        sku_codes = np.full(shape[3:] + (len(instance_types),), -1, dtype=np.int64)
+        for si, sp_type in enumerate(sp_types):
+            for ei, term in enumerate(terms):
+                for pi, purchasing_option in enumerate(purchasing_options):
+                    for ii, family in enumerate(families):
+                        family_key = None if sp_type == "ComputeSavingsPlans" else family
+                        sku = index['skus'].get((sp_type, term, purchasing_option, family_key))
+                        sku_codes[si, ei, pi, ii] = sku_vocab.get(sku, -1)
+        op_codes = np.array([op_vocab.get(op, -1) for op in usage_operations], dtype=np.int64)
+        tenancy_codes = np.array([tenancy_vocab.get(ten, -1) for ten in tenancies], dtype=np.int64)
+        # Dedicated Host rates are per family, everything else per instance type
+        target_codes = np.array([[target_vocab.get(fam if ten == 'Dedicated Host' else it, -1)
+                                  for it, fam in zip(instance_types, families)] for ten in tenancies], dtype=np.int64)
+
+        parts = [sku_codes[s, e, p, i], op_codes[o], tenancy_codes[t], target_codes[t, i]]
+        valid = np.logical_and.reduce([part >= 0 for part in parts])
+        keys = np.where(valid, _composite_key(parts, index['sizes']), -1)
+        pos = index['keys'].get_indexer(keys)
+        sp_rate = np.where(pos >= 0, index['rates'][pos], np.nan)
+    except Exception as err:
+        logging.warning(f"No Savings Plan rates for {region_code}: {err}")
+
+    # On-Demand rate depends only on (OS, tenancy, instance type): look those up once and broadcast
+    od_table = get_on_demand_rate_table(region_code)
+    od_cube = np.array([[[od_table.get((it, op, tenancy_friendly_to_api.get(ten, ten.lower()), preinstalled_sw_map.get(op, "NA")), np.nan)
+                          for it in instance_types] for ten in tenancies] for op in usage_operations], dtype=float)
+    on_demand = od_cube[o, t, i]
+    metrics.count("od.rate_lookups", od_cube.size)
+    # A zero On-Demand rate means "not found", as with get_on_demand_rate
+    on_demand[on_demand == 0] = np.nan
+
+    columns = {
+        "AWS Region": pd.Categorical.from_codes(np.full(len(o), regions.index(region_code)), categories=regions),
+        "Operating System": pd.Categorical.from_codes(o, categories=operating_systems),
+        "Instance Type": pd.Categorical.from_codes(i, categories=instance_types),
+        "Tenancy": pd.Categorical.from_codes(t, categories=tenancies),
+        "Savings Plan Type": pd.Categorical.from_codes(s, categories=sp_types),
+        "Term": pd.Categorical.from_codes(e, categories=terms),
+        "Purchasing Option": pd.Categorical.from_codes(p, categories=purchasing_options),
+        "Savings Plan Rate ($)": sp_rate,
+        "On-Demand Rate ($)": on_demand,
+        "Savings over On-Demand (%)": np.round((1 - sp_rate / on_demand) * 100, 1),
+    }
+    return pd.DataFrame(columns)
+
+def get_savings_plan_grid(regions, operating_systems, tenancies, instance_types, sp_types, terms, purchasing_options):
+    """
+    Savings Plan vs On-Demand comparison for every combination of the selected dimensions.
+    Rates come from joins against the SP rate index and the local On-Demand rate table (no
+    Pricing API calls); missing rates are NaN and savings are computed column-wise.
+    """
+    dims = [list(dict.fromkeys(values)) for values in
+            (regions, operating_systems, tenancies, instance_types, sp_types, terms, purchasing_options)]
+    if not all(dims):
+        return pd.DataFrame(columns=SP_GRID_COLUMNS)
+    # Regions are independent, so their rate tables load and join in parallel
+    with metrics.span("sp.grid"), ThreadPoolExecutor(max_workers=min(MAX_THREADS, len(dims[0]))) as pool:
+        frames = list(pool.map(metrics.in_context(lambda region: _region_sp_grid(region, *dims)), dims[0]))
+    result = pd.concat(frames, ignore_index=True)
+    metrics.count("sp.grid_rows", len(result))
+    return result
+
 
 # import requests
 # import json
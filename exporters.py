@@ -0,0 +1,202 @@
+# --- Chunked result writers ---
+# Results are written in fixed-size row chunks as they are produced, so exporting a grid of
+# millions of rows never needs the whole result (or its encoded file) in memory at once.
+# Every writer takes a path or a binary file object (e.g. a temporary file behind a download).
+
+import io
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+import metrics
+
+CHUNK_ROWS = 100_000
+XLSX_MAX_ROWS = 1_048_576  # per sheet, including the header row
+
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _plain(df: pd.DataFrame) -> pd.DataFrame:
+    # Categories differ between chunks, so categoricals are written as their plain values
+    categoricals = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    return df.astype({c: object for c in categoricals}) if categoricals else df
+
+
+class CsvChunkWriter:
+    """Appends DataFrame chunks to one CSV file; the header is written with the first chunk."""
+
+    def __init__(self, target):
+        self.rows = 0
+        self._owned = isinstance(target, str)
+        if self._owned:
+            self._file = open(target, "w", newline="", encoding="utf-8")
+        else:
+            self._file = io.TextIOWrapper(target, encoding="utf-8", newline="")
+        self._header = True
+
+    def write(self, df: pd.DataFrame):
+        if self._header and df.empty:
+            df.to_csv(self._file, index=False)
+            self._header = False
+        for chunk in iter_chunks(df):
+            chunk.to_csv(self._file, index=False, header=self._header)
+            self._header = False
+            self.rows += len(chunk)
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+        else:
+            # Leave the caller's file open
+            self._file.flush()
+            self._file.detach()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetChunkWriter:
+    """Writes DataFrame chunks as row groups of one Parquet file; the first chunk fixes the schema."""
+
+    def __init__(self, target, schema: pa.Schema = None):
+        self.target = target
+        self.rows = 0
+        self.schema = schema
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        if self.schema is None:
+            inferred = pa.Schema.from_pandas(_plain(df.head(CHUNK_ROWS)), preserve_index=False)
+            # An all-empty column in the first chunk would otherwise be typed null
+            self.schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                     for f in inferred]).remove_metadata()
+        for chunk in iter_chunks(df):
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.target, self.schema)
+            self._writer.write_table(pa.Table.from_pandas(_plain(chunk), schema=self.schema, preserve_index=False))
+            self.rows += len(chunk)
+
+    def close(self):
+        if self._writer is None and self.schema is not None:
+            self._writer = pq.ParquetWriter(self.target, self.schema)
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class XlsxChunkWriter:
+    """
+    Streams DataFrame chunks into an XLSX workbook with one sheet per region, using openpyxl's
+    write-only mode (rows go to temporary files, not an in-memory cell grid). Sheets that
+    reach Excel's row limit continue on "<region> (2)", "<region> (3)", ...
+    """
+
+    SHEET_COLUMNS = ("Region", "AWS Region")
+    DEFAULT_SHEET = "Pricing"
+
+    def __init__(self, target, sheet_column: str = None):
+        self.target = target
+        self.rows = 0
+        self.sheet_column = sheet_column
+        self._workbook = Workbook(write_only=True)
+        self._sheets = {}  # group -> [worksheet, rows written, part number]
+        self._columns = None
+
+    def _sheet(self, group: str):
+        entry = self._sheets.get(group)
+        if entry is None or entry[1] >= XLSX_MAX_ROWS:
+            part = entry[2] + 1 if entry else 1
+            title = group if part == 1 else f"{group} ({part})"
+            # Sheet titles are limited to 31 characters and may not contain []:*?/\
+            title = "".join("_" if ch in "[]:*?/\\" else ch for ch in title)[:31]
+            sheet = self._workbook.create_sheet(title=title)
+            sheet.append(self._columns)
+            entry = self._sheets[group] = [sheet, 1, part]
+        return entry
+
+    def write(self, df: pd.DataFrame):
+        if self._columns is None:
+            self._columns = [str(c) for c in df.columns]
+            if self.sheet_column is None:
+                self.sheet_column = next((c for c in self.SHEET_COLUMNS if c in df.columns), None)
+        for chunk in iter_chunks(df):
+            if self.sheet_column:
+                groups = chunk[self.sheet_column].astype(str).to_numpy()
+            else:
+                groups = [self.DEFAULT_SHEET] * len(chunk)
+            # NaN is not a valid cell value; empty cells are written instead
+            cells = _plain(chunk).astype(object).where(chunk.notna(), None)
+            for group, rows in cells.groupby(groups, sort=False):
+                entry = self._sheet(group)
+                for row in rows.itertuples(index=False, name=None):
+                    if entry[1] >= XLSX_MAX_ROWS:
+                        entry = self._sheet(group)
+                    entry[0].append(row)
+                    entry[1] += 1
+            self.rows += len(chunk)
+
+    def close(self):
+        if not self._sheets:
+            # Empty result: a single sheet with just the header
+            if self._columns is not None:
+                self._sheet(self.DEFAULT_SHEET)
+            else:
+                self._workbook.create_sheet(title=self.DEFAULT_SHEET)
+        self._workbook.save(self.target)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+WRITERS = {
+    "csv": CsvChunkWriter,
+    "parquet": ParquetChunkWriter,
+    "xlsx": XlsxChunkWriter,
+}
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def open_writer(target, fmt: str = None):
+    """Chunk writer for a path or binary file; the format defaults to the path's extension."""
+    fmt = (fmt or os.path.splitext(target)[1].lstrip(".")).lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format '{fmt}', expected one of {sorted(WRITERS)}")
+    return WRITERS[fmt](target)
+
+
+def export_frames(frames, fmt: str):
+    """
+    Writes an iterable of DataFrames to an anonymous temporary file and returns it rewound, as
+    the unbuffered file object st.download_button reads in one call (it rejects buffered ones).
+    """
+    f = tempfile.TemporaryFile()
+    with metrics.span(f"export.{fmt}"), open_writer(f, fmt) as writer:
+        for df in frames:
+            writer.write(df)
+    metrics.count("export.rows", writer.rows)
+    metrics.count("export.bytes", f.tell())
+    f.seek(0)
+    return f.detach()
@@ -0,0 +1,180 @@
+# --- Fleet Compute Savings Plan commitment optimizer ---
+# Finds the hourly Compute Savings Plan commitment C ($/hr) that minimizes the total cost of a
+# fleet usage matrix (hour x instance type x region).
+#
+# Each hour, AWS applies the commitment to the usage with the highest discount first. One SP
+# dollar buys 1/s instance-hours worth o/s On-Demand dollars, so an hour's savings are a concave
+# piecewise-linear function of C. Its slopes are the o/s ratios in discount order, and its
+# breakpoints are the cumulative SP cost of that hour's usage. The fleet cost
+#     T * C + OnDemand total - sum_h savings_h(C)
+# is convex, with derivative T - sum_h slope_h(C). Columns are sorted by discount once and each
+# hour's breakpoints come from one cumulative sum. Every breakpoint lowers the summed slope by a
+# known step, so after one sort of all breakpoints the optimum is the first one where the
+# summed slope drops to T or below. There is no grid search over commitment levels.
+#
+# Usage:
+#   python fleet_optimizer.py usage.csv [--term 3yr] [--purchasing-option "All Upfront"] [--os Linux/UNIX]
+#   usage.csv has one row per (hour, region, instance_type) with a `count` of running instances.
+
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from cost_model import HOURS_PER_MONTH
+from ec2_sp_backend import on_demand_rates, operation_by_platform_dict, savings_plan_rates
+
+logger = logging.getLogger(__name__)
+
+
+def fleet_matrix(usage: pd.DataFrame):
+    """
+    (hours x instance types x regions) array of instance counts from a long table with
+    hour, region, instance_type and count columns, plus the instance type and region labels.
+    """
+    hours, hour_index = np.unique(usage["hour"].to_numpy(), return_inverse=True)
+    types, type_index = np.unique(usage["instance_type"].astype(str).to_numpy(), return_inverse=True)
+    regions, region_index = np.unique(usage["region"].astype(str).to_numpy(), return_inverse=True)
+    matrix = np.zeros((len(hours), len(types), len(regions)))
+    np.add.at(matrix, (hour_index, type_index, region_index), usage["count"].to_numpy(dtype=float))
+    return matrix, types.tolist(), regions.tolist()
+
+
+def fleet_rates(instance_types, regions, os="Linux/UNIX", tenancy="Shared", term="1yr",
+                purchasing_option="No Upfront"):
+    """(instance types x regions) On-Demand and Compute Savings Plan hourly rates; NaN where missing."""
+    usage_operation = operation_by_platform_dict.get(os, os)
+    ondemand = np.full((len(instance_types), len(regions)), np.nan)
+    sp = np.full((len(instance_types), len(regions)), np.nan)
+    for r, region in enumerate(regions):
+        ondemand[:, r] = on_demand_rates(region, usage_operation, instance_types, tenancy)
+        try:
+            sp[:, r] = savings_plan_rates(region, usage_operation, instance_types, tenancy,
+                                          "ComputeSavingsPlans", term, purchasing_option)
+        except Exception as e:
+            logger.warning(f"No Savings Plan rates for {region}, its usage stays On-Demand: {e}")
+    return ondemand, sp
+
+
+def _coverage_curves(usage, ondemand, sp):
+    """
+    Usage as (hours x columns) in descending discount order, with per hour cumulative SP cost
+    (breakpoints) and cumulative On-Demand cost, and each column's o/s ratio.
+    """
+    order = np.argsort(sp / ondemand, kind="stable")  # lowest SP/OD ratio = highest discount first
+    usage = usage[:, order]
+    ratio = (ondemand / sp)[order]
+    sp_cost = np.cumsum(usage * sp[order], axis=1)
+    od_cost = np.cumsum(usage * ondemand[order], axis=1)
+    return sp_cost, od_cost, ratio
+
+
+def optimal_commitment(usage, ondemand, sp) -> float:
+    """
+    Cost-minimizing hourly commitment for `usage` (hours x columns) with per-column On-Demand
+    and Savings Plan rates. Every column must have both rates.
+    """
+    hours = usage.shape[0]
+    if not usage.size:
+        return 0.0
+    sp_cost, _, ratio = _coverage_curves(usage, ondemand, sp)
+    # At each breakpoint the hour's slope steps from the column's ratio to the next one's (0 after the last)
+    steps = np.append(ratio[1:], 0.0) - ratio
+    breakpoints = sp_cost.ravel()
+    order = np.argsort(breakpoints, kind="stable")
+    slope = hours * ratio[0] + np.cumsum(np.broadcast_to(steps, sp_cost.shape).ravel()[order])
+    # Savings per extra dollar fall below the dollar itself: stop at the first such breakpoint
+    stop = np.flatnonzero(slope <= hours)
+    if hours * ratio[0] <= hours or not len(stop):
+        return 0.0
+    return float(breakpoints[order[stop[0]]])
+
+
+def fleet_cost(usage, ondemand, sp, commitment: float) -> dict:
+    """Cost breakdown of `usage` under an hourly commitment, applied highest discount first each hour."""
+    hours = usage.shape[0]
+    sp_cost, od_cost, ratio = _coverage_curves(usage, ondemand, sp)
+    on_demand_total = float(od_cost[:, -1].sum()) if usage.size else 0.0
+    if not usage.size:
+        return {"commitment": commitment, "total": hours * commitment, "on_demand": 0.0,
+                "savings": 0.0, "utilization": 0.0, "coverage": 0.0}
+    # Column of each hour in which the commitment runs out, and the On-Demand value it covered
+    k = (sp_cost < commitment).sum(axis=1)
+    full = np.where(k > 0, od_cost[np.arange(hours), np.maximum(k - 1, 0)], 0.0)
+    spent = np.where(k > 0, sp_cost[np.arange(hours), np.maximum(k - 1, 0)], 0.0)
+    partial = np.where(k < len(ratio), (commitment - spent) * ratio[np.minimum(k, len(ratio) - 1)], 0.0)
+    covered = full + partial
+    used = np.minimum(commitment, sp_cost[:, -1])
+    total = hours * commitment + on_demand_total - float(covered.sum())
+    return {
+        "commitment": commitment,
+        "total": total,
+        "on_demand": on_demand_total,
+        "savings": on_demand_total - total,
+        "utilization": float(used.sum() / (hours * commitment)) if commitment else 0.0,
+        "coverage": float(covered.sum() / on_demand_total) if on_demand_total else 0.0,
+    }
+
+
+@metrics.timed("fleet.optimize")
+def optimize_fleet(usage, instance_types, regions, os="Linux/UNIX", tenancy="Shared", term="1yr",
+                   purchasing_option="No Upfront", rates=None) -> dict:
+    """
+    Optimal Compute Savings Plan commitment for a fleet usage array (hours x instance types x
+    regions). `rates` = (ondemand, sp) arrays (instance types x regions) skip the rate lookup.
+    Usage without an On-Demand rate is left out. Usage without an SP rate stays On-Demand.
+    Costs are per month, scaled from the hours in `usage`.
+    """
+    usage = np.asarray(usage, dtype=float)
+    ondemand, sp = rates if rates is not None else fleet_rates(instance_types, regions, os, tenancy, term, purchasing_option)
+    usage = usage.reshape(usage.shape[0], -1)
+    ondemand, sp = ondemand.ravel(), sp.ravel()
+
+    used = usage.sum(axis=0) > 0
+    priced = ~np.isnan(ondemand) & (ondemand > 0)
+    unpriced_hours = usage[:, ~priced].sum()
+    if unpriced_hours:
+        logger.warning(f"{unpriced_hours:.0f} instance-hours have no On-Demand rate and were left out")
+    eligible = used & priced & ~np.isnan(sp) & (sp < ondemand)
+    # Usage no Savings Plan discounts is On-Demand whatever the commitment
+    fixed = float((usage[:, priced & ~eligible] * ondemand[priced & ~eligible]).sum())
+
+    eligible_usage, od, rate = usage[:, eligible], ondemand[eligible], sp[eligible]
+    commitment = optimal_commitment(eligible_usage, od, rate)
+    result = fleet_cost(eligible_usage, od, rate, commitment)
+    metrics.count("fleet.columns", int(eligible.sum()))
+
+    scale = HOURS_PER_MONTH / usage.shape[0]
+    return {
+        "term": term,
+        "purchasing_option": purchasing_option,
+        "commitment_hourly": commitment,
+        "monthly_cost": (result["total"] + fixed) * scale,
+        "monthly_on_demand_cost": (result["on_demand"] + fixed) * scale,
+        "monthly_savings": result["savings"] * scale,
+        "utilization": result["utilization"],
+        "coverage": result["coverage"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimal Compute Savings Plan commitment for a fleet.")
+    parser.add_argument("usage", help="CSV with hour, region, instance_type and count columns")
+    parser.add_argument("--term", default="1yr", choices=["1yr", "3yr"])
+    parser.add_argument("--purchasing-option", default="No Upfront", choices=["No Upfront", "Partial Upfront", "All Upfront"])
+    parser.add_argument("--os", default="Linux/UNIX")
+    parser.add_argument("--tenancy", default="Shared")
+    args = parser.parse_args(argv)
+
+    matrix, instance_types, regions = fleet_matrix(pd.read_csv(args.usage))
+    result = optimize_fleet(matrix, instance_types, regions, args.os, args.tenancy, args.term, args.purchasing_option)
+    print(f"Commitment:      ${result['commitment_hourly']:.4f}/hr ({args.term}, {args.purchasing_option})")
+    print(f"Monthly cost:    ${result['monthly_cost']:,.2f} (On-Demand only: ${result['monthly_on_demand_cost']:,.2f})")
+    print(f"Monthly savings: ${result['monthly_savings']:,.2f}")
+    print(f"Utilization:     {result['utilization']:.1%}  coverage: {result['coverage']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# --- Local HTTP cache for AWS price files ---
+# Offer and Savings Plan files are published rarely but re-downloaded on every cold start.
+# Bodies are kept on disk next to their ETag / Last-Modified / versionUrl, and later fetches
+# send conditional requests so an unchanged file costs one round-trip (or none, when the
+# versionUrl we already hold is still the published one).
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import requests
+
+import metrics
+
+CACHE_DIR = os.environ.get("EC2_PRICING_CACHE_DIR", ".pricing_cache")
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, "http")
+CHUNK_SIZE = 1 << 20
+
+
+def cache_paths(url: str):
+    """(body path, metadata path) for a URL."""
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, key + ".body"), os.path.join(HTTP_CACHE_DIR, key + ".json")
+
+
+def read_metadata(url: str):
+    body_path, meta_path = cache_paths(url)
+    if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def fetch_to_cache(url: str, version_url: str = None, timeout: int = 90):
+    """
+    Returns (body path, changed) for `url`, downloading only when the cached copy is stale.
+
+    `version_url` is the immutable versioned location from a region index; if it matches the
+    one recorded with the cached body, no request is made at all. Otherwise the request is
+    conditional on the cached ETag / Last-Modified and a 304 reuses the body on disk.
+    """
+    body_path, meta_path = cache_paths(url)
+    meta = read_metadata(url)
+    if meta and version_url and meta.get("versionUrl") == version_url:
+        metrics.count("http.version_hits")
+        return body_path, False
+
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("lastModified"):
+        headers["If-Modified-Since"] = meta["lastModified"]
+
+    metrics.count("http.requests")
+    with metrics.span("http.download"), requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == 304 and meta:
+            metrics.count("http.not_modified")
+            meta.update(versionUrl=version_url or meta.get("versionUrl"), validatedAt=_now())
+            _write_metadata(meta_path, meta)
+            logging.info(f"Not modified, reusing cached body for {url}")
+            return body_path, False
+        r.raise_for_status()
+
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        size = 0
+        # A temp file per fetch, so concurrent downloads of one URL never write into the same file
+        with tempfile.NamedTemporaryFile(dir=HTTP_CACHE_DIR, suffix=".tmp", delete=False) as f:
+            try:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, body_path)
+        _write_metadata(meta_path, {
+            "url": url,
+            "etag": r.headers.get("ETag"),
+            "lastModified": r.headers.get("Last-Modified"),
+            "versionUrl": version_url,
+            "size": size,
+            "fetchedAt": _now(),
+            "validatedAt": _now(),
+        })
+    metrics.count("http.bytes_downloaded", size)
+    logging.info(f"Downloaded {size} bytes from {url}")
+    return body_path, True
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _write_metadata(path: str, meta: dict):
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+        json.dump(meta, f, indent=2)
+    os.replace(f.name, path)
@@ -0,0 +1,108 @@
+# --- Offline EC2 instance-type catalog ---
+# One row per instance type (family, vCPU, memory, architecture, burstable, generation), derived
+# from the offer-file products already in the pricing store and saved as a small Arrow file.
+# Loading it takes milliseconds; describe_instance_types is only an optional refresh source.
+
+import logging
+import os
+import re
+
+import pandas as pd
+import pyarrow as pa
+
+import pricing_store
+
+CATALOG_FILE = os.path.join(pricing_store.STORE_DIR, "instance_catalog.arrow")
+CATALOG_REGION = "us-east-1"
+CATALOG_COLUMNS = ["InstanceType", "Family", "vCPU", "MemoryGiB", "Architecture", "Burstable", "CurrentGeneration"]
+
+BURSTABLE_FAMILY = re.compile(r"^t\d")
+# Arm processors as the offer file names them: processorArchitecture is "64-bit" for most
+# families, so physicalProcessor ("AWS Graviton2 Processor", "Apple M1 chip") decides
+ARM_PROCESSOR = re.compile(r"\b(arm|aarch64|aws graviton|apple m\d)", re.IGNORECASE)
+
+
+def _architecture(processor_architecture, physical_processor) -> str:
+    for attribute in (processor_architecture, physical_processor):
+        if attribute and ARM_PROCESSOR.search(attribute):
+            return "arm64"
+    return "x86_64"
+
+
+def build_catalog(region: str = CATALOG_REGION) -> pd.DataFrame:
+    """Derives the catalog from the stored OnDemand partition of `region`."""
+    pricing_store.ensure_region(region)
+    columns = ["Instance Type", "Family", "vCPU", "Memory (GiB)", "Processor Architecture", "Physical Processor",
+               "Current Generation"]
+    products = (pricing_store.load_partition(region, "OnDemand").select(columns).to_pandas()
+                .drop_duplicates("Instance Type"))
+    products = products.astype({"Instance Type": str, "Family": str})
+    catalog = pd.DataFrame({
+        "InstanceType": products["Instance Type"],
+        "Family": products["Family"],
+        "vCPU": products["vCPU"].astype("int16"),
+        "MemoryGiB": products["Memory (GiB)"].astype("float32"),
+        "Architecture": [_architecture(arch, processor) for arch, processor
+                         in zip(products["Processor Architecture"], products["Physical Processor"])],
+        "Burstable": products["Family"].str.match(BURSTABLE_FAMILY),
+        "CurrentGeneration": products["Current Generation"].astype(str) == "Yes",
+    })
+    return catalog.sort_values("InstanceType").reset_index(drop=True)
+
+
+def _store_version():
+    manifest = pricing_store.read_manifest(CATALOG_REGION) or {}
+    return manifest.get("version") or ""
+
+
+def save_catalog(catalog: pd.DataFrame):
+    os.makedirs(os.path.dirname(CATALOG_FILE) or ".", exist_ok=True)
+    table = pa.Table.from_pandas(catalog[CATALOG_COLUMNS], preserve_index=False)
+    # Tag the file with the offer version it was derived from so a re-ingest rebuilds it
+    table = table.replace_schema_metadata({"version": _store_version()})
+    with pa.OSFile(CATALOG_FILE + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(CATALOG_FILE + ".tmp", CATALOG_FILE)
+
+
+def load_catalog() -> pd.DataFrame:
+    """Returns the instance catalog, (re)building it from the pricing store when missing or stale."""
+    if os.path.exists(CATALOG_FILE):
+        table = pa.ipc.open_file(pa.memory_map(CATALOG_FILE, "r")).read_all()
+        version = (table.schema.metadata or {}).get(b"version", b"").decode()
+        if version == _store_version():
+            return table.to_pandas()
+    catalog = build_catalog()
+    save_catalog(catalog)
+    return catalog
+
+
+def refresh_from_ec2(ec2_client) -> pd.DataFrame:
+    """Optional refresh: overlays describe_instance_types data onto the catalog and saves it."""
+    rows = []
+    paginator = ec2_client.get_paginator("describe_instance_types")
+    for page in paginator.paginate():
+        for it in page["InstanceTypes"]:
+            archs = it.get("ProcessorInfo", {}).get("SupportedArchitectures", [])
+            rows.append({
+                "InstanceType": it["InstanceType"],
+                "Family": it["InstanceType"].split(".")[0],
+                "vCPU": it.get("VCpuInfo", {}).get("DefaultVCpus", 0),
+                "MemoryGiB": it.get("MemoryInfo", {}).get("SizeInMiB", 0) / 1024,
+                "Architecture": "arm64" if "arm64" in archs else "x86_64",
+                "Burstable": bool(it.get("BurstablePerformanceSupported", False)),
+                "CurrentGeneration": bool(it.get("CurrentGeneration", False)),
+            })
+    api = pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+    try:
+        existing = load_catalog()
+    except Exception as e:
+        logging.warning(f"Instance catalog unavailable, refreshing from EC2 only: {e}")
+        existing = pd.DataFrame(columns=CATALOG_COLUMNS)
+    catalog = (pd.concat([api, existing], ignore_index=True)
+               .drop_duplicates("InstanceType")
+               .astype({"vCPU": "int16", "MemoryGiB": "float32", "Burstable": bool, "CurrentGeneration": bool})
+               .sort_values("InstanceType").reset_index(drop=True))
+    save_catalog(catalog)
+    return catalog
@@ -0,0 +1,128 @@
+# --- Memory-bounded LRU cache ---
+# Used for per-region pricing structures that are tens of MB each: entries are evicted in
+# least-recently-used order once their estimated total size exceeds the configured budget.
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimate_size(obj, _seen=None) -> int:
+    """Approximate deep size in bytes of dicts/lists/tuples/sets, NumPy arrays and pandas objects."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    # pandas objects and NumPy arrays report their own buffers
+    if hasattr(obj, "memory_usage"):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if hasattr(obj, "nbytes"):
+        # sys.getsizeof of a NumPy array already includes a buffer the array owns
+        owns_buffer = getattr(getattr(obj, "flags", None), "owndata", False)
+        return sys.getsizeof(obj) + (0 if owns_buffer else int(obj.nbytes))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    return size
+
+
+class MemoryBoundedCache:
+    """
+    Thread-safe LRU cache bounded by estimated bytes and, optionally, entry count.
+    `on_evict(key, value)` is called for every entry dropped to stay within the bounds.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = None, sizeof=estimate_size, on_evict=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.RLock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            evicted = self._evict()
+        # Outside the lock: the callback may take locks of its own
+        if self.on_evict:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def get_or_load(self, key, loader):
+        """Returns the cached value for `key`, calling `loader()` and caching its result on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                value, size = self._entries.pop(key)
+                self.bytes -= size
+                return value
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _evict(self) -> list:
+        # The newest entry is always kept, even if it alone exceeds the budget
+        evicted = []
+        while len(self._entries) > 1 and (
+            self.bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries)
+        ):
+            key, (value, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            evicted.append((key, value))
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
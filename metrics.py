@@ -0,0 +1,168 @@
+# --- Instrumentation ---
+# Process-wide counters and span timings for the pricing hot paths (downloads, offer parsing,
+# store queries, rate lookups, exports). A query_report() collects the same measurements for
+# one user query, including work done on the pool threads it starts (see in_context).
+# snapshot() / dump_metrics() give the machine-readable totals for monitoring.
+
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+METRICS_FILE = os.environ.get("EC2_PRICING_METRICS_FILE")  # dumped after every query report if set
+RECENT_REPORTS = 50
+
+_lock = threading.Lock()
+_dump_lock = threading.Lock()
+_counters = defaultdict(int)
+_spans = {}  # name -> [count, total seconds, max seconds]
+_recent = deque(maxlen=RECENT_REPORTS)
+_started = datetime.now(timezone.utc).isoformat()
+_report = contextvars.ContextVar("metrics_report", default=None)
+
+
+def _add_span(spans: dict, name: str, seconds: float):
+    entry = spans.get(name)
+    if entry is None:
+        spans[name] = [1, seconds, seconds]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+
+def _span_dict(spans: dict) -> dict:
+    return {name: {"count": count, "seconds": round(total, 6), "max_seconds": round(longest, 6)}
+            for name, (count, total, longest) in sorted(spans.items())}
+
+
+class QueryReport:
+    """Spans and counters recorded while one query ran."""
+
+    def __init__(self, name: str, **labels):
+        self.name = name
+        self.labels = labels
+        self.started = datetime.now(timezone.utc).isoformat()
+        self.seconds = None
+        self.counters = defaultdict(int)
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "labels": self.labels,
+                "started": self.started,
+                "seconds": None if self.seconds is None else round(self.seconds, 6),
+                "spans": _span_dict(self.spans),
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+
+def count(name: str, n: int = 1):
+    with _lock:
+        _counters[name] += n
+    report = _report.get()
+    if report is not None:
+        with report._lock:
+            report.counters[name] += n
+
+
+def record_span(name: str, seconds: float):
+    with _lock:
+        _add_span(_spans, name, seconds)
+    report = _report.get()
+    if report is not None:
+        with report._lock:
+            _add_span(report.spans, name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def query_report(name: str, **labels):
+    """Collects everything measured inside the block into a QueryReport."""
+    report = QueryReport(name, **labels)
+    token = _report.set(report)
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report.seconds = time.perf_counter() - start
+        _report.reset(token)
+        record_span(name, report.seconds)
+        with _lock:
+            _recent.append(report.to_dict())
+        if METRICS_FILE:
+            dump_metrics(METRICS_FILE)
+
+
+def in_context(fn):
+    """Wraps `fn` to run in a copy of the caller's context, so pool threads report to its query."""
+    context = contextvars.copy_context()
+    # A context can be entered by one thread at a time, so every call runs in its own copy
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "started": _started,
+            "generated": datetime.now(timezone.utc).isoformat(),
+            "pid": os.getpid(),
+            "counters": dict(sorted(_counters.items())),
+            "spans": _span_dict(_spans),
+            "recent_queries": list(_recent),
+        }
+
+
+def dump_metrics(path: str):
+    """
+    Writes snapshot() as JSON, atomically. Each call writes its own temporary file, and dumps
+    are serialized so an older snapshot never replaces a newer one. A failed write is logged, not raised.
+    """
+    with _dump_lock:
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(path)),
+                                             prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False) as f:
+                tmp = f.name
+                json.dump(snapshot(), f, indent=2)
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.error(f"Could not write metrics to {path}: {e}")
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _spans.clear()
+        _recent.clear()
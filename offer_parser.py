@@ -0,0 +1,190 @@
+# --- Streaming parser for AWS EC2 offer files ---
+# The regional AmazonEC2 index.json is several GB for the larger regions, so instead of
+# r.json() the body is kept on disk (see http_cache) and read once, front to back, in
+# fixed-size chunks. Only the skeleton of the document (the top-level keys and the products
+# and terms maps) is walked in Python; every product and every SKU's terms are decoded by the
+# json C decoder as they are reached and handed to the caller as one record, then dropped.
+
+import json
+import re
+
+import metrics
+
+OFFER_URL = "https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AmazonEC2/current/{region}/index.json"
+HEADER_FIELDS = ("formatVersion", "offerCode", "version", "publicationDate")
+TERM_TYPES = ("OnDemand", "Reserved")
+CHUNK_CHARS = 1 << 20
+
+# Product attributes read by fetch_pricing, load_dynamic_filter_options and the On-Demand rate lookups
+PRODUCT_ATTRIBUTES = (
+    "instanceType", "location", "currentGeneration", "instanceFamily", "vcpu", "memory",
+    "storage", "networkPerformance", "processorArchitecture", "storageMedia", "tenancy",
+    "ebsOptimized", "dedicatedEbsThroughput", "processorFeatures", "physicalProcessor",
+    "operatingSystem", "licenseModel", "preInstalledSw", "regionCode", "servicecode",
+    "operation", "capacitystatus", "usagetype",
+)
+TERM_ATTRIBUTES = ("PurchaseOption", "OfferingClass", "LeaseContractLength")
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"\s*")
+_number_tail = re.compile(r"[0-9.eE+-]*\Z")
+# Longest token the decoder reports from its start when it is cut off: -Infinity, a \uXXXX escape
+_TOKEN_TAIL = 16
+
+
+def slim_product(product: dict):
+    """Returns the product with only the attributes we read, or None for non-instance SKUs."""
+    attrs = product.get("attributes", {})
+    if not attrs.get("instanceType"):
+        return None
+    return {"attributes": {k: attrs[k] for k in PRODUCT_ATTRIBUTES if k in attrs}}
+
+
+def slim_term(term: dict) -> dict:
+    t_attrs = term.get("termAttributes", {})
+    return {
+        "effectiveDate": term.get("effectiveDate"),
+        "termAttributes": {k: t_attrs[k] for k in TERM_ATTRIBUTES if k in t_attrs},
+        "priceDimensions": {
+            code: {"unit": dim.get("unit"), "pricePerUnit": {"USD": dim.get("pricePerUnit", {}).get("USD")}}
+            for code, dim in term.get("priceDimensions", {}).items()
+        },
+    }
+
+
+class _Scanner:
+    """A window over a text file that is refilled as the walk reaches its end."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0  # characters of the file before the window
+        self.eof = False
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(CHUNK_CHARS)
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return bool(chunk)
+
+    def _truncated(self):
+        return ValueError(f"Offer file ends unexpectedly at character {self.offset + len(self.buf)}")
+
+    def peek(self) -> str:
+        """The next non-whitespace character, without consuming it."""
+        while True:
+            self.pos = _whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise self._truncated()
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Malformed offer file: expected {chars!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decodes the next JSON value, reading on while it runs past the end of the window.
+        A syntax error inside the window is reported where it is, without reading further.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Only a value cut off by the window edge can be completed by the next chunk
+                if not (e.msg.startswith("Unterminated string") or len(self.buf) - e.pos <= _TOKEN_TAIL):
+                    raise ValueError(f"Malformed offer file at character {self.offset + e.pos}: {e.msg}") from None
+                if self._fill():
+                    continue
+                raise self._truncated() from None
+            # A number running into the window edge may continue in the next chunk
+            if not self.eof and _number_tail.match(self.buf, end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def keys(self):
+        """Walks the JSON object at the scanner; the caller consumes each key's value before the next."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def skip(self):
+        # Maps are skipped key by key, so nothing larger than one entry is decoded
+        if self.peek() == "{":
+            for _ in self.keys():
+                self.skip()
+        else:
+            self.value()
+
+
+def iter_offer(path: str):
+    """
+    Walks an offer file on disk in one pass and yields its records in file order:
+      ("header", field, value)            for the HEADER_FIELDS
+      ("products", sku, attributes)       for instance SKUs, with only PRODUCT_ATTRIBUTES
+      (term_type, sku, {term id: term})   for each SKU's OnDemand / Reserved terms, as published
+    """
+    skus = 0
+    with open(path, encoding="utf-8") as f:
+        scanner = _Scanner(f)
+        for key in scanner.keys():
+            if key == "products":
+                for sku in scanner.keys():
+                    product = slim_product(scanner.value())
+                    if product:
+                        skus += 1
+                        yield "products", sku, product["attributes"]
+            elif key == "terms":
+                for term_type in scanner.keys():
+                    if term_type not in TERM_TYPES:
+                        scanner.skip()
+                        continue
+                    for sku in scanner.keys():
+                        yield term_type, sku, scanner.value()
+            elif key in HEADER_FIELDS:
+                yield "header", key, str(scanner.value())
+            else:
+                scanner.skip()
+    metrics.count("offer.skus_parsed", skus)
+
+
+def read_header(path: str) -> dict:
+    """The HEADER_FIELDS of an offer file; they precede `products`, so only its start is read."""
+    header = {}
+    records = iter_offer(path)
+    for section, key, value in records:
+        if section != "header":
+            break
+        header[key] = value
+    records.close()
+    return header
+
+
+@metrics.timed("offer.parse")
+def parse_offer_file(path: str) -> dict:
+    """Collects iter_offer() into {header..., "products": ..., "terms": ...}; the whole offer is held in memory."""
+    offer = {"products": {}, "terms": {term_type: {} for term_type in TERM_TYPES}}
+    for section, key, value in iter_offer(path):
+        if section == "header":
+            offer[key] = value
+        elif section == "products":
+            offer["products"][key] = {"attributes": value}
+        elif key in offer["products"]:
+            offer["terms"][section][key] = {tid: slim_term(t) for tid, t in value.items()}
+    return offer
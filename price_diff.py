@@ -0,0 +1,250 @@
+# --- Price-change diffing ---
+# AWS only publishes whole offer / Savings Plan files, so a refresh downloads (conditionally,
+# see http_cache) and ingests the new version in full. Before the stored partitions are
+# replaced they are diffed against the new ones by rate key, and every added, removed or
+# repriced rate is appended to a change feed (<STORE_DIR>/changes.jsonl) to alert on.
+# Regions whose published version has not changed are not touched at all.
+#
+# Usage: python price_diff.py [region ...]   (defaults to every region already in the store)
+
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import ec2_sp_backend
+import http_cache
+import offer_parser
+import pricing_store
+
+CHANGE_FEED_FILE = os.path.join(pricing_store.STORE_DIR, "changes.jsonl")
+
+# Rows are matched on these keys; a row is "changed" when its price differs
+OFFER_KEY = ["SKU", "OfferTermCode", "RateCode"]
+SP_KEY = ["SKU", "UsageType", "Operation"]
+SP_PARTITION = "SavingsPlan"
+SP_COLUMNS = ["SKU", "SavingsPlanType", "PurchaseTerm", "PurchaseOption", "InstanceFamily",
+              "UsageType", "Operation", "Rate"]
+
+# Columns carried into the change feed, by source
+OFFER_FEED_COLUMNS = {
+    "instanceType": "Instance Type", "operatingSystem": "Operating System", "tenancy": "Tenancy",
+    "preInstalledSw": "Pre Installed S/W", "purchaseOption": "PurchaseOption",
+    "leaseContractLength": "LeaseContractLength", "unit": "Unit",
+}
+SP_FEED_COLUMNS = {
+    "savingsPlanType": "SavingsPlanType", "purchaseTerm": "PurchaseTerm", "purchaseOption": "PurchaseOption",
+    "instanceFamily": "InstanceFamily", "usageType": "UsageType", "operation": "Operation",
+}
+
+
+def _keyed(df: pd.DataFrame, key: list) -> pd.DataFrame:
+    df = df.copy()
+    df.index = pd.MultiIndex.from_frame(df[key].astype(str))
+    return df
+
+
+def diff_frames(old: pd.DataFrame, new: pd.DataFrame, key: list, price_column: str) -> dict:
+    """
+    Compares two versions of a table row by row on `key`.
+    Returns {"added", "removed", "changed"} frames; "changed" holds the new rows whose
+    `price_column` differs, plus OldPrice. Changes to other columns (e.g. EffectiveDate) are ignored.
+    """
+    old, new = _keyed(old, key), _keyed(new, key)
+    in_old = new.index.isin(old.index)
+    old_price = old[price_column].reindex(new.index[in_old]).to_numpy(dtype=float)
+    new_price = new[price_column][in_old].to_numpy(dtype=float)
+    differs = (old_price != new_price) & ~(np.isnan(old_price) & np.isnan(new_price))
+    changed = new[in_old][differs].copy()
+    changed["OldPrice"] = old_price[differs]
+    return {
+        "added": new[~in_old],
+        "removed": old[~old.index.isin(new.index)],
+        "changed": changed,
+    }
+
+
+def _to_partition(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """Converts a frame back to a stored partition with `schema` (dictionary columns re-encoded)."""
+    plain = pa.schema([pa.field(f.name, f.type.value_type if pa.types.is_dictionary(f.type) else f.type)
+                       for f in schema])
+    df = df[plain.names]
+    df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    table = pa.Table.from_pandas(df, schema=plain, preserve_index=False)
+    return pricing_store.encode_table(table).replace_schema_metadata(schema.metadata)
+
+
+# --- Change feed ---
+
+def feed_records(region: str, source: str, delta: dict, price_column: str, feed_columns: dict,
+                 from_version: str, to_version: str) -> list:
+    detected_at = datetime.now(timezone.utc).isoformat()
+    records = []
+    for change, rows in delta.items():
+        if rows.empty:
+            continue
+        frame = pd.DataFrame({
+            "change": change,
+            "sku": rows["SKU"].astype(str),
+            **{field: rows[column].astype(str) for field, column in feed_columns.items()},
+            "oldPrice": rows["OldPrice"] if change == "changed" else (rows[price_column] if change == "removed" else None),
+            "newPrice": None if change == "removed" else rows[price_column],
+        })
+        if "OfferTermCode" in rows:
+            frame.insert(2, "offerTermCode", rows["OfferTermCode"].astype(str))
+            frame.insert(3, "rateCode", rows["RateCode"].astype(str))
+        frame.insert(0, "region", region)
+        frame.insert(1, "source", source)
+        frame["fromVersion"] = from_version
+        frame["toVersion"] = to_version
+        frame["detectedAt"] = detected_at
+        records.extend(frame.astype(object).where(frame.notna(), None).to_dict("records"))
+    return records
+
+
+def append_change_feed(records: list):
+    if not records:
+        return
+    os.makedirs(os.path.dirname(CHANGE_FEED_FILE) or ".", exist_ok=True)
+    with open(CHANGE_FEED_FILE, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def read_change_feed(region: str = None, since: str = None) -> pd.DataFrame:
+    """The change feed as a DataFrame, optionally limited to a region and to changes after `since` (ISO time)."""
+    if not os.path.exists(CHANGE_FEED_FILE):
+        return pd.DataFrame()
+    feed = pd.read_json(CHANGE_FEED_FILE, lines=True, dtype=False)
+    if region:
+        feed = feed[feed["region"] == region]
+    if since:
+        feed = feed[feed["detectedAt"] > since]
+    return feed.reset_index(drop=True)
+
+
+# --- Offer files ---
+
+def refresh_offer_incremental(region: str) -> list:
+    """
+    Brings a stored region up to the published offer version and records its price changes.
+    The new version is ingested in full; the old partitions are only read to diff against it.
+    A region not yet in the store is ingested without feed records. The stored version is compared
+    with the cached file's header on every run, so an ingest that failed is retried even when the
+    file itself was not downloaded again.
+    Returns the change-feed records written.
+    """
+    path, _ = http_cache.fetch_to_cache(offer_parser.OFFER_URL.format(region=region), timeout=90)
+    with pricing_store.region_lock(region):
+        manifest = pricing_store.read_manifest(region)
+        if not manifest:
+            pricing_store.ingest_offer_file(region, path)
+            return []
+        version = offer_parser.read_header(path).get("version")
+        if version == manifest.get("version"):
+            return []
+
+        # The old partitions stay readable through their memory maps once the new files replace them
+        old_tables = {term_type: pricing_store.load_partition(region, term_type) for term_type in offer_parser.TERM_TYPES}
+        pricing_store.ingest_offer_file(region, path)
+
+        records = []
+        for term_type, old_table in old_tables.items():
+            new = pricing_store.load_partition(region, term_type).to_pandas()
+            delta = diff_frames(old_table.to_pandas(), new, OFFER_KEY, "PricePerUnit")
+            records += feed_records(region, term_type, delta, "PricePerUnit", OFFER_FEED_COLUMNS,
+                                    manifest.get("version"), version)
+            logging.info(f"{region} {term_type}: " + ", ".join(f"{len(v)} {k}" for k, v in delta.items()))
+    append_change_feed(records)
+    return records
+
+
+# --- Savings Plan files ---
+
+def flatten_sp_document(price_doc: dict) -> pd.DataFrame:
+    """One row per Savings Plan rate: plan attributes of the SKU plus usage type, operation and rate."""
+    plans = {}
+    for product in price_doc.get("products", []):
+        attrs = product.get("attributes", {})
+        plans[product["sku"]] = (product.get("productFamily"), attrs.get("purchaseTerm"),
+                                 attrs.get("purchaseOption"), attrs.get("instanceType"))
+    rows = []
+    for term_entry in price_doc.get("terms", {}).get("savingsPlan", []):
+        plan = plans.get(term_entry["sku"], (None, None, None, None))
+        for rate in term_entry.get("rates", []):
+            rows.append((term_entry["sku"], *plan, rate["discountedUsageType"], rate["discountedOperation"],
+                         float(rate["discountedRate"]["price"])))
+    # First entry wins for duplicate keys, as in the SP rate index
+    return pd.DataFrame(rows, columns=SP_COLUMNS).drop_duplicates(SP_KEY).reset_index(drop=True)
+
+
+def _sp_schema(version_url: str) -> pa.Schema:
+    fields = [pa.field(c, pa.float64() if c == "Rate" else pa.string()) for c in SP_COLUMNS]
+    return pa.schema(fields, metadata={"versionUrl": version_url or ""})
+
+
+def _stored_sp(region: str):
+    """(rates frame, versionUrl) of the stored SP snapshot, or (None, None) if there is none."""
+    path = pricing_store.partition_path(region, SP_PARTITION)
+    if not os.path.exists(path):
+        return None, None
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.to_pandas(), (table.schema.metadata or {}).get(b"versionUrl", b"").decode()
+
+
+def refresh_sp_incremental(region: str) -> list:
+    """
+    Replaces the region's stored Savings Plan snapshot with the published version and records
+    its rate changes. The first call only records a baseline snapshot. Returns the feed records written.
+    """
+    version_url = ec2_sp_backend.get_sp_version_url(region)
+
+    with pricing_store.region_lock(region):
+        old, old_version_url = _stored_sp(region)
+        if old is not None and old_version_url == version_url:
+            return []
+        new = flatten_sp_document(ec2_sp_backend.get_pricing_by_region(region, version_url))
+        schema = _sp_schema(version_url)
+        os.makedirs(pricing_store.region_dir(region), exist_ok=True)
+        if old is None:
+            pricing_store.write_partition(region, SP_PARTITION, _to_partition(new, schema))
+            return []
+
+        delta = diff_frames(old, new, SP_KEY, "Rate")
+        records = feed_records(region, SP_PARTITION, delta, "Rate", SP_FEED_COLUMNS, old_version_url, version_url)
+        # Rewritten even when no rate changed so the snapshot records the version it was checked against
+        pricing_store.write_partition(region, SP_PARTITION, _to_partition(new, schema))
+        logging.info(f"{region} {SP_PARTITION}: " + ", ".join(f"{len(v)} {k}" for k, v in delta.items()))
+    append_change_feed(records)
+    return records
+
+
+def refresh_regions(regions: list = None) -> dict:
+    """Incrementally refreshes offer and SP data for `regions` (default: every stored region)."""
+    summary = {}
+    for region in regions or pricing_store.stored_regions():
+        summary[region] = {}
+        for source, refresh in (("offer", refresh_offer_incremental), ("savingsPlan", refresh_sp_incremental)):
+            try:
+                summary[region][source] = len(refresh(region))
+            except Exception as e:
+                logging.error(f"Incremental {source} refresh failed for {region}: {e}")
+                summary[region][source] = None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply new offer / Savings Plan versions as deltas and log price changes.")
+    parser.add_argument("regions", nargs="*")
+    args = parser.parse_args()
+    for region, counts in refresh_regions(args.regions).items():
+        print(f"{region:16} offer changes: {counts['offer']}, savings plan changes: {counts['savingsPlan']}")
+
+
+if __name__ == "__main__":
+    main()
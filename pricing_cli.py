@@ -0,0 +1,193 @@
+# --- Headless batch pricing ---
+# Runs the On-Demand / Reserved query (same filters as fetch_pricing) or the Savings Plan grid
+# (same dimensions as the Savings Plan section of app.py) without Streamlit, for cron jobs.
+# Regions run concurrently; each region's result is streamed to the output file in chunks as
+# soon as it is ready and then dropped, so memory stays flat however large the output is.
+#
+# Usage:
+#   python pricing_cli.py ondemand --regions us-east-1 eu-west-1 --os Linux --families m5 c6g -o od.parquet
+#   python pricing_cli.py savings-plans --os "Linux/UNIX" --terms 1yr --output sp.csv
+
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+import ec2_sp_backend
+import exporters
+import instance_catalog
+import metrics
+import pricing_filter
+import pricing_store
+
+DEFAULT_WORKERS = 4
+
+
+def ondemand_region(region: str, filters: dict):
+    """Yields the region's On-Demand / Reserved rows one term-type partition at a time."""
+    pricing_store.ensure_region(region)
+    for term_type in filters.get("term_types") or pricing_filter.DEFAULT_TERM_TYPES:
+        # Loaded per call rather than through the app's frame cache, which would keep every region resident
+        with metrics.span("store.load_partition"):
+            frame = pricing_store.load_partition(region, term_type).to_pandas()
+        with metrics.span("query.filter"):
+            result = pricing_filter.apply_filters(frame, filters)
+        metrics.count("query.rows_scanned", len(frame))
+        yield result
+
+
+def savings_plan_region(region: str, dims: dict):
+    yield ec2_sp_backend.get_savings_plan_grid([region], dims["operating_systems"], dims["tenancies"],
+                                               dims["instance_types"], dims["sp_types"], dims["terms"],
+                                               dims["purchasing_options"])
+
+
+def _run_region(work, region, params):
+    start = time.perf_counter()
+    frames = list(work(region, params))
+    return frames, time.perf_counter() - start
+
+
+def run_regions(regions, work, params, writer, max_workers: int = DEFAULT_WORKERS) -> list:
+    """
+    Runs `work(region, params)` for every region with at most `max_workers` regions in flight
+    and writes each finished region before the next one is started.
+    Returns one summary dict per region, in completion order.
+    """
+    summary = []
+    pending = {}
+    queue = list(regions)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while queue or pending:
+            while queue and len(pending) < max_workers:
+                region = queue.pop(0)
+                pending[pool.submit(metrics.in_context(_run_region), work, region, params)] = region
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                region = pending.pop(future)
+                try:
+                    frames, seconds = future.result()
+                except Exception as e:
+                    logging.error(f"Batch pricing failed for {region}: {e}")
+                    summary.append({"region": region, "rows": 0, "seconds": None, "error": str(e)})
+                    continue
+                start = time.perf_counter()
+                rows = 0
+                with metrics.span("export.write"):
+                    for frame in frames:
+                        if len(frame):
+                            writer.write(frame)
+                            rows += len(frame)
+                metrics.count("query.rows_emitted", rows)
+                summary.append({"region": region, "rows": rows, "seconds": seconds,
+                                "writeSeconds": time.perf_counter() - start, "error": None})
+    return summary
+
+
+def ondemand_filters(args) -> dict:
+    return {
+        "instance_types": set(args.instance_types),
+        "tenancies": set(args.tenancy),
+        "operating_systems": set(args.os),
+        "purchase_options": set(args.purchase_options),
+        "offering_classes": set(args.offering_classes),
+        "lease_terms": set(args.lease_terms),
+        "pre_sw": set(args.pre_sw),
+        "term_types": args.term_types,
+        "families": set(args.families),
+        "vcpu_range": (args.vcpu_min, args.vcpu_max),
+        "mem_range": (args.mem_min, args.mem_max),
+    }
+
+
+def savings_plan_dimensions(args) -> dict:
+    # Unselected dimensions default to every value, as in the Savings Plan section of app.py
+    instance_types = args.instance_types
+    if not instance_types:
+        catalog = instance_catalog.load_catalog()
+        if args.families:
+            catalog = catalog[catalog["Family"].isin(args.families)]
+        instance_types = catalog["InstanceType"].tolist()
+    elif args.families:
+        instance_types = [it for it in instance_types if it.split(".")[0] in args.families]
+    return {
+        "operating_systems": args.os or sorted(ec2_sp_backend.operation_by_platform_dict.keys()),
+        "tenancies": args.tenancy or list(ec2_sp_backend.tenancy_dict.values()),
+        "instance_types": instance_types,
+        "sp_types": args.sp_types or ["ComputeSavingsPlans", "EC2InstanceSavingsPlans"],
+        "terms": args.terms or ["1yr", "3yr"],
+        "purchasing_options": args.purchase_options or ["No Upfront", "Partial Upfront", "All Upfront"],
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Batch EC2 pricing export without the Streamlit UI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("--regions", nargs="+", action="extend", default=[],
+                       help="region codes (default: every region in the region map)")
+        p.add_argument("--os", nargs="+", action="extend", default=[])
+        p.add_argument("--tenancy", nargs="+", action="extend", default=[])
+        p.add_argument("--families", nargs="+", action="extend", default=[])
+        p.add_argument("--instance-types", nargs="+", action="extend", default=[])
+        p.add_argument("--purchase-options", nargs="+", action="extend", default=[])
+        p.add_argument("-o", "--output", required=True, help="output file (.csv, .parquet or .xlsx)")
+        p.add_argument("--format", choices=sorted(exporters.WRITERS), help="default: from the output extension")
+        p.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="regions processed concurrently")
+        p.add_argument("--metrics", metavar="PATH", help="write counters and timings as JSON")
+
+    od = sub.add_parser("ondemand", help="On-Demand and Reserved prices (fetch_pricing filters)")
+    add_common(od)
+    od.add_argument("--term-types", nargs="+", action="extend", default=[], choices=pricing_filter.DEFAULT_TERM_TYPES)
+    od.add_argument("--offering-classes", nargs="+", action="extend", default=[])
+    od.add_argument("--lease-terms", nargs="+", action="extend", default=[])
+    od.add_argument("--pre-sw", nargs="+", action="extend", default=[])
+    od.add_argument("--vcpu-min", type=int, default=0)
+    od.add_argument("--vcpu-max", type=int, default=128)
+    od.add_argument("--mem-min", type=float, default=0.0)
+    od.add_argument("--mem-max", type=float, default=2048.0)
+
+    sp = sub.add_parser("savings-plans", help="Savings Plan vs On-Demand comparison grid")
+    add_common(sp)
+    sp.add_argument("--sp-types", nargs="+", action="extend", default=[],
+                    choices=["ComputeSavingsPlans", "EC2InstanceSavingsPlans"])
+    sp.add_argument("--terms", nargs="+", action="extend", default=[], choices=["1yr", "3yr"])
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    regions = list(dict.fromkeys(args.regions)) or sorted(ec2_sp_backend.region_name_map.keys())
+    if args.command == "ondemand":
+        work, params, empty = ondemand_region, ondemand_filters(args), pricing_store.RESULT_COLUMNS
+    else:
+        work, params, empty = savings_plan_region, savings_plan_dimensions(args), ec2_sp_backend.SP_GRID_COLUMNS
+
+    start = time.perf_counter()
+    with metrics.query_report(args.command, regions=len(regions)), \
+            exporters.open_writer(args.output, args.format) as writer:
+        summary = run_regions(regions, work, params, writer, max_workers=max(1, args.workers))
+        if not writer.rows:
+            writer.write(pd.DataFrame(columns=empty))
+    elapsed = time.perf_counter() - start
+    if args.metrics:
+        metrics.dump_metrics(args.metrics)
+
+    for entry in sorted(summary, key=lambda e: e["region"]):
+        if entry["error"]:
+            print(f"{entry['region']:16} FAILED: {entry['error']}")
+        else:
+            print(f"{entry['region']:16} {entry['rows']:>10} rows  query {entry['seconds']:.2f}s  "
+                  f"write {entry['writeSeconds']:.2f}s")
+    failed = sum(1 for e in summary if e["error"])
+    print(f"{'total':16} {writer.rows:>10} rows  {elapsed:.2f}s  -> {args.output}"
+          + (f"  ({failed} region(s) failed)" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
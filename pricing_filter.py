@@ -0,0 +1,141 @@
+# --- Vectorized filter engine for fetch_pricing ---
+# Region partitions are loaded once into pandas frames (dictionary columns become categoricals)
+# and every fetch_pricing filter is applied as a boolean mask, so a query is a handful of
+# column operations instead of a Python loop over every SKU and price dimension.
+
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import metrics
+import pricing_store
+from memory_cache import MemoryBoundedCache
+
+DEFAULT_TERM_TYPES = ["OnDemand", "Reserved"]
+
+# Loaded region partitions by (region, term type, offer version), evicted least-recently-used
+# beyond the memory budget. The version is part of the key so a re-ingested offer gets a fresh frame.
+REGION_FRAME_CACHE_MB = int(os.environ.get("REGION_FRAME_CACHE_MB", 512))
+region_frame_cache = MemoryBoundedCache(max_bytes=REGION_FRAME_CACHE_MB * 1024 * 1024)
+
+# Result columns that are not categoricals. Prices stay float64: Reserved upfront fees run
+# into the millions, where float32 can no longer hold cents.
+RESULT_DTYPES = {
+    "vCPU": "int16",
+    "Memory (GiB)": "float32",
+    "PricePerUnit": "float64",
+}
+
+# filter key -> column it restricts (empty set = no restriction)
+SET_FILTERS = {
+    "instance_types": "Instance Type",
+    "tenancies": "Tenancy",
+    "operating_systems": "Operating System",
+    "pre_sw": "Pre Installed S/W",
+    "families": "Family",
+    "purchase_options": "PurchaseOption",
+    "offering_classes": "OfferingClass",
+    "lease_terms": "LeaseContractLength",
+}
+
+
+def compact_result(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    The result columns of `frame` in the compact schema: repeated strings as categoricals
+    (only the categories still present), narrow numeric types for the rest.
+    """
+    columns = {}
+    for column in pricing_store.RESULT_COLUMNS:
+        values = frame[column]
+        if column in RESULT_DTYPES:
+            columns[column] = values.to_numpy().astype(RESULT_DTYPES[column], copy=False)
+        else:
+            values = values.astype("category").cat.remove_unused_categories()
+            # All-null columns come back with object categories; union_categoricals needs one dtype
+            if values.cat.categories.dtype == object:
+                values = values.cat.rename_categories(values.cat.categories.astype(str))
+            columns[column] = values.reset_index(drop=True)
+    return pd.DataFrame(columns)
+
+
+def empty_result() -> pd.DataFrame:
+    return compact_result(pd.DataFrame({c: pd.Series(dtype=RESULT_DTYPES.get(c, "str")) for c in pricing_store.RESULT_COLUMNS}))
+
+
+def concat_results(frames) -> pd.DataFrame:
+    """
+    Concatenates compact results. Categoricals are merged on the union of their categories;
+    a plain pd.concat would fall back to object columns whenever the categories differ.
+    """
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return empty_result()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    columns = {}
+    for column in pricing_store.RESULT_COLUMNS:
+        parts = [frame[column] for frame in frames]
+        if column in RESULT_DTYPES:
+            columns[column] = np.concatenate([part.to_numpy() for part in parts])
+        else:
+            columns[column] = union_categoricals(parts)
+    return pd.DataFrame(columns)
+
+
+@metrics.timed("store.load_partition")
+def _load_region_frame(region: str, term_type: str) -> pd.DataFrame:
+    table = pricing_store.load_partition(region, term_type).select(pricing_store.RESULT_COLUMNS)
+    return compact_result(table.to_pandas())
+
+
+def region_frame(region: str, term_type: str) -> pd.DataFrame:
+    manifest = pricing_store.read_manifest(region) or {}
+    return region_frame_cache.get_or_load((region, term_type, manifest.get("version")),
+                                          lambda: _load_region_frame(region, term_type))
+
+
+def filter_mask(frame: pd.DataFrame, filters: dict) -> np.ndarray:
+    mask = np.ones(len(frame), dtype=bool)
+    for key, column in SET_FILTERS.items():
+        allowed = filters.get(key)
+        if allowed:
+            mask &= frame[column].isin(allowed).to_numpy()
+
+    vcpu_min, vcpu_max = filters.get("vcpu_range", (0, 128))
+    vcpu = frame["vCPU"].to_numpy()
+    mask &= (vcpu >= vcpu_min) & (vcpu <= vcpu_max)
+
+    # NaN memory passes, as it did in the row-by-row filter
+    mem_min, mem_max = filters.get("mem_range", (0.0, 2048.0))
+    mem = frame["Memory (GiB)"].to_numpy()
+    mask &= ~((mem < mem_min) | (mem > mem_max))
+    return mask
+
+
+def apply_filters(frame: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    return compact_result(frame.loc[filter_mask(frame, filters)])
+
+
+@metrics.timed("query.refine")
+def refine_result(frame: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """Narrows a cached query_region result to `filters` (which must be contained in its own)."""
+    mask = filter_mask(frame, filters)
+    term_types = filters.get("term_types")
+    if term_types:
+        mask &= frame["TermType"].isin(term_types).to_numpy()
+    metrics.count("query.rows_scanned", len(frame))
+    return compact_result(frame.loc[mask])
+
+
+def query_region(region: str, filters: dict) -> pd.DataFrame:
+    """Runs one fetch_pricing query against the stored partitions of `region`."""
+    term_types = filters.get("term_types") or DEFAULT_TERM_TYPES
+    parts = []
+    for term_type in term_types:
+        frame = region_frame(region, term_type)
+        with metrics.span("query.filter"):
+            parts.append(apply_filters(frame, filters))
+        metrics.count("query.rows_scanned", len(frame))
+    return concat_results(parts)
@@ -0,0 +1,432 @@
+# --- On-disk columnar pricing store ---
+# Each region's offer file is ingested once into Arrow IPC files partitioned by region and
+# term type (<STORE_DIR>/<region>/<TermType>.arrow). Partitions are memory-mapped on read, so a
+# cold start touches a few hundred MB of columns instead of re-downloading GB of JSON.
+# Ingestion streams the offer file's records straight into fixed-size record batches: string
+# columns are dictionary-encoded as they are written, and only the product columns of the
+# instance SKUs (as dictionary codes) are kept until the terms that reference them are read.
+# Every region directory carries a manifest with the offer-file version and publication date.
+
+import json
+import logging
+import math
+import os
+import threading
+from array import array
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+
+import http_cache
+import metrics
+import offer_parser
+
+STORE_DIR = os.environ.get("EC2_PRICING_STORE_DIR", "pricing_store")
+MANIFEST_FILE = "manifest.json"
+METADATA_FILE = "metadata.json"
+BATCH_ROWS = 64 * 1024
+
+# One lock per region so concurrent fetches never ingest the same offer file twice
+_region_locks = {}
+_region_locks_guard = threading.Lock()
+
+# Row schema: the fetch_pricing output columns followed by internal columns used for
+# rate lookups and diffing. (column, product attribute / source, arrow type)
+PRODUCT_COLUMNS = [
+    ("Region", None, pa.string()),
+    ("Location", "location", pa.string()),
+    ("Instance Type", "instanceType", pa.string()),
+    ("Current Generation", "currentGeneration", pa.string()),
+    ("Instance Family", "instanceFamily", pa.string()),
+    ("Family", None, pa.string()),
+    ("vCPU", None, pa.int64()),
+    ("Memory", "memory", pa.string()),
+    ("Memory (GiB)", None, pa.float64()),
+    ("Storage", "storage", pa.string()),
+    ("Network Performance", "networkPerformance", pa.string()),
+    ("Processor Architecture", "processorArchitecture", pa.string()),
+    ("Storage Media", "storageMedia", pa.string()),
+    ("Tenancy", "tenancy", pa.string()),
+    ("EBS Optimized", "ebsOptimized", pa.string()),
+    ("Dedicated EBS Throughput", "dedicatedEbsThroughput", pa.string()),
+    ("Processor Features", "processorFeatures", pa.string()),
+    ("Physical Processor", "physicalProcessor", pa.string()),
+    ("Operating System", "operatingSystem", pa.string()),
+    ("License Model", "licenseModel", pa.string()),
+    ("Pre Installed S/W", "preInstalledSw", pa.string()),
+    ("Region Code", "regionCode", pa.string()),
+    ("ServiceName", None, pa.string()),
+]
+TERM_COLUMNS = [
+    ("TermType", pa.string()),
+    ("PurchaseOption", pa.string()),
+    ("OfferingClass", pa.string()),
+    ("LeaseContractLength", pa.string()),
+    ("Unit", pa.string()),
+    ("PricePerUnit", pa.float64()),
+    ("EffectiveDate", pa.string()),
+]
+INTERNAL_COLUMNS = [
+    ("SKU", None, pa.string()),
+    ("OfferTermCode", None, pa.string()),
+    ("RateCode", None, pa.string()),
+    ("Operation", "operation", pa.string()),
+    ("CapacityStatus", "capacitystatus", pa.string()),
+    ("UsageType", "usagetype", pa.string()),
+]
+RESULT_COLUMNS = [c[0] for c in PRODUCT_COLUMNS] + [c[0] for c in TERM_COLUMNS]
+
+# String columns set per product, and per term / price dimension. Term ids and rate codes
+# embed the SKU, so a dictionary would be as long as the column: they are stored as plain strings.
+PLAIN_COLUMNS = {"OfferTermCode", "RateCode"}
+PRODUCT_STRING_COLUMNS = [(name, attr) for name, attr, typ in PRODUCT_COLUMNS + INTERNAL_COLUMNS
+                          if typ == pa.string() and name not in PLAIN_COLUMNS]
+TERM_STRING_COLUMNS = ["TermType", "PurchaseOption", "OfferingClass", "LeaseContractLength", "EffectiveDate", "Unit"]
+
+
+def parse_memory(mem_str) -> float:
+    try:
+        return float(mem_str.replace("GiB", "").strip())
+    except Exception:
+        return math.nan
+
+
+def parse_vcpu(vcpu_str) -> int:
+    try:
+        return int(vcpu_str)
+    except Exception:
+        return 0
+
+
+def region_dir(region: str) -> str:
+    return os.path.join(STORE_DIR, region)
+
+
+def partition_path(region: str, term_type: str) -> str:
+    return os.path.join(region_dir(region), f"{term_type}.arrow")
+
+
+def read_manifest(region: str):
+    path = os.path.join(region_dir(region), MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path: str, payload: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _field(name: str, typ: pa.DataType) -> pa.Field:
+    if typ == pa.string() and name not in PLAIN_COLUMNS:
+        typ = pa.dictionary(pa.int32(), typ)
+    return pa.field(name, typ)
+
+
+def _schema() -> pa.Schema:
+    fields = [_field(name, typ) for name, _, typ in PRODUCT_COLUMNS]
+    fields += [_field(name, typ) for name, typ in TERM_COLUMNS]
+    fields += [_field(name, typ) for name, _, typ in INTERNAL_COLUMNS]
+    return pa.schema(fields)
+
+
+def _dictionary_array(codes: np.ndarray, dictionary: pa.Array) -> pa.DictionaryArray:
+    # Code -1 marks a missing value
+    return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), dictionary)
+
+
+class _Vocabulary:
+    """Values of a dictionary column in first-seen order. Codes never change, so every batch's
+    dictionary extends the previous one and is written as a delta."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def dictionary(self) -> pa.Array:
+        return pa.array(self.values, pa.string())
+
+
+class _ProductTable:
+    """Product columns of a region's instance SKUs, collected while the products section is read."""
+
+    def __init__(self, region: str):
+        self.region = region
+        self.index = {}  # SKU -> product row
+        self.vocab = {name: _Vocabulary() for name, _ in PRODUCT_STRING_COLUMNS}
+        self.codes = {name: array("i") for name, _ in PRODUCT_STRING_COLUMNS}
+        self.vcpu = array("q")
+        self.memory = array("d")
+        self._arrays = None
+
+    def add(self, sku: str, attrs: dict):
+        if self._arrays is not None:
+            raise ValueError(f"Product {sku} follows the terms of the offer file")
+        derived = {
+            "Region": self.region,
+            "Family": attrs["instanceType"].split(".")[0],
+            "ServiceName": attrs.get("servicecode", "AmazonEC2"),
+            "SKU": sku,
+        }
+        self.index[sku] = len(self.vcpu)
+        for name, attr in PRODUCT_STRING_COLUMNS:
+            value = attrs.get(attr) if attr else derived[name]
+            self.codes[name].append(self.vocab[name].code(value))
+        self.vcpu.append(parse_vcpu(attrs.get("vcpu", 0)))
+        self.memory.append(parse_memory(attrs.get("memory", "0")))
+
+    def columns(self, rows: np.ndarray) -> dict:
+        """Arrow arrays of every product column for the given product rows."""
+        if self._arrays is None:
+            # Every AWS offer file lists its products before its terms: the dictionaries are final here
+            self._arrays = {name: (np.frombuffer(self.codes[name], dtype=np.int32), self.vocab[name].dictionary())
+                            for name, _ in PRODUCT_STRING_COLUMNS}
+        columns = {name: _dictionary_array(codes[rows], dictionary) for name, (codes, dictionary) in self._arrays.items()}
+        columns["vCPU"] = pa.array(np.frombuffer(self.vcpu, dtype=np.int64)[rows])
+        columns["Memory (GiB)"] = pa.array(np.frombuffer(self.memory, dtype=np.float64)[rows])
+        return columns
+
+
+class _PartitionWriter:
+    """Writes one term type's rows (one per price dimension) to a partition file in batches of
+    about BATCH_ROWS rows; a batch is written once a SKU's terms take it past that size."""
+
+    def __init__(self, region: str, term_type: str, products: _ProductTable):
+        self.path = partition_path(region, term_type)
+        self.tmp = self.path + ".tmp"
+        self.term_type = term_type
+        self.products = products
+        self.schema = _schema()
+        self.vocab = {name: _Vocabulary() for name in TERM_STRING_COLUMNS}
+        self.rows = 0
+        self._sink = pa.OSFile(self.tmp, "wb")
+        self._writer = pa.ipc.new_file(self._sink, self.schema,
+                                       options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        self._clear()
+
+    def _clear(self):
+        self._product_rows = array("q")
+        self._codes = {name: array("i") for name in TERM_STRING_COLUMNS}
+        self._prices = array("d")
+        self._term_ids = []
+        self._rate_codes = []
+
+    def add_terms(self, sku: str, sku_terms: dict):
+        product_row = self.products.index.get(sku)
+        if product_row is None:
+            return
+        vocab, codes = self.vocab, self._codes
+        for term_id, term_data in sku_terms.items():
+            t_attrs = term_data.get("termAttributes", {})
+            term_codes = [
+                ("TermType", vocab["TermType"].code(self.term_type)),
+                ("PurchaseOption", vocab["PurchaseOption"].code(t_attrs.get("PurchaseOption"))),
+                ("OfferingClass", vocab["OfferingClass"].code(t_attrs.get("OfferingClass"))),
+                ("LeaseContractLength", vocab["LeaseContractLength"].code(t_attrs.get("LeaseContractLength"))),
+                ("EffectiveDate", vocab["EffectiveDate"].code(term_data.get("effectiveDate"))),
+            ]
+            for rate_code, price_dim in term_data.get("priceDimensions", {}).items():
+                try:
+                    price = float(price_dim.get("pricePerUnit", {}).get("USD", 0.0))
+                except Exception:
+                    price = 0.0
+                self._product_rows.append(product_row)
+                for name, code in term_codes:
+                    codes[name].append(code)
+                codes["Unit"].append(vocab["Unit"].code(price_dim.get("unit")))
+                self._prices.append(price)
+                self._term_ids.append(term_id)
+                self._rate_codes.append(rate_code)
+        if len(self._prices) >= BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self._prices:
+            return
+        columns = self.products.columns(np.frombuffer(self._product_rows, dtype=np.int64))
+        for name in TERM_STRING_COLUMNS:
+            columns[name] = _dictionary_array(np.frombuffer(self._codes[name], dtype=np.int32),
+                                              self.vocab[name].dictionary())
+        columns["PricePerUnit"] = pa.array(np.frombuffer(self._prices, dtype=np.float64))
+        columns["OfferTermCode"] = pa.array(self._term_ids, pa.string())
+        columns["RateCode"] = pa.array(self._rate_codes, pa.string())
+        self._writer.write_batch(pa.record_batch([columns[name] for name in self.schema.names], schema=self.schema))
+        self.rows += len(self._prices)
+        self._clear()
+
+    def close(self) -> int:
+        """Finishes the temporary file and returns its row count; commit() puts it in place."""
+        self._flush()
+        self._writer.close()
+        self._sink.close()
+        return self.rows
+
+    def commit(self):
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        try:
+            self._writer.close()
+            self._sink.close()
+        except Exception:
+            pass
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+def encode_table(table: pa.Table) -> pa.Table:
+    """Dictionary-encodes the plain string columns of a table; this is what keeps partitions small."""
+    return pa.table(
+        [col.dictionary_encode() if pa.types.is_string(col.type) else col for col in table.columns],
+        names=table.column_names,
+    )
+
+
+def write_partition(region: str, term_type: str, table: pa.Table):
+    path = partition_path(region, term_type)
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def load_partition(region: str, term_type: str) -> pa.Table:
+    """Memory-maps a stored partition; returns an empty table if it was never ingested."""
+    path = partition_path(region, term_type)
+    if not os.path.exists(path):
+        return _schema().empty_table()
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+@metrics.timed("store.ingest")
+def ingest_offer_file(region: str, path: str) -> dict:
+    """
+    Streams an offer file on disk into the region's term-type partitions and records its manifest.
+    Memory grows with the number of instance SKUs, not with the size of the file. The stored
+    partitions are only replaced once the whole file has been read.
+    """
+    os.makedirs(region_dir(region), exist_ok=True)
+    header, products, writers = {}, _ProductTable(region), {}
+    try:
+        for section, key, value in offer_parser.iter_offer(path):
+            if section == "header":
+                header[key] = value
+            elif section == "products":
+                products.add(key, value)
+            else:
+                if section not in writers:
+                    writers[section] = _PartitionWriter(region, section, products)
+                writers[section].add_terms(key, value)
+        for term_type in offer_parser.TERM_TYPES:
+            if term_type not in writers:
+                writers[term_type] = _PartitionWriter(region, term_type, products)
+        partitions = {term_type: writer.close() for term_type, writer in writers.items()}
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for writer in writers.values():
+        writer.commit()
+
+    write_metadata(region, header.get("version"))
+    manifest = write_manifest(region, header, partitions)
+    logging.info(f"Ingested {region} offer version {manifest['version']}: {partitions}")
+    return manifest
+
+
+def write_manifest(region: str, offer: dict, partitions: dict) -> dict:
+    manifest = {
+        "region": region,
+        "version": offer.get("version"),
+        "publicationDate": offer.get("publicationDate"),
+        "ingestedAt": datetime.now(timezone.utc).isoformat(),
+        "partitions": partitions,
+    }
+    _write_json(os.path.join(region_dir(region), MANIFEST_FILE), manifest)
+    return manifest
+
+
+# Sidecar metadata: distinct catalog values -> the partition column they are read from
+METADATA_COLUMNS = {
+    "OperatingSystem": "Operating System",
+    "Tenancy": "Tenancy",
+    "PreInstalledSw": "Pre Installed S/W",
+    "PurchaseOption": "PurchaseOption",
+    "OfferingClass": "OfferingClass",
+    "LeaseContractLength": "LeaseContractLength",
+    "InstanceType": "Instance Type",
+}
+
+
+def build_metadata(region: str) -> dict:
+    """Distinct catalog values of a region in one sweep over its stored partitions."""
+    values = {key: set() for key in METADATA_COLUMNS}
+    for term_type in offer_parser.TERM_TYPES:
+        table = load_partition(region, term_type)
+        for key, column in METADATA_COLUMNS.items():
+            values[key].update(v for v in table.column(column).unique().to_pylist() if v)
+    metadata = {key: sorted(vals) for key, vals in values.items()}
+    metadata["Family"] = sorted({t.split(".")[0] for t in metadata["InstanceType"] if "." in t})
+    return metadata
+
+
+def write_metadata(region: str, version: str) -> dict:
+    metadata = {"version": version, **build_metadata(region)}
+    _write_json(os.path.join(region_dir(region), METADATA_FILE), metadata)
+    return metadata
+
+
+def load_metadata(region: str) -> dict:
+    """Sidecar catalog metadata for `region`, rebuilt only when the offer version changes."""
+    manifest = ensure_region(region)
+    path = os.path.join(region_dir(region), METADATA_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            metadata = json.load(f)
+        if metadata.get("version") == manifest.get("version"):
+            return metadata
+    return write_metadata(region, manifest.get("version"))
+
+
+def ingest_region(region: str) -> dict:
+    path, _ = http_cache.fetch_to_cache(offer_parser.OFFER_URL.format(region=region), timeout=90)
+    return ingest_offer_file(region, path)
+
+
+def region_lock(region: str) -> threading.Lock:
+    with _region_locks_guard:
+        return _region_locks.setdefault(region, threading.Lock())
+
+
+def ensure_region(region: str) -> dict:
+    """
+    Returns the region's manifest, ingesting the offer file first if the store has none.
+    Stored regions are brought up to the published version by price_diff.refresh_regions.
+    """
+    manifest = read_manifest(region)
+    if manifest:
+        return manifest
+    with region_lock(region):
+        return read_manifest(region) or ingest_region(region)
+
+
+def stored_regions() -> list:
+    if not os.path.isdir(STORE_DIR):
+        return []
+    return sorted(r for r in os.listdir(STORE_DIR) if read_manifest(r))
+
@@ -0,0 +1,321 @@
+# --- Query result cache ---
+# fetch_pricing results keyed by a canonical fingerprint of (region, offer version, filters).
+# Entries live in a memory-bounded LRU with a TTL; optionally they are also written to
+# CACHE_DIR/queries as Arrow files, so every worker process serving the dashboard shares them.
+# The offer version is part of the key, so a re-ingested region never serves stale rows.
+# A query whose filters are contained in those of a cached result (tighter ranges, subsets of
+# families, ...) is answered by filtering that result instead of rescanning the region.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+import metrics
+from http_cache import CACHE_DIR
+from memory_cache import MemoryBoundedCache, estimate_size
+
+QUERY_CACHE_MAX_MB = int(os.environ.get("QUERY_CACHE_MAX_MB", 256))
+QUERY_CACHE_TTL = int(os.environ.get("QUERY_CACHE_TTL", 3600))  # seconds
+QUERY_CACHE_DISK = os.environ.get("QUERY_CACHE_DISK", "0") == "1"
+QUERY_CACHE_DISK_MB = int(os.environ.get("QUERY_CACHE_DISK_MB", 2048))
+QUERY_CACHE_DIR = os.path.join(CACHE_DIR, "queries")
+
+# Filter values equivalent to "no restriction" (in normalized form), dropped before fingerprinting
+DEFAULT_FILTERS = {
+    "vcpu_range": (0.0, 128.0),
+    "mem_range": (0.0, 2048.0),
+    "term_types": ("OnDemand", "Reserved"),
+}
+
+
+def normalize_filters(filters: dict) -> dict:
+    """Canonical form of a fetch_pricing filter dict: sorted values, no empty or default entries."""
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if isinstance(value, (set, frozenset, list)):
+            value = tuple(sorted({str(v) for v in value}))
+        elif isinstance(value, tuple):
+            value = tuple(float(v) for v in value)
+        if not value or value == DEFAULT_FILTERS.get(key):
+            continue
+        normalized[key] = value
+    return normalized
+
+
+def _is_range(value: tuple) -> bool:
+    return len(value) == 2 and isinstance(value[0], float)
+
+
+def covers(broad: dict, narrow: dict) -> bool:
+    """
+    True if every row matching the normalized filters `narrow` also matches `broad`.
+    A missing entry means the default (for ranges and term types) or no restriction.
+    """
+    for key in set(broad) | set(narrow):
+        outer = broad.get(key, DEFAULT_FILTERS.get(key))
+        inner = narrow.get(key, DEFAULT_FILTERS.get(key))
+        if outer is None:
+            continue
+        if inner is None:
+            return False
+        if _is_range(outer):
+            if not (_is_range(inner) and outer[0] <= inner[0] and inner[1] <= outer[1]):
+                return False
+        elif not set(inner) <= set(outer):
+            return False
+    return True
+
+
+def fingerprint(region: str, version: str, filters: dict) -> str:
+    payload = {"region": region, "version": version, "filters": normalize_filters(filters)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=list).encode("utf-8")).hexdigest()
+
+
+def _restore_categories(df: pd.DataFrame) -> pd.DataFrame:
+    # Arrow dictionaries come back with object categories; results are merged with
+    # union_categoricals, which needs the str categories the compact schema uses
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.dtype == object:
+            df[column] = values.cat.rename_categories(values.cat.categories.astype(str))
+    return df
+
+
+class QueryResultCache:
+    """
+    Memory-bounded, TTL-limited cache of query results with an optional shared disk tier.
+    Concurrent requests for the same key compute it once. Entries stored with a scope and
+    their normalized filters can answer narrower queries in the same scope via `refine`.
+    """
+
+    def __init__(self, max_bytes: int, ttl: int, disk_dir: str = None, disk_max_bytes: int = 0):
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.memory = MemoryBoundedCache(max_bytes, sizeof=lambda entry: estimate_size(entry[1]),
+                                         on_evict=lambda key, entry: self._forget(key))
+        self._key_locks = {}  # key -> [lock, number of threads holding or waiting for it]
+        self._guard = threading.Lock()
+        self._scopes = {}  # scope -> {key: normalized filters} of entries usable for refinement
+        self.hits = 0
+        self.disk_hits = 0
+        self.subset_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @contextmanager
+    def _locked(self, key: str):
+        """Holds the lock of `key`; it is dropped once no thread holds or waits for it."""
+        with self._guard:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def _get_entry(self, key: str):
+        """(created, value) of a live in-memory entry, or None; an expired entry is dropped."""
+        entry = self.memory.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            self.memory.pop(key)
+            self._forget(key)
+            self.expired += 1
+            return None
+        return entry
+
+    def _get_memory(self, key: str):
+        entry = self._get_entry(key)
+        return None if entry is None else entry[1]
+
+    def _forget(self, key: str):
+        """Drops an evicted or expired entry from the refinement scopes."""
+        with self._guard:
+            for scope, entries in list(self._scopes.items()):
+                if key in entries:
+                    del entries[key]
+                    if not entries:
+                        del self._scopes[scope]
+
+    def _broader(self, scope, filters: dict):
+        """
+        (created, value) of the smallest live in-memory result of `scope` whose filters
+        cover `filters`, or None.
+        """
+        with self._guard:
+            candidates = list(self._scopes.get(scope, {}).items())
+        best = None
+        for key, cached_filters in candidates:
+            if not covers(cached_filters, filters):
+                continue
+            entry = self._get_entry(key)
+            if entry is None:
+                self._forget(key)
+            elif best is None or len(entry[1]) < len(best[1]):
+                best = entry
+        return best
+
+    def get_or_compute(self, key: str, compute, scope=None, filters: dict = None, refine=None) -> pd.DataFrame:
+        """
+        Cached value of `key`, else `refine(broader, filters)` on a cached result of the same
+        `scope` whose filters contain `filters`, else `compute()`.
+        """
+        value = self._get_memory(key)
+        if value is not None:
+            self.hits += 1
+            metrics.count("query_cache.hits")
+            return value
+        with self._locked(key):
+            # Another thread may have computed it while we waited
+            value = self._get_memory(key)
+            if value is not None:
+                self.hits += 1
+                metrics.count("query_cache.hits")
+                return value
+            value = self._read_disk(key)
+            broader = None
+            if value is not None:
+                self.disk_hits += 1
+                metrics.count("query_cache.disk_hits")
+            elif refine is not None and scope is not None:
+                broader = self._broader(scope, filters)
+            created = time.time()
+            if broader is not None:
+                # Refined results are cheap to rebuild, so they are not written to disk. They
+                # expire with the result they were narrowed from
+                self.subset_hits += 1
+                metrics.count("query_cache.subset_hits")
+                created, value = broader[0], refine(broader[1], filters)
+            elif value is None:
+                self.misses += 1
+                metrics.count("query_cache.misses")
+                value = compute()
+                self._write_disk(key, value)
+            if scope is not None:
+                # Registered first, so an eviction of the entry always finds it to drop
+                with self._guard:
+                    self._scopes.setdefault(scope, {})[key] = filters
+            self.memory.put(key, (created, value))
+        return value
+
+    # --- Disk tier ---
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.arrow")
+
+    def _read_disk(self, key: str):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                self.expired += 1
+                return None
+            return _restore_categories(pa.ipc.open_file(pa.memory_map(path, "r")).read_all().to_pandas())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Unreadable query cache file {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, value: pd.DataFrame):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            table = pa.Table.from_pandas(value, preserve_index=False)
+            path = self._path(key)
+            # Per-process temp name: other workers may be writing the same key
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with pa.OSFile(tmp, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+            self._evict_disk()
+        except Exception as e:
+            logging.warning(f"Could not persist query result {key}: {e}")
+
+    def _evict_disk(self):
+        """Deletes expired files, then the oldest ones until the directory fits its budget."""
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".arrow"):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if time.time() - stat.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        self.memory.clear()
+        with self._guard:
+            self._scopes.clear()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                self._remove(os.path.join(self.disk_dir, name))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.subset_hits + self.misses
+        memory = self.memory.stats()
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "subset_hits": self.subset_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": (self.hits + self.disk_hits + self.subset_hits) / lookups if lookups else 0.0,
+            "entries": memory["entries"],
+            "bytes": memory["bytes"],
+            "evictions": memory["evictions"],
+        }
+
+
+query_cache = QueryResultCache(
+    max_bytes=QUERY_CACHE_MAX_MB * 1024 * 1024,
+    ttl=QUERY_CACHE_TTL,
+    disk_dir=QUERY_CACHE_DIR if QUERY_CACHE_DISK else None,
+    disk_max_bytes=QUERY_CACHE_DISK_MB * 1024 * 1024,
+)
+
+
+def cached_query(region: str, version: str, filters: dict, compute, refine=None) -> pd.DataFrame:
+    """
+    Result of `compute()` for this region / offer version / filter combination, cached.
+    With `refine(frame, filters)`, a cached result for broader filters of the same region and
+    version is narrowed instead of calling `compute()`.
+    The returned frame is shared between callers and must be treated as read-only.
+    """
+    return query_cache.get_or_compute(fingerprint(region, version, filters), compute,
+                                      scope=(region, version), filters=normalize_filters(filters), refine=refine)
@@ -1,63 +1,325 @@
-import pandas as pd
-from core import get_on_demand_rate, get_savings_plan_rate
-from mappings import get_all_regions, region_name_map
+import argparse
+import heapq
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import cost_model
+import exporters
+import instance_catalog
+import metrics
+from cost_model import HOURS_PER_MONTH
+from ec2_sp_backend import (
+    MAX_THREADS,
+    on_demand_rates,
+    operation_by_platform_dict,
+    operation_code_to_pricing_os,
+    preinstalled_sw_map,
+    region_name_map,
+    savings_plan_rates,
+)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+SHORT_TERM_MONTHS = 3  # below this, On-Demand is preferred over a 1yr Savings Plan
+TOP_K = 3
+BATCH_CHUNK_ROWS = 1024  # workloads scored per (chunk x catalog) matrix
 
+# Batch input: workload column -> default (None = required)
+WORKLOAD_COLUMNS = {
+    "vcpu_required": None,
+    "memory_required": None,
+    "os": None,
+    "region": None,
+    "usage_months": None,
+    "burstable_ok": True,
+    "architecture": "",
+    "tenancy": "Shared",
+}
+
+# Fallback when the offline instance catalog cannot be loaded
 INSTANCE_DB = [
-    {"instanceType": "t3.micro", "vCPU": 2, "memoryGiB": 1, "burstable": True},
-    {"instanceType": "t3.small", "vCPU": 2, "memoryGiB": 2, "burstable": True},
-    {"instanceType": "t3a.small", "vCPU": 2, "memoryGiB": 2, "burstable": True},
-    {"instanceType": "m5.large", "vCPU": 2, "memoryGiB": 8, "burstable": False},
-    {"instanceType": "m6g.medium", "vCPU": 1, "memoryGiB": 4, "burstable": False},
-    
+    {"instanceType": "t3.micro", "vCPU": 2, "memoryGiB": 1, "burstable": True, "architecture": "x86_64"},
+    {"instanceType": "t3.small", "vCPU": 2, "memoryGiB": 2, "burstable": True, "architecture": "x86_64"},
+    {"instanceType": "t3a.small", "vCPU": 2, "memoryGiB": 2, "burstable": True, "architecture": "x86_64"},
+    {"instanceType": "m5.large", "vCPU": 2, "memoryGiB": 8, "burstable": False, "architecture": "x86_64"},
+    {"instanceType": "m6g.medium", "vCPU": 1, "memoryGiB": 4, "burstable": False, "architecture": "arm64"},
+
 ]
 
-def recommend_instances(vcpu_required, memory_required, os, region, usage_months, burstable_ok=True):
+def load_instances() -> pd.DataFrame:
+    """Every instance type in the offline catalog (InstanceType, vCPU, MemoryGiB, Architecture, Burstable)."""
+    try:
+        return instance_catalog.load_catalog()
+    except Exception as e:
+        logger.warning(f"Instance catalog unavailable, using built-in list: {e}")
+        return pd.DataFrame({
+            "InstanceType": [i["instanceType"] for i in INSTANCE_DB],
+            "vCPU": np.array([i["vCPU"] for i in INSTANCE_DB], dtype=np.int16),
+            "MemoryGiB": np.array([i["memoryGiB"] for i in INSTANCE_DB], dtype=np.float32),
+            "Architecture": [i["architecture"] for i in INSTANCE_DB],
+            "Burstable": [i["burstable"] for i in INSTANCE_DB],
+        })
+
+def resolve_usage_operation(os_name: str) -> str:
+    """Usage operation for an app OS name ("Linux/UNIX") or a Pricing API one ("Linux", "RHEL")."""
+    if os_name in operation_by_platform_dict:
+        return operation_by_platform_dict[os_name]
+    for operation, pricing_os in operation_code_to_pricing_os.items():
+        # The plain OS, not one of its SQL Server bundles
+        if pricing_os == os_name and preinstalled_sw_map.get(operation, "NA") == "NA":
+            return operation
+    raise ValueError(f"Unknown operating system '{os_name}'")
+
+def candidate_instances(vcpu_required, memory_required, burstable_ok=True, architectures=None) -> pd.DataFrame:
+    """Catalog rows meeting the constraints, selected with one boolean mask."""
+    catalog = load_instances()
+    mask = (catalog["vCPU"].to_numpy() >= vcpu_required) & (catalog["MemoryGiB"].to_numpy() >= memory_required)
+    if not burstable_ok:
+        mask &= ~catalog["Burstable"].to_numpy(dtype=bool)
+    if architectures:
+        mask &= catalog["Architecture"].isin(list(architectures)).to_numpy()
+    return catalog.loc[mask].reset_index(drop=True)
+
+def _region_rates(region, usage_operation, instance_types, tenancy):
+    """(On-Demand, 1yr Compute SP) hourly rates of `instance_types` in `region`; NaN where missing."""
+    od = on_demand_rates(region, usage_operation, instance_types, tenancy)
+    try:
+        sp = savings_plan_rates(region, usage_operation, instance_types, tenancy)
+    except Exception as e:
+        logger.warning(f"No Savings Plan rates for {region}: {e}")
+        sp = np.full(len(instance_types), np.nan)
+    return od, sp
+
+def _profile_plans(region, usage_operation, instance_types, tenancy, profile, usage_months):
+    """Cheapest Savings Plan + On-Demand mix for `profile` on every instance type of `region` (cost_model)."""
+    od = on_demand_rates(region, usage_operation, instance_types, tenancy)
+    try:
+        sp = cost_model.sp_option_rates(region, usage_operation, instance_types, tenancy)
+    except Exception as e:
+        logger.warning(f"No Savings Plan rates for {region}: {e}")
+        sp = np.full((len(cost_model.SP_OPTIONS), len(instance_types)), np.nan)
+    return od, sp, cost_model.cheapest_plans(profile, od, sp, horizon_months=usage_months)
+
+def _price_regions(vcpu_required, memory_required, os, region, burstable_ok, architectures, price):
+    """
+    (regions, candidate instances, price(region, usage_operation, instance_types) for every region)
+    for one recommend_instances query; regions are priced concurrently. Nothing is priced when
+    no instance type fits.
+    """
+    regions = list(region_name_map) if region is None else [region] if isinstance(region, str) else list(region)
+    usage_operation = resolve_usage_operation(os)
+    candidates = candidate_instances(vcpu_required, memory_required, burstable_ok, architectures)
+    if candidates.empty or not regions:
+        return regions, candidates, []
+    instance_types = candidates["InstanceType"].tolist()
+
+    with metrics.span("recommend.rates"), ThreadPoolExecutor(max_workers=min(MAX_THREADS, len(regions))) as pool:
+        priced = list(pool.map(metrics.in_context(lambda r: price(r, usage_operation, instance_types)), regions))
+    return regions, candidates, priced
+
+def _cheapest(cost, top_k, regions, candidates):
+    """
+    The `top_k` cheapest cells of a (regions x candidates) monthly cost matrix, picked with a
+    heap (unpriced cells are +inf or NaN): (monthly cost, region row, candidate column, base record).
+    """
+    valid = np.flatnonzero(np.isfinite(cost).ravel())
+    metrics.count("recommend.candidates", cost.size)
+    for monthly, flat in heapq.nsmallest(top_k, zip(cost.ravel()[valid].tolist(), valid.tolist())):
+        r, c = divmod(flat, len(candidates))
+        yield monthly, r, c, {
+            "Region": regions[r],
+            "InstanceType": candidates["InstanceType"].iat[c],
+            "vCPU": int(candidates["vCPU"].iat[c]),
+            "MemoryGiB": float(candidates["MemoryGiB"].iat[c]),
+            "Architecture": candidates["Architecture"].iat[c],
+        }
+
+def recommend_instances(vcpu_required, memory_required, os, region, usage_months, burstable_ok=True,
+                        architectures=None, tenancy="Shared", top_k=TOP_K, usage_profile=None):
+    """
+    The `top_k` cheapest instance types meeting the vCPU / memory / burstable / architecture
+    constraints, across one region or a list of regions (None for every region).
+    Rates come from the local On-Demand and Savings Plan rate tables; candidates are costed as
+    arrays per region and the cheapest picked with a heap instead of sorting every row.
+
+    With `usage_profile` (hourly instance counts, see cost_model.read_profile) every candidate is
+    costed as its cheapest Savings Plan commitment (any type, term and purchasing option) plus
+    On-Demand overflow over `usage_months`, instead of the fixed On-Demand / 1yr SP rule.
+    """
+    if usage_profile is not None:
+        return _recommend_for_profile(vcpu_required, memory_required, os, region, usage_months, burstable_ok,
+                                      architectures, tenancy, top_k, cost_model.read_profile(usage_profile))
+    regions, candidates, rates = _price_regions(
+        vcpu_required, memory_required, os, region, burstable_ok, architectures,
+        lambda r, usage_operation, instance_types: _region_rates(r, usage_operation, instance_types, tenancy))
+    if not rates:
+        return []
+
+    # regions x candidates
+    ondemand = np.vstack([od for od, _ in rates])
+    sp_1yr = np.vstack([sp for _, sp in rates])
+    preferred_rate = ondemand if usage_months < SHORT_TERM_MONTHS else sp_1yr
+    # Both rates are reported, so a candidate needs both
+    cost = np.where(np.isnan(ondemand) | np.isnan(sp_1yr), np.inf, preferred_rate * HOURS_PER_MONTH)
+
+    recommendations = []
+    for monthly, r, c, record in _cheapest(cost, top_k, regions, candidates):
+        recommendations.append({
+            **record,
+            "OnDemandHr": float(ondemand[r, c]),
+            "SP_1yr_Hr": float(sp_1yr[r, c]),
+            "PreferredCost": round(monthly, 2),
+            "PricingModel": "On-Demand" if usage_months < SHORT_TERM_MONTHS else "1yr SP",
+        })
+    return recommendations
+
+def _recommend_for_profile(vcpu_required, memory_required, os, region, usage_months, burstable_ok,
+                           architectures, tenancy, top_k, profile):
+    regions, candidates, priced = _price_regions(
+        vcpu_required, memory_required, os, region, burstable_ok, architectures,
+        lambda r, usage_operation, instance_types: _profile_plans(r, usage_operation, instance_types, tenancy,
+                                                                  profile, usage_months))
+    if not priced:
+        return []
+
+    cost = np.vstack([plans["monthly_cost"] for _, _, plans in priced])
+    sp_1yr_row = cost_model.SP_OPTIONS.index(("ComputeSavingsPlans", "1yr", "No Upfront"))
+
     recommendations = []
+    for monthly, r, c, record in _cheapest(cost, top_k, regions, candidates):
+        od, sp, plans = priced[r]
+        recommendations.append({
+            **record,
+            "OnDemandHr": float(od[c]),
+            "SP_1yr_Hr": float(sp[sp_1yr_row, c]),
+            "Commitment": float(plans["commitment"][c]),
+            "CommitmentHr": round(float(plans["commitment_hourly"][c]), 4),
+            "OnDemandCost": round(float(plans["on_demand_cost"][c]), 2),
+            "PreferredCost": round(monthly, 2),
+            "PricingModel": cost_model.plan_label(int(plans["plan"][c])),
+        })
+    return recommendations
+
+def read_workloads(workloads) -> pd.DataFrame:
+    """Workload table from a DataFrame or a CSV path, with defaults filled in and types checked."""
+    df = pd.read_csv(workloads) if isinstance(workloads, str) else workloads.copy()
+    missing = [c for c, default in WORKLOAD_COLUMNS.items() if default is None and c not in df.columns]
+    if missing:
+        raise ValueError(f"Workload table is missing column(s): {', '.join(missing)}")
+    for column, default in WORKLOAD_COLUMNS.items():
+        if column not in df.columns:
+            df[column] = default
+        elif default is not None:
+            df[column] = df[column].fillna(default)
+    df["burstable_ok"] = df["burstable_ok"].map(
+        lambda v: v if isinstance(v, (bool, np.bool_)) else str(v).strip().lower() in ("1", "true", "yes", "y"))
+    return df.reset_index(drop=True)
+
+def _assign(catalog, workloads, ondemand, sp_1yr):
+    """
+    Cheapest feasible catalog row per workload: a (workloads x catalog) cost matrix with
+    infeasible or unpriced cells at +inf, reduced with argmin. Returns (positions, monthly costs).
+    """
+    vcpu = catalog["vCPU"].to_numpy()
+    memory = catalog["MemoryGiB"].to_numpy()
+    burstable = catalog["Burstable"].to_numpy(dtype=bool)
+    architecture = catalog["Architecture"].to_numpy()
+    priced = ~np.isnan(ondemand) & ~np.isnan(sp_1yr)
 
-    for inst in INSTANCE_DB:
-        if inst["vCPU"] < vcpu_required or inst["memoryGiB"] < memory_required:
-            continue
-        if not burstable_ok and inst["burstable"]:
-            continue
+    feasible = ((vcpu[None, :] >= workloads["vcpu_required"].to_numpy()[:, None])
+                & (memory[None, :] >= workloads["memory_required"].to_numpy()[:, None])
+                & (workloads["burstable_ok"].to_numpy(dtype=bool)[:, None] | ~burstable[None, :])
+                & priced[None, :])
+    wanted = workloads["architecture"].astype(str).to_numpy()
+    feasible &= (wanted[:, None] == "") | (wanted[:, None] == architecture[None, :])
 
-        instance_type = inst["instanceType"]
+    short_term = workloads["usage_months"].to_numpy() < SHORT_TERM_MONTHS
+    rate = np.where(short_term[:, None], ondemand[None, :], sp_1yr[None, :])
+    cost = np.where(feasible, rate * HOURS_PER_MONTH, np.inf)
+    best = cost.argmin(axis=1)
+    return best, cost[np.arange(len(best)), best]
 
+def _usage_operations(os_names) -> dict:
+    """Usage operation of every OS name, None (with a warning) for names that have none."""
+    operations = {}
+    for os_name in os_names:
         try:
-            ondemand = get_on_demand_rate(region, instance_type, os)
-            sp_1yr = get_savings_plan_rate(region, instance_type, os, term="1yr", plan_type="Compute")
-
-            if ondemand is None or sp_1yr is None:
-                continue
-
-            # Cost evaluation
-            if usage_months < 3:
-                preferred = "On-Demand"
-                cost = ondemand * 24 * 30
-            else:
-                preferred = "1yr SP"
-                cost = sp_1yr * 24 * 30
-
-            recommendations.append({
-                "InstanceType": instance_type,
-                "vCPU": inst["vCPU"],
-                "MemoryGiB": inst["memoryGiB"],
-                "OnDemandHr": ondemand,
-                "SP_1yr_Hr": sp_1yr,
-                "PreferredCost": round(cost, 2),
-                "PricingModel": preferred
-            })
-
-        except Exception as e:
-            logger.warning(f"Error processing {instance_type}: {e}")
-            continue
-
-    # Sort by cost
-    sorted_recs = sorted(recommendations, key=lambda x: x["PreferredCost"])
-
-    return sorted_recs[:3]  # Top 3
+            operations[os_name] = resolve_usage_operation(os_name)
+        except ValueError as e:
+            logger.warning(f"{e}: its workloads are left unmatched")
+            operations[os_name] = None
+    return operations
+
+def recommend_batch(workloads) -> pd.DataFrame:
+    """
+    Best instance type and pricing model for every workload in a table (DataFrame or CSV path
+    with the WORKLOAD_COLUMNS). Rates are looked up once per (region, OS, tenancy) for the whole
+    catalog, and each group of workloads is assigned with array operations, so the cost grows
+    with the number of rows rather than rows x rate lookups. Workloads nothing fits, or with
+    an operating system that has no usage operation, get no instance type.
+    """
+    workloads = read_workloads(workloads)
+    catalog = load_instances().reset_index(drop=True)
+    instance_types = catalog["InstanceType"].tolist()
+    # "Linux" and "Linux/UNIX" are the same usage operation, priced once; rows with an unknown
+    # OS have none, drop out of the groups and are reported unmatched
+    operations = workloads["os"].map(_usage_operations(workloads["os"].unique()))
+    groups = list(workloads.groupby([workloads["region"], operations, workloads["tenancy"]], sort=False).groups.items())
+
+    def price(group):
+        region, usage_operation, tenancy = group
+        return _region_rates(region, usage_operation, instance_types, tenancy)
+
+    with metrics.span("recommend.rates"), ThreadPoolExecutor(max_workers=min(MAX_THREADS, max(len(groups), 1))) as pool:
+        rates = list(pool.map(metrics.in_context(price), [group for group, _ in groups]))
+
+    best = np.full(len(workloads), -1)
+    monthly = np.full(len(workloads), np.nan)
+    od_hr = np.full(len(workloads), np.nan)
+    sp_hr = np.full(len(workloads), np.nan)
+    with metrics.span("recommend.assign"):
+        for (_, rows), (ondemand, sp_1yr) in zip(groups, rates):
+            rows = np.asarray(rows)
+            for start in range(0, len(rows), BATCH_CHUNK_ROWS):
+                chunk = rows[start:start + BATCH_CHUNK_ROWS]
+                positions, costs = _assign(catalog, workloads.iloc[chunk], ondemand, sp_1yr)
+                found = np.isfinite(costs)
+                chunk, positions = chunk[found], positions[found]
+                best[chunk] = positions
+                monthly[chunk] = costs[found]
+                od_hr[chunk] = ondemand[positions]
+                sp_hr[chunk] = sp_1yr[positions]
+    metrics.count("recommend.workloads", len(workloads))
+
+    matched = best >= 0
+    picked = catalog.iloc[np.where(matched, best, 0)].reset_index(drop=True)
+    model = np.where(workloads["usage_months"].to_numpy() < SHORT_TERM_MONTHS, "On-Demand", "1yr SP")
+    return workloads.assign(
+        InstanceType=picked["InstanceType"].where(matched),
+        vCPU=picked["vCPU"].where(matched),
+        MemoryGiB=picked["MemoryGiB"].where(matched),
+        Architecture=picked["Architecture"].where(matched),
+        OnDemandHr=od_hr,
+        SP_1yr_Hr=sp_hr,
+        PreferredCost=np.round(monthly, 2),
+        PricingModel=pd.Series(model).where(matched),
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recommend an instance type for every workload in a CSV file.")
+    parser.add_argument("workloads", help=f"CSV with columns {', '.join(WORKLOAD_COLUMNS)}")
+    parser.add_argument("-o", "--output", required=True, help="output file (.csv, .parquet or .xlsx)")
+    args = parser.parse_args(argv)
+
+    results = recommend_batch(args.workloads)
+    with exporters.open_writer(args.output) as writer:
+        writer.write(results)
+    unmatched = int(results["InstanceType"].isna().sum())
+    print(f"{len(results)} workloads -> {args.output}" + (f" ({unmatched} without a fitting instance)" if unmatched else ""))
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# --- Reserved Instance vs Savings Plan break-even analysis ---
+# fetch_pricing returns every Reserved offer as separate price dimensions: the upfront fee
+# (Unit "Quantity") and the hourly charge (Unit "Hrs"). compare_reserved() pairs them in one
+# grouped pass over the result, amortizes the fee over the lease into an effective hourly cost,
+# and joins the ec2_sp_backend On-Demand and Savings Plan rates (same term and purchasing
+# option) with one vectorized lookup per (region, usage operation, tenancy) group.
+#
+# The cumulative cost of an offer after t hours, upfront + hourly * t, meets that of an
+# alternative paying rate_upfront + rate * t at t = (upfront - rate_upfront) / (rate - hourly);
+# the break-even month is the month from which the offer stays cheaper, or NaN when it is not
+# cheaper by the end of the lease. Savings Plan rates are effective hourly rates: a Partial or
+# All Upfront plan pays SP_UPFRONT_SHARE of the term's commitment at purchase and the rest hourly.
+#
+# Usage:
+#   python reserved_breakeven.py --regions us-east-1 eu-west-1 --families m5 c6g -o ri_vs_sp.csv
+
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+import ec2_sp_backend
+import exporters
+import metrics
+import pricing_cli
+import pricing_filter
+from cost_model import HOURS_PER_MONTH, TERM_MONTHS
+from ec2_sp_backend import on_demand_rates, operation_code_to_pricing_os, preinstalled_sw_map, savings_plan_rates
+
+# Reserved fees are amortized over the same 720-hour months as the cost model
+LEASE_HOURS = {term: months * HOURS_PER_MONTH for term, months in TERM_MONTHS.items()}
+
+# Share of a Savings Plan's commitment over the term that is paid at purchase
+SP_UPFRONT_SHARE = {"No Upfront": 0.0, "Partial Upfront": 0.5, "All Upfront": 1.0}
+
+# Columns identifying one Reserved offer in a fetch_pricing result
+OFFER_KEYS = ["Region", "Instance Type", "Operating System", "Tenancy", "Pre Installed S/W",
+              "License Model", "OfferingClass", "LeaseContractLength", "PurchaseOption"]
+
+# Offer file tenancy -> Savings Plan tenancy
+SP_TENANCY = {"Shared": "Shared", "Dedicated": "Dedicated Instance", "Host": "Dedicated Host"}
+
+# (operatingSystem, preInstalledSw) -> usage operation; the app's operations win where the
+# mapping is ambiguous. Bring-your-own-license offers have their own operations.
+USAGE_OPERATIONS = {}
+for _operation in [*ec2_sp_backend.operation_by_platform_dict.values(), *operation_code_to_pricing_os]:
+    USAGE_OPERATIONS.setdefault((operation_code_to_pricing_os[_operation], preinstalled_sw_map.get(_operation, "NA")), _operation)
+BYOL_OPERATIONS = {"Windows": "RunInstances:0800", "RHEL": "RunInstances:00g0"}
+
+BREAKEVEN_COLUMNS = OFFER_KEYS + [
+    "Upfront ($)", "Hourly ($)", "Effective Hourly ($)", "On-Demand Rate ($)", "Savings over On-Demand (%)",
+    "Break-even Month (On-Demand)", "Compute SP Rate ($)", "EC2 Instance SP Rate ($)",
+    "Savings over Savings Plan (%)", "Break-even Month (Savings Plan)", "Cheapest Option",
+]
+
+
+def usage_operation(operating_system, pre_sw, license_model):
+    """Usage operation of an offer file product, or None if it has no Savings Plan equivalent."""
+    if license_model == "Bring your own license":
+        return BYOL_OPERATIONS.get(operating_system) if pre_sw == "NA" else None
+    return USAGE_OPERATIONS.get((operating_system, pre_sw))
+
+
+def reserved_offers(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per Reserved offer in a fetch_pricing result, with its upfront fee and hourly
+    charge side by side (0 where the offer has no such price dimension).
+    """
+    reserved = frame[frame["TermType"] == "Reserved"]
+    # Duplicate dimensions (the same offer under several SKUs) carry the same price: keep the first
+    prices = (reserved.groupby(OFFER_KEYS + ["Unit"], observed=True, sort=False, dropna=False)["PricePerUnit"]
+              .first().unstack("Unit"))
+    prices = prices.reindex(columns=["Quantity", "Hrs"]).fillna(0.0)
+    offers = prices.reset_index()
+    offers.columns = OFFER_KEYS + ["Upfront ($)", "Hourly ($)"]
+    return offers
+
+
+def breakeven_month(upfront, hourly, rate, lease_hours, rate_upfront=0.0):
+    """
+    Month of the lease from which the offer is cheaper than paying `rate_upfront` plus `rate`
+    per hour (NaN if it is not cheaper by the end of the lease).
+    """
+    extra_upfront = upfront - rate_upfront
+    saving = rate - hourly
+    pays_off = (extra_upfront <= saving * lease_hours) & ((extra_upfront != 0) | (saving != 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hours = np.where(extra_upfront > 0, extra_upfront / saving, 0.0)
+    return np.where(pays_off, np.maximum(np.ceil(hours / HOURS_PER_MONTH), 1), np.nan)
+
+
+def _join_rates(offers: pd.DataFrame):
+    """On-Demand, Compute SP and EC2 Instance SP hourly rates for every offer; NaN where missing."""
+    n = len(offers)
+    ondemand, compute_sp, instance_sp = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+
+    # Instance types, terms and options as category codes; strings are only built per group
+    types = offers["Instance Type"].astype("category").cat
+    type_codes, type_names = types.codes.to_numpy(), types.categories.to_numpy()
+    plan_codes = offers[["LeaseContractLength", "PurchaseOption"]]
+    failed = set()
+    products = offers.groupby(["Region", "Operating System", "Pre Installed S/W", "License Model", "Tenancy"],
+                              observed=True, sort=False)
+    for (region, operating_system, pre_sw, license_model, tenancy), rows in products.indices.items():
+        operation, tenancy = usage_operation(operating_system, pre_sw, license_model), SP_TENANCY.get(tenancy)
+        if operation is None or tenancy is None:
+            continue
+        codes, inverse = np.unique(type_codes[rows], return_inverse=True)
+        ondemand[rows] = on_demand_rates(region, operation, type_names[codes].tolist(), tenancy)[inverse]
+        if region in failed:
+            continue
+        try:
+            for (term, option), sub in plan_codes.iloc[rows].groupby(list(plan_codes), observed=True, sort=False).indices.items():
+                sub_rows = rows[sub]
+                codes, inverse = np.unique(type_codes[sub_rows], return_inverse=True)
+                for target, sp_type in ((compute_sp, "ComputeSavingsPlans"), (instance_sp, "EC2InstanceSavingsPlans")):
+                    target[sub_rows] = savings_plan_rates(region, operation, type_names[codes].tolist(), tenancy,
+                                                          sp_type, term, option)[inverse]
+        except Exception as e:
+            logging.warning(f"No Savings Plan rates for {region}, Reserved offers are compared with On-Demand only: {e}")
+            failed.add(region)
+    return ondemand, compute_sp, instance_sp
+
+
+@metrics.timed("reserved.breakeven")
+def compare_reserved(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reserved vs On-Demand vs Savings Plan comparison for every Reserved offer in a fetch_pricing
+    result (BREAKEVEN_COLUMNS). Each offer is compared with the Savings Plans of the same term and
+    purchasing option; break-even against Savings Plans uses the cheaper of the two plan types,
+    including the plan's upfront payment.
+    """
+    offers = reserved_offers(frame)
+    if offers.empty:
+        return pd.DataFrame(columns=BREAKEVEN_COLUMNS)
+    metrics.count("reserved.offers", len(offers))
+
+    upfront = offers["Upfront ($)"].to_numpy(dtype=float)
+    hourly = offers["Hourly ($)"].to_numpy(dtype=float)
+    lease_hours = offers["LeaseContractLength"].astype(str).map(LEASE_HOURS).to_numpy(dtype=float)
+    effective = hourly + upfront / lease_hours
+    ondemand, compute_sp, instance_sp = _join_rates(offers)
+    best_sp = np.fmin(compute_sp, instance_sp)
+    sp_share = offers["PurchaseOption"].astype(str).map(SP_UPFRONT_SHARE).fillna(0.0).to_numpy(dtype=float)
+    sp_upfront = best_sp * lease_hours * sp_share
+    sp_hourly = best_sp * (1 - sp_share)
+
+    # Cheapest way to run the instance for the whole lease; unpriced alternatives never win
+    options = np.array(["Reserved Instance", "On-Demand", "Compute Savings Plan", "EC2 Instance Savings Plan"])
+    costs = np.column_stack([effective, ondemand, compute_sp, instance_sp])
+    cheapest = options[np.argmin(np.where(np.isnan(costs), np.inf, costs), axis=1)]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offers["Effective Hourly ($)"] = effective
+        offers["On-Demand Rate ($)"] = ondemand
+        offers["Savings over On-Demand (%)"] = np.round((1 - effective / ondemand) * 100, 1)
+        offers["Break-even Month (On-Demand)"] = breakeven_month(upfront, hourly, ondemand, lease_hours)
+        offers["Compute SP Rate ($)"] = compute_sp
+        offers["EC2 Instance SP Rate ($)"] = instance_sp
+        offers["Savings over Savings Plan (%)"] = np.round((1 - effective / best_sp) * 100, 1)
+        offers["Break-even Month (Savings Plan)"] = breakeven_month(upfront, hourly, sp_hourly, lease_hours, sp_upfront)
+    offers["Cheapest Option"] = pd.Categorical(cheapest, categories=options)
+    return offers[BREAKEVEN_COLUMNS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reserved Instance vs On-Demand vs Savings Plan break-even table.")
+    parser.add_argument("--regions", nargs="+", action="extend", default=[],
+                        help="region codes (default: every region in the region map)")
+    parser.add_argument("--os", nargs="+", action="extend", default=[])
+    parser.add_argument("--tenancy", nargs="+", action="extend", default=[])
+    parser.add_argument("--families", nargs="+", action="extend", default=[])
+    parser.add_argument("--instance-types", nargs="+", action="extend", default=[])
+    parser.add_argument("--purchase-options", nargs="+", action="extend", default=[])
+    parser.add_argument("--offering-classes", nargs="+", action="extend", default=[])
+    parser.add_argument("--lease-terms", nargs="+", action="extend", default=[])
+    parser.add_argument("-o", "--output", required=True, help="output file (.csv, .parquet or .xlsx)")
+    args = parser.parse_args(argv)
+
+    filters = {
+        "instance_types": set(args.instance_types),
+        "tenancies": set(args.tenancy),
+        "operating_systems": set(args.os),
+        "purchase_options": set(args.purchase_options),
+        "offering_classes": set(args.offering_classes),
+        "lease_terms": set(args.lease_terms),
+        "families": set(args.families),
+        "term_types": ["Reserved"],
+    }
+    regions = list(dict.fromkeys(args.regions)) or sorted(ec2_sp_backend.region_name_map.keys())
+    frames = []
+    for region in regions:
+        try:
+            frames.extend(pricing_cli.ondemand_region(region, filters))
+        except Exception as e:
+            logging.error(f"Reserved pricing failed for {region}: {e}")
+    table = compare_reserved(pricing_filter.concat_results(frames))
+    with exporters.open_writer(args.output) as writer:
+        writer.write(table)
+    print(f"{len(table)} Reserved offers in {len(regions)} region(s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# --- Server-side paged result tables ---
+# A query result is written once to an Arrow IPC file under CACHE_DIR/results and the UI keeps
+# only a small cursor (result id, page, sort, column filters) in st.session_state. Each render
+# memory-maps the file, applies the cursor's filters and sort with Arrow compute kernels and
+# converts just the current page to pandas, so only PAGE_SIZE rows reach the browser.
+
+import logging
+import os
+import time
+import uuid
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import metrics
+from http_cache import CACHE_DIR
+
+RESULTS_DIR = os.path.join(CACHE_DIR, "results")
+PAGE_SIZE = 50
+RESULT_TTL = int(os.environ.get("EC2_PRICING_RESULT_TTL", 24 * 3600))  # seconds
+
+
+def result_path(result_id: str) -> str:
+    return os.path.join(RESULTS_DIR, f"{result_id}.arrow")
+
+
+def new_cursor(result_id: str, rows: int, columns: list, numeric_columns: list = ()) -> dict:
+    return {
+        "result_id": result_id,
+        "rows": rows,
+        "columns": columns,
+        "numeric_columns": list(numeric_columns),
+        "page": 1,
+        "sort_by": None,
+        "ascending": True,
+        # column -> allowed values (list) or (min, max) for numeric columns
+        "filters": {},
+    }
+
+
+@metrics.timed("result.save")
+def save_result(df: pd.DataFrame) -> dict:
+    """Writes a result to the results directory and returns a cursor on its first page."""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    purge_expired()
+    result_id = uuid.uuid4().hex
+    # Categorical columns are stored dictionary-encoded, as in the pricing store
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    path = result_path(result_id)
+    with pa.OSFile(path + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=PAGE_SIZE * 1000)
+    os.replace(path + ".tmp", path)
+    numeric = [f.name for f in table.schema if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)]
+    return new_cursor(result_id, table.num_rows, table.column_names, numeric)
+
+
+def purge_expired():
+    """Deletes result files older than RESULT_TTL (abandoned sessions)."""
+    if not os.path.isdir(RESULTS_DIR):
+        return
+    cutoff = time.time() - RESULT_TTL
+    for name in os.listdir(RESULTS_DIR):
+        path = os.path.join(RESULTS_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError as e:
+            logging.warning(f"Could not purge result file {path}: {e}")
+
+
+def open_result(result_id: str) -> pa.Table:
+    return pa.ipc.open_file(pa.memory_map(result_path(result_id), "r")).read_all()
+
+
+def _decoded(column):
+    # Sorting and range comparisons need plain values, not dictionary indices
+    if pa.types.is_dictionary(column.type):
+        return column.cast(column.type.value_type)
+    return column
+
+
+def _filters_key(filters: dict) -> tuple:
+    """Hashable form of the cursor's column filters: ((column, "in" | "range", values), ...)."""
+    key = []
+    for column, condition in sorted(filters.items()):
+        if isinstance(condition, tuple):
+            key.append((column, "range", condition))
+        elif condition:
+            key.append((column, "in", tuple(sorted(condition))))
+    return tuple(key)
+
+
+def _filter_mask(table: pa.Table, filters: tuple) -> np.ndarray:
+    mask = np.ones(table.num_rows, dtype=bool)
+    for column, kind, values in filters:
+        data = table.column(column)
+        if kind == "range":
+            data = _decoded(data)
+            cond = pc.and_(pc.greater_equal(data, values[0]), pc.less_equal(data, values[1]))
+        else:
+            cond = pc.is_in(data, value_set=pa.array(values, type=_decoded(data).type))
+        mask &= pc.fill_null(cond, False).to_numpy(zero_copy_only=False)
+    return mask
+
+
+@lru_cache(maxsize=16)
+def _row_order(result_id: str, filters: tuple, sort_by: str, ascending: bool):
+    """Row positions in display order, or None when the result is shown as stored."""
+    if not filters and not sort_by:
+        return None
+    table = open_result(result_id)
+    rows = np.flatnonzero(_filter_mask(table, filters)) if filters else np.arange(table.num_rows)
+    if sort_by:
+        keys = _decoded(table.column(sort_by)).take(pa.array(rows))
+        order = pc.sort_indices(keys, sort_keys=[("", "ascending" if ascending else "descending")],
+                                null_placement="at_end").to_numpy()
+        rows = rows[order]
+    return rows
+
+
+def row_order(cursor: dict):
+    return _row_order(cursor["result_id"], _filters_key(cursor["filters"]), cursor["sort_by"], cursor["ascending"])
+
+
+def matching_rows(cursor: dict) -> int:
+    order = row_order(cursor)
+    return cursor["rows"] if order is None else len(order)
+
+
+def page_count(cursor: dict) -> int:
+    return max(1, -(-matching_rows(cursor) // PAGE_SIZE))
+
+
+def read_page(cursor: dict) -> pd.DataFrame:
+    """Materializes only the rows of the cursor's current page."""
+    table = open_result(cursor["result_id"])
+    page = min(max(cursor["page"], 1), page_count(cursor))
+    start = (page - 1) * PAGE_SIZE
+    order = row_order(cursor)
+    if order is None:
+        part = table.slice(start, PAGE_SIZE)
+    else:
+        part = table.take(pa.array(order[start:start + PAGE_SIZE]))
+    df = part.to_pandas()
+    df.index = pd.RangeIndex(start + 1, start + 1 + len(df))
+    return df
+
+
+def iter_frames(cursor: dict, chunk_rows: int = 100_000):
+    """The whole result in display order, chunk by chunk (for downloads)."""
+    table = open_result(cursor["result_id"])
+    order = row_order(cursor)
+    for start in range(0, matching_rows(cursor), chunk_rows):
+        if order is None:
+            yield table.slice(start, chunk_rows).to_pandas()
+        else:
+            yield table.take(pa.array(order[start:start + chunk_rows])).to_pandas()
+
+
+@lru_cache(maxsize=64)
+def _distinct_values(result_id: str, column: str) -> list:
+    values = _decoded(open_result(result_id).column(column))
+    return sorted(v for v in pc.unique(values).to_pylist() if v is not None)
+
+
+def distinct_values(cursor: dict, column: str) -> list:
+    return _distinct_values(cursor["result_id"], column)
+
+
+def delete_result(cursor: dict):
+    try:
+        os.remove(result_path(cursor["result_id"]))
+    except OSError:
+        pass
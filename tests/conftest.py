@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import ec2_sp_backend
+import http_cache
+import offer_parser
+import pricing_filter
+import pricing_store
+import query_cache
+
+
+def offer_sku(instance_type, price, reserved=(), **attributes):
+    """
+    One instance SKU for offer_document: an On-Demand hourly price, Reserved offers as
+    (LeaseContractLength, OfferingClass, PurchaseOption, upfront, hourly), and product
+    attributes that override the defaults (a Linux, Shared, parent-region product).
+    """
+    return {"instanceType": instance_type, "price": price, "reserved": list(reserved), "attributes": attributes}
+
+
+def offer_document(region, prices=None, version="20240101000000", skus=()):
+    """
+    A minimal offer file with one Linux On-Demand SKU per {instance type: hourly price},
+    after the offer_sku() specs in `skus` (in that order).
+    """
+    specs = list(skus) + [offer_sku(instance_type, price) for instance_type, price in sorted((prices or {}).items())]
+    products, on_demand, reserved = {}, {}, {}
+    for i, spec in enumerate(specs):
+        sku = f"{region}-SKU{i}"
+        attributes = {
+            "instanceType": spec["instanceType"], "location": ec2_sp_backend.region_name_map.get(region, region),
+            "regionCode": region, "vcpu": "2", "memory": "8 GiB", "tenancy": "Shared", "operatingSystem": "Linux",
+            "preInstalledSw": "NA", "licenseModel": "No License required", "capacitystatus": "Used",
+            "operation": "RunInstances", "currentGeneration": "Yes", "instanceFamily": "General purpose",
+            "physicalProcessor": "Intel Xeon Platinum 8175", "processorArchitecture": "64-bit",
+        }
+        attributes.update(spec["attributes"])
+        products[sku] = {"sku": sku, "productFamily": "Compute Instance", "attributes": attributes}
+        on_demand[sku] = {f"{sku}.JRTCKXETXF": {
+            "offerTermCode": "JRTCKXETXF", "sku": sku, "effectiveDate": "2024-01-01T00:00:00Z",
+            "termAttributes": {},
+            "priceDimensions": {f"{sku}.JRTCKXETXF.6YS6EN2CT7": {
+                "rateCode": f"{sku}.JRTCKXETXF.6YS6EN2CT7", "unit": "Hrs", "pricePerUnit": {"USD": str(spec["price"])},
+            }},
+        }}
+        terms = {}
+        for j, (lease, offering_class, option, upfront, hourly) in enumerate(spec["reserved"]):
+            term_id = f"{sku}.R{j}"
+            dimensions = {f"{term_id}.HRS": {"rateCode": f"{term_id}.HRS", "unit": "Hrs",
+                                            "pricePerUnit": {"USD": str(hourly)}}}
+            if upfront:
+                dimensions[f"{term_id}.QTY"] = {"rateCode": f"{term_id}.QTY", "unit": "Quantity",
+                                                "pricePerUnit": {"USD": str(upfront)}}
+            terms[term_id] = {
+                "offerTermCode": f"R{j}", "sku": sku, "effectiveDate": "2024-01-01T00:00:00Z",
+                "termAttributes": {"LeaseContractLength": lease, "OfferingClass": offering_class, "PurchaseOption": option},
+                "priceDimensions": dimensions,
+            }
+        if terms:
+            reserved[sku] = terms
+    return json.dumps({"formatVersion": "v1.0", "offerCode": "AmazonEC2", "version": version,
+                       "publicationDate": "2024-01-01T00:00:00Z", "products": products,
+                       "terms": {"OnDemand": on_demand, "Reserved": reserved}}).encode("utf-8")
+
+
+class OfferServer(ThreadingHTTPServer):
+    """
+    Stand-in for the AWS price list endpoint. `bodies` maps a path to the bytes served there
+    (with an ETag derived from them), `delays` to seconds to wait first and `failures` to a
+    status code to answer with instead. Every request is recorded in `requests`.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _OfferHandler)
+        self.bodies, self.delays, self.failures = {}, {}, {}
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+    def etag(self, path):
+        return f'"{hash(self.bodies[path]) & 0xffffffff:08x}"'
+
+
+class _OfferHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delays.get(self.path, 0))
+            status = server.failures.get(self.path)
+            if status or self.path not in server.bodies:
+                self.send_error(status or 404)
+                return
+            etag = server.etag(self.path)
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            body = server.bodies[self.path]
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def offer_server():
+    server = OfferServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch, offer_server):
+    """An empty pricing store and HTTP cache, with offer files served by `offer_server`."""
+    monkeypatch.setattr(pricing_store, "STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_DIR", str(tmp_path / "http"))
+    monkeypatch.setattr(offer_parser, "OFFER_URL", offer_server.url("/offers/{region}/index.json"))
+    monkeypatch.setattr(ec2_sp_backend, "_on_demand_table_failures", {})
+    _clear_caches()
+    yield tmp_path
+    _clear_caches()
+
+
+def _clear_caches():
+    # In-process caches of stored partitions, so no test sees another's store
+    pricing_filter.region_frame_cache.clear()
+    query_cache.query_cache.clear()
+    ec2_sp_backend.on_demand_rate_table.clear()
+    ec2_sp_backend.sp_region_cache.clear()
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import cost_model
+from cost_model import HOURS_PER_MONTH, ON_DEMAND, cheapest_plans, on_demand_cost, optimal_commitment, profile_curve
+
+
+def brute_force(profile, ondemand, sp_rate):
+    """Monthly cost of the best commitment among every profile level, priced hour by hour."""
+    profile = np.asarray(profile, dtype=float)
+    costs = [sp_rate * c + ondemand * np.maximum(profile - c, 0).mean() for c in np.append(np.unique(profile), 0.0)]
+    return min(costs) * HOURS_PER_MONTH
+
+
+def test_flat_profile_commits_to_the_whole_fleet():
+    curve = profile_curve(np.full(168, 5.0))
+    commitment, monthly = optimal_commitment(curve, 1.0, 0.6, term_months=12)
+    assert commitment == 5.0
+    assert monthly == pytest.approx(5 * 0.6 * HOURS_PER_MONTH)
+
+
+def test_all_zero_profile_costs_nothing():
+    curve = profile_curve(np.zeros(24))
+    commitment, monthly = optimal_commitment(curve, 1.0, 0.6, term_months=12)
+    assert commitment == 0.0 and monthly == 0.0
+    assert on_demand_cost(curve, 1.0) == 0.0
+
+    plans = cheapest_plans(np.zeros(24), np.array([1.0]), np.full((len(cost_model.SP_OPTIONS), 1), 0.6))
+    assert plans["plan"][0] == ON_DEMAND
+    assert plans["commitment"][0] == 0.0 and plans["monthly_cost"][0] == 0.0
+
+
+@pytest.mark.parametrize("sp_rate", [1.0, 1.5])
+def test_no_commitment_when_the_plan_is_not_cheaper(sp_rate):
+    profile = [0, 1, 4, 4, 2, 8, 3, 3]
+    curve = profile_curve(profile)
+    commitment, monthly = optimal_commitment(curve, 1.0, sp_rate, term_months=12)
+    assert commitment == 0.0
+    assert monthly == pytest.approx(on_demand_cost(curve, 1.0))
+
+    plans = cheapest_plans(profile, np.array([1.0]), np.full((len(cost_model.SP_OPTIONS), 1), sp_rate))
+    assert plans["plan"][0] == ON_DEMAND
+    assert plans["monthly_cost"][0] == pytest.approx(on_demand_cost(curve, 1.0))
+
+
+def test_short_horizon_pays_for_the_whole_term():
+    # 0.6 for 12 months of a 6-month horizon is 1.2 per used hour: never worth committing
+    curve = profile_curve(np.full(24, 3.0))
+    commitment, _ = optimal_commitment(curve, 1.0, 0.6, term_months=12, horizon_months=6)
+    assert commitment == 0.0
+    commitment, _ = optimal_commitment(curve, 1.0, 0.6, term_months=12, horizon_months=24)
+    assert commitment == 3.0
+
+
+def test_unpriced_rates_cost_infinity():
+    curve = profile_curve([1, 2, 3])
+    commitment, monthly = optimal_commitment(curve, np.array([np.nan, 1.0, 0.0]), 0.5, term_months=12)
+    assert np.isinf(monthly[0]) and np.isinf(monthly[2])
+    assert commitment[0] == 0.0 and np.isfinite(monthly[1])
+
+
+def test_matches_a_brute_force_scan():
+    rnd = np.random.default_rng(0)
+    for _ in range(50):
+        profile = rnd.integers(0, 12, size=rnd.integers(1, 60)).astype(float)
+        ondemand, sp_rate = rnd.uniform(0.1, 2.0), rnd.uniform(0.05, 2.5)
+        _, monthly = optimal_commitment(profile_curve(profile), ondemand, sp_rate, term_months=12)
+        assert monthly == pytest.approx(brute_force(profile, ondemand, sp_rate))
+
+
+@pytest.mark.parametrize("profile", [[], [1, -1], [1, np.nan]])
+def test_invalid_profiles(profile):
+    with pytest.raises(ValueError):
+        cost_model.read_profile(profile)
@@ -0,0 +1,45 @@
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from openpyxl import load_workbook
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+import exporters
+
+FRAMES = [
+    pd.DataFrame({"Region": pd.Categorical(["us-east-1", "us-east-1"]), "Instance Type": ["m5.large", "c5.large"],
+                  "PricePerUnit": [0.096, 0.085]}),
+    pd.DataFrame({"Region": pd.Categorical(["eu-west-1"]), "Instance Type": ["m5.large"], "PricePerUnit": [0.107]}),
+]
+EXPECTED = pd.concat([frame.astype({"Region": str}) for frame in FRAMES], ignore_index=True)
+
+
+def download(fmt):
+    """Bytes st.download_button serves for export_frames(FRAMES, fmt)."""
+    data, _ = convert_data_to_bytes_and_infer_mime(exporters.export_frames(iter(FRAMES), fmt), ValueError("unsupported"))
+    return data
+
+
+def test_csv_download():
+    result = pd.read_csv(io.BytesIO(download("csv")))
+    pd.testing.assert_frame_equal(result, EXPECTED, check_dtype=False)
+
+
+def test_parquet_download():
+    result = pq.read_table(io.BytesIO(download("parquet"))).to_pandas()
+    pd.testing.assert_frame_equal(result.astype({"Region": str}), EXPECTED, check_dtype=False)
+
+
+def test_xlsx_download_has_a_sheet_per_region():
+    workbook = load_workbook(io.BytesIO(download("xlsx")), read_only=True)
+    assert sorted(workbook.sheetnames) == ["eu-west-1", "us-east-1"]
+    rows = list(workbook["us-east-1"].values)
+    assert rows[0] == ("Region", "Instance Type", "PricePerUnit")
+    assert len(rows) == 3
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        exporters.export_frames(iter(FRAMES), "json")
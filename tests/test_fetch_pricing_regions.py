@@ -0,0 +1,62 @@
+import threading
+
+import ec2_pricing_data_fetch
+from conftest import offer_document
+
+REGIONS = ["us-east-1", "eu-west-1", "ap-south-1", "sa-east-1"]
+FILTERS = {"term_types": ["OnDemand"]}
+
+
+def serve_regions(server, regions):
+    for i, region in enumerate(regions):
+        server.bodies[f"/offers/{region}/index.json"] = offer_document(region, {"m5.large": 0.1 + i, "c5.large": 0.2 + i})
+
+
+def test_regions_are_fetched_concurrently(store, offer_server):
+    serve_regions(offer_server, REGIONS)
+    for region in REGIONS:
+        offer_server.delays[f"/offers/{region}/index.json"] = 0.2
+
+    result = ec2_pricing_data_fetch.fetch_pricing_regions(REGIONS, FILTERS)
+
+    assert len(offer_server.requests) == len(REGIONS)
+    assert offer_server.max_in_flight > 1
+    assert len(result) == 2 * len(REGIONS)
+
+
+def test_result_keeps_the_order_of_regions(store, offer_server):
+    serve_regions(offer_server, REGIONS)
+    # The first region finishes last
+    offer_server.delays[f"/offers/{REGIONS[0]}/index.json"] = 0.3
+    progress = []
+
+    result = ec2_pricing_data_fetch.fetch_pricing_regions(
+        REGIONS, FILTERS, on_progress=lambda done, total, region: progress.append((done, total, region, threading.current_thread())))
+
+    assert list(dict.fromkeys(result["Region"].astype(str))) == REGIONS
+    assert [done for done, _, _, _ in progress] == [1, 2, 3, 4]
+    assert {total for _, total, _, _ in progress} == {len(REGIONS)}
+    assert progress[-1][2] == REGIONS[0]
+    # Progress is reported from the calling thread
+    assert {thread for _, _, _, thread in progress} == {threading.current_thread()}
+
+
+def test_failed_region_is_logged_and_skipped(store, offer_server, monkeypatch):
+    serve_regions(offer_server, REGIONS)
+    offer_server.failures[f"/offers/{REGIONS[1]}/index.json"] = 503
+    errors = []
+    monkeypatch.setattr(ec2_pricing_data_fetch, "log_error", errors.append)
+
+    result = ec2_pricing_data_fetch.fetch_pricing_regions(REGIONS, FILTERS)
+
+    assert list(dict.fromkeys(result["Region"].astype(str))) == [REGIONS[0], *REGIONS[2:]]
+    assert len(errors) == 1 and REGIONS[1] in errors[0]
+    # The failed region is not stored, so the next query tries it again
+    offer_server.failures.clear()
+    result = ec2_pricing_data_fetch.fetch_pricing_regions(REGIONS, FILTERS)
+    assert list(dict.fromkeys(result["Region"].astype(str))) == REGIONS
+
+
+def test_no_regions(store):
+    result = ec2_pricing_data_fetch.fetch_pricing_regions([], FILTERS)
+    assert result.empty
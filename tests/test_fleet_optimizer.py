@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import fleet_optimizer
+from cost_model import HOURS_PER_MONTH
+
+
+def simulated_cost(usage, ondemand, sp, commitment):
+    """Cost of `usage` under an hourly commitment, applied hour by hour and column by column, highest discount first."""
+    order = sorted(range(len(ondemand)), key=lambda c: sp[c] / ondemand[c])
+    total = 0.0
+    for hour in usage:
+        left = commitment
+        total += commitment
+        for c in order:
+            covered = min(hour[c], left / sp[c])
+            left -= covered * sp[c]
+            total += (hour[c] - covered) * ondemand[c]
+    return total
+
+
+def brute_force(usage, ondemand, sp, levels=400):
+    """
+    Cheapest cost over a grid of commitment levels from 0 to the costliest hour at SP rates,
+    plus every partial sum of an hour's SP cost (the cost is linear between those).
+    """
+    top = (usage * sp).sum(axis=1).max()
+    partial_sums = [sum(hour[c] * sp[c] for c in subset)
+                    for hour in usage for subset in _prefixes(sorted(range(len(sp)), key=lambda c: sp[c] / ondemand[c]))]
+    return min(simulated_cost(usage, ondemand, sp, level) for level in [*np.linspace(0.0, top, levels), *partial_sums])
+
+
+def _prefixes(order):
+    return [order[:n] for n in range(1, len(order) + 1)]
+
+
+def random_fleet(rnd, hours, columns):
+    usage = rnd.integers(0, 6, size=(hours, columns)).astype(float)
+    # Some columns run only part of the day
+    usage[:, rnd.random(columns) < 0.3] *= rnd.random((hours, 1)) < 0.5
+    ondemand = rnd.uniform(0.05, 1.0, columns)
+    sp = ondemand * rnd.uniform(0.4, 0.95, columns)
+    return usage, ondemand, sp
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_breakpoint_sweep_matches_a_brute_force_scan(seed):
+    rnd = np.random.default_rng(seed)
+    usage, ondemand, sp = random_fleet(rnd, hours=int(rnd.integers(1, 30)), columns=int(rnd.integers(1, 6)))
+
+    commitment = fleet_optimizer.optimal_commitment(usage, ondemand, sp)
+    cost = fleet_optimizer.fleet_cost(usage, ondemand, sp, commitment)["total"]
+
+    assert cost == pytest.approx(simulated_cost(usage, ondemand, sp, commitment))
+    assert cost == pytest.approx(brute_force(usage, ondemand, sp))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fleet_cost_matches_the_simulation(seed):
+    rnd = np.random.default_rng(100 + seed)
+    usage, ondemand, sp = random_fleet(rnd, hours=12, columns=4)
+    for commitment in rnd.uniform(0.0, (usage * sp).sum(axis=1).max() * 1.2, 10):
+        cost = fleet_optimizer.fleet_cost(usage, ondemand, sp, commitment)
+        assert cost["total"] == pytest.approx(simulated_cost(usage, ondemand, sp, commitment))
+
+
+def test_flat_usage_commits_to_all_of_it():
+    usage = np.full((24, 2), 3.0)
+    ondemand, sp = np.array([0.1, 0.2]), np.array([0.07, 0.12])
+    assert fleet_optimizer.optimal_commitment(usage, ondemand, sp) == pytest.approx(3 * 0.07 + 3 * 0.12)
+
+
+def test_no_usage_commits_nothing():
+    assert fleet_optimizer.optimal_commitment(np.zeros((24, 2)), np.array([0.1, 0.2]), np.array([0.07, 0.12])) == 0.0
+    assert fleet_optimizer.optimal_commitment(np.zeros((0, 2)), np.array([0.1, 0.2]), np.array([0.07, 0.12])) == 0.0
+
+
+def test_optimize_fleet_keeps_unplanned_usage_on_demand():
+    usage = pd.DataFrame({
+        "hour": [0, 0, 0, 1, 1],
+        "region": ["us-east-1", "us-east-1", "eu-west-1", "us-east-1", "eu-west-1"],
+        "instance_type": ["m5.large", "c5.large", "m5.large", "m5.large", "m5.large"],
+        "count": [2, 1, 1, 2, 1],
+    })
+    matrix, types, regions = fleet_optimizer.fleet_matrix(usage)
+    assert matrix.shape == (2, 2, 2)
+    # (types x regions): c5.large has no Savings Plan rate in either region
+    ondemand = np.array([[0.09, 0.085], [0.1, 0.096]])
+    sp = np.array([[np.nan, np.nan], [0.07, 0.06]])
+
+    result = fleet_optimizer.optimize_fleet(matrix, types, regions, rates=(ondemand, sp))
+
+    # m5.large runs without a break in both regions, so all of it is committed
+    assert result["commitment_hourly"] == pytest.approx(2 * 0.06 + 0.07)
+    assert result["utilization"] == pytest.approx(1.0)
+    scale = HOURS_PER_MONTH / 2
+    assert result["monthly_cost"] == pytest.approx((2 * (2 * 0.06 + 0.07) + 0.085) * scale)
+    assert result["monthly_on_demand_cost"] == pytest.approx((4 * 0.096 + 2 * 0.1 + 0.085) * scale)
@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import http_cache
+
+PATH = "/offers/us-east-1/index.json"
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_unchanged_body_is_revalidated_with_its_etag(store, offer_server):
+    offer_server.bodies[PATH] = b'{"version": "1"}'
+    url = offer_server.url(PATH)
+
+    path, changed = http_cache.fetch_to_cache(url)
+    assert changed and read(path) == b'{"version": "1"}'
+    assert http_cache.read_metadata(url)["etag"] == offer_server.etag(PATH)
+
+    path, changed = http_cache.fetch_to_cache(url)
+    assert not changed and read(path) == b'{"version": "1"}'
+    assert offer_server.requests[-1][1]["If-None-Match"] == offer_server.etag(PATH)
+    assert len(offer_server.requests) == 2
+
+
+def test_new_body_replaces_the_cached_one(store, offer_server):
+    offer_server.bodies[PATH] = b'{"version": "1"}'
+    url = offer_server.url(PATH)
+    http_cache.fetch_to_cache(url)
+
+    offer_server.bodies[PATH] = b'{"version": "2"}'
+    path, changed = http_cache.fetch_to_cache(url)
+
+    assert changed and read(path) == b'{"version": "2"}'
+    assert http_cache.read_metadata(url)["etag"] == offer_server.etag(PATH)
+
+
+def test_known_version_url_skips_the_request(store, offer_server):
+    offer_server.bodies[PATH] = b'{"version": "1"}'
+    url = offer_server.url(PATH)
+    http_cache.fetch_to_cache(url, version_url="/v1/index.json")
+
+    path, changed = http_cache.fetch_to_cache(url, version_url="/v1/index.json")
+    assert not changed and read(path) == b'{"version": "1"}'
+    assert len(offer_server.requests) == 1
+
+    # A new version URL is revalidated; the unchanged body answers 304 and is recorded with it
+    http_cache.fetch_to_cache(url, version_url="/v2/index.json")
+    assert len(offer_server.requests) == 2
+    assert http_cache.read_metadata(url)["versionUrl"] == "/v2/index.json"
+
+
+def test_failed_fetch_keeps_the_cached_body(store, offer_server):
+    offer_server.bodies[PATH] = b'{"version": "1"}'
+    url = offer_server.url(PATH)
+    path, _ = http_cache.fetch_to_cache(url)
+
+    offer_server.failures[PATH] = 500
+    with pytest.raises(requests.HTTPError):
+        http_cache.fetch_to_cache(url)
+    assert read(path) == b'{"version": "1"}'
+
+
+def test_concurrent_fetches_of_one_url(store, offer_server):
+    body = b"x" * (3 * http_cache.CHUNK_SIZE + 17)
+    offer_server.bodies[PATH] = body
+    url = offer_server.url(PATH)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(pool.map(lambda _: http_cache.fetch_to_cache(url)[0], range(8)))
+
+    assert len(set(paths)) == 1 and read(paths[0]) == body
+    assert not [name for name in os.listdir(http_cache.HTTP_CACHE_DIR) if name.endswith(".tmp")]
@@ -0,0 +1,62 @@
+import pytest
+
+import instance_catalog
+import pricing_store
+from conftest import offer_document, offer_sku
+
+SKUS = [
+    offer_sku("m5.large", 0.096),
+    offer_sku("m6g.large", 0.077, physicalProcessor="AWS Graviton2 Processor"),
+    offer_sku("a1.large", 0.051, physicalProcessor="AWS Graviton Processor"),
+    offer_sku("mac2.metal", 0.65, vcpu="12", memory="16 GiB", physicalProcessor="Apple M1 chip with 8-core CPU"),
+    offer_sku("mac1.metal", 1.083, vcpu="12", memory="32 GiB", physicalProcessor="Intel Core i7-8700B"),
+    offer_sku("m6a.large", 0.0864, physicalProcessor="AMD EPYC 7R13 Processor"),
+    offer_sku("t4g.micro", 0.0084, memory="1 GiB", physicalProcessor="AWS Graviton2 Processor"),
+    offer_sku("t2.micro", 0.0116, memory="1 GiB", currentGeneration="No", processorArchitecture="32-bit or 64-bit"),
+]
+
+
+@pytest.fixture
+def catalog_store(store, offer_server, monkeypatch):
+    monkeypatch.setattr(instance_catalog, "CATALOG_FILE", str(store / "instance_catalog.arrow"))
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", skus=SKUS)
+    return offer_server
+
+
+@pytest.mark.parametrize("processor_architecture, physical_processor, expected", [
+    ("64-bit", "Intel Xeon Platinum 8175", "x86_64"),
+    ("64-bit", "AWS Graviton3 Processor", "arm64"),
+    ("64-bit", "Apple M2 Pro chip", "arm64"),
+    ("Arm", None, "arm64"),
+    ("32-bit or 64-bit", "Intel Xeon Family", "x86_64"),
+    (None, None, "x86_64"),
+])
+def test_architecture(processor_architecture, physical_processor, expected):
+    assert instance_catalog._architecture(processor_architecture, physical_processor) == expected
+
+
+def test_catalog_is_derived_from_the_stored_offer(catalog_store):
+    catalog = instance_catalog.load_catalog().set_index("InstanceType")
+
+    assert sorted(catalog.index) == sorted(sku["instanceType"] for sku in SKUS)
+    assert catalog["Architecture"].to_dict() == {
+        "a1.large": "arm64", "m5.large": "x86_64", "m6a.large": "x86_64", "m6g.large": "arm64",
+        "mac1.metal": "x86_64", "mac2.metal": "arm64", "t2.micro": "x86_64", "t4g.micro": "arm64"}
+    assert catalog["Burstable"][lambda burstable: burstable].index.tolist() == ["t2.micro", "t4g.micro"]
+    assert (catalog.loc["mac2.metal", "vCPU"], catalog.loc["mac2.metal", "MemoryGiB"]) == (12, 16.0)
+    assert not catalog.loc["t2.micro", "CurrentGeneration"] and catalog.loc["m5.large", "CurrentGeneration"]
+
+
+def test_catalog_is_rebuilt_after_a_reingest(catalog_store, monkeypatch):
+    instance_catalog.load_catalog()
+    builds = []
+    build = instance_catalog.build_catalog
+    monkeypatch.setattr(instance_catalog, "build_catalog", lambda: builds.append(1) or build())
+
+    assert len(instance_catalog.load_catalog()) == len(SKUS)
+    assert builds == []
+
+    catalog_store.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"m7g.large": 0.08}, version="v2")
+    pricing_store.ingest_region("us-east-1")
+    assert instance_catalog.load_catalog()["InstanceType"].tolist() == ["m7g.large"]
+    assert builds == [1]
@@ -0,0 +1,80 @@
+import threading
+
+import numpy as np
+
+from memory_cache import MemoryBoundedCache, estimate_size
+
+
+def test_least_recently_used_entries_go_first_by_bytes():
+    cache = MemoryBoundedCache(max_bytes=300, sizeof=len)
+    cache.put("a", "x" * 100)
+    cache.put("b", "x" * 100)
+    cache.put("c", "x" * 100)
+    assert cache.get("a") is not None  # "b" is now the least recently used
+
+    cache.put("d", "x" * 50)
+    assert "b" not in cache and len(cache) == 3 and cache.bytes == 250
+
+    cache.put("e", "x" * 200)
+    assert [key in cache for key in "acde"] == [False, False, True, True]
+    assert cache.bytes == 250 and cache.evictions == 3
+
+
+def test_entry_count_bound():
+    cache = MemoryBoundedCache(max_bytes=1 << 20, max_entries=2)
+    for key in "abc":
+        cache.put(key, key)
+    assert "a" not in cache and len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_newest_entry_is_kept_even_over_budget():
+    evicted = []
+    cache = MemoryBoundedCache(max_bytes=10, sizeof=len, on_evict=lambda key, value: evicted.append(key))
+    cache.put("a", "x" * 5)
+    cache.put("b", "x" * 50)
+    assert "b" in cache and len(cache) == 1 and cache.bytes == 50
+    assert evicted == ["a"]
+
+
+def test_replacing_and_popping_keep_the_byte_count():
+    cache = MemoryBoundedCache(max_bytes=1000, sizeof=len)
+    cache.put("a", "x" * 100)
+    cache.put("a", "x" * 40)
+    assert cache.bytes == 40 and len(cache) == 1
+    assert cache.pop("a") == "x" * 40 and cache.pop("a") is None
+    assert cache.bytes == 0 and cache.evictions == 0
+
+
+def test_get_or_load_counts_hits_and_misses():
+    cache = MemoryBoundedCache(max_bytes=1 << 20)
+    loads = []
+    for _ in range(3):
+        assert cache.get_or_load("a", lambda: loads.append(1) or 42) == 42
+    assert loads == [1]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_concurrent_puts_stay_within_bounds():
+    cache = MemoryBoundedCache(max_bytes=1000, max_entries=8, sizeof=len)
+
+    def worker(n):
+        for i in range(200):
+            cache.put((n, i), "x" * (i % 50 + 1))
+            cache.get((n, i - 1))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) <= 8 and cache.bytes <= 1000
+    assert cache.bytes == sum(len(cache.get(key)) for key in list(cache._entries))
+
+
+def test_estimate_size_counts_nested_containers_and_arrays():
+    array = np.zeros(1000)
+    assert estimate_size(array) >= array.nbytes
+    assert estimate_size({"a": [array, array]}) < 2 * array.nbytes  # shared objects count once
+    assert estimate_size([b"x" * 1000]) > 1000
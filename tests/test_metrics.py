@@ -0,0 +1,27 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+
+def test_concurrent_query_reports_dump_valid_json(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.json"
+    monkeypatch.setattr(metrics, "METRICS_FILE", str(path))
+
+    def query(i):
+        with metrics.query_report("test.query", n=i):
+            metrics.count("test.rows", i)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(query, range(200)))
+
+    assert json.loads(path.read_text())["counters"]["test.rows"] >= sum(range(200))
+    assert os.listdir(tmp_path) == ["metrics.json"]
+
+
+def test_failed_dump_is_logged(tmp_path, caplog):
+    with caplog.at_level(logging.ERROR):
+        metrics.dump_metrics(str(tmp_path / "missing" / "metrics.json"))
+    assert "Could not write metrics" in caplog.text
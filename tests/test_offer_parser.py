@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import offer_parser
+from conftest import offer_document, offer_sku
+
+SKUS = [
+    offer_sku("m5.large", 0.096, [("1yr", "standard", "Partial Upfront", 250, 0.03)]),
+    # Non-ASCII text and escaped quotes and backslashes inside strings
+    offer_sku("c5.large", 0.085, location="South America (São Paulo)", regionCode="sa-east-1",
+              physicalProcessor='Intel "Xeon" \\ Platinum', storage="EBS only – 日本"),
+    offer_sku("r5.large", 1e-05),
+]
+
+
+def expected_offer(document: dict) -> dict:
+    return {
+        **{field: str(document[field]) for field in offer_parser.HEADER_FIELDS},
+        "products": {sku: offer_parser.slim_product(p) for sku, p in document["products"].items()},
+        "terms": {term_type: {sku: {tid: offer_parser.slim_term(t) for tid, t in terms.items()}
+                              for sku, terms in document["terms"][term_type].items()}
+                  for term_type in offer_parser.TERM_TYPES},
+    }
+
+
+def write_offer(tmp_path, ensure_ascii=True, version="20240101000000"):
+    document = json.loads(offer_document("sa-east-1", {"t3.micro": 0.0104}, version=version, skus=SKUS))
+    # Unknown keys are skipped, numbers and literals included
+    document["attributes"] = {"note": "skipped \\\" {", "values": [1.5e3, -2, True, None]}
+    path = tmp_path / "index.json"
+    path.write_text(json.dumps(document, ensure_ascii=ensure_ascii, indent=1), encoding="utf-8")
+    return path, document
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 2, 3, 7, 64, 1 << 20])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_any_chunk_size_parses_the_same_offer(tmp_path, monkeypatch, chunk_chars, ensure_ascii):
+    monkeypatch.setattr(offer_parser, "CHUNK_CHARS", chunk_chars)
+    # A numeric version ends at every window edge with one-character chunks
+    path, document = write_offer(tmp_path, ensure_ascii, version=20240101000000)
+
+    assert offer_parser.parse_offer_file(str(path)) == expected_offer(document)
+    assert offer_parser.read_header(str(path))["version"] == "20240101000000"
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 5, 1 << 20])
+def test_truncated_file_fails_at_its_end(tmp_path, monkeypatch, chunk_chars):
+    monkeypatch.setattr(offer_parser, "CHUNK_CHARS", chunk_chars)
+    path, _ = write_offer(tmp_path, ensure_ascii=False)
+    text = path.read_text(encoding="utf-8")
+
+    for cut in range(1, len(text) - 1, 37):
+        path.write_text(text[:cut], encoding="utf-8")
+        with pytest.raises(ValueError, match=f"ends unexpectedly at character {cut}$"):
+            list(offer_parser.iter_offer(str(path)))
+
+
+def test_malformed_value_fails_without_reading_the_rest(tmp_path, monkeypatch):
+    monkeypatch.setattr(offer_parser, "CHUNK_CHARS", 64)
+    path, _ = write_offer(tmp_path)
+    text = path.read_text()
+    broken = text.index('"c5.large"') + len('"c5.large"')
+    path.write_text(text[:broken] + " oops" + text[broken:] + " " * (1 << 20))
+
+    reads = []
+    fill = offer_parser._Scanner._fill
+    monkeypatch.setattr(offer_parser._Scanner, "_fill", lambda self: reads.append(1) or fill(self))
+    with pytest.raises(ValueError, match=f"Malformed offer file at character {broken + 1}"):
+        list(offer_parser.iter_offer(str(path)))
+    assert len(reads) * 64 < broken + 1024
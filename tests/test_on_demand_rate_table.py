@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import ec2_sp_backend
+import pricing_store
+from conftest import offer_document, offer_sku
+
+
+@pytest.fixture
+def od_cache(store):
+    return ec2_sp_backend.on_demand_rate_table
+
+
+def test_rates_come_from_the_stored_offer(od_cache, offer_server):
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"m5.large": 0.096, "c5.large": 0.085})
+
+    rates = ec2_sp_backend.on_demand_rates("us-east-1", "RunInstances", ["m5.large", "c5.large", "x1.large"])
+
+    np.testing.assert_array_equal(rates, [0.096, 0.085, np.nan])
+    assert ("us-east-1", "20240101000000") in od_cache
+    ec2_sp_backend.on_demand_rates("us-east-1", "RunInstances", ["m5.large"])
+    assert len(offer_server.requests) == 1
+
+
+def test_failed_build_is_retried_after_the_failure_ttl(od_cache, offer_server, monkeypatch):
+    offer_server.failures["/offers/us-east-1/index.json"] = 503
+
+    assert ec2_sp_backend.get_on_demand_rate_table("us-east-1") == {}
+    assert len(od_cache) == 0
+    # Within the TTL the region is not rebuilt
+    assert ec2_sp_backend.get_on_demand_rate_table("us-east-1") == {}
+    assert len(offer_server.requests) == 1
+
+    offer_server.failures.clear()
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"m5.large": 0.096})
+    monkeypatch.setattr(ec2_sp_backend, "OD_FAILURE_TTL", 0)
+    table = ec2_sp_backend.get_on_demand_rate_table("us-east-1")
+
+    assert table[("m5.large", "RunInstances", "shared", "NA")] == 0.096
+    assert ec2_sp_backend._on_demand_table_failures == {}
+
+
+def test_tables_are_bounded(od_cache, offer_server, monkeypatch):
+    monkeypatch.setattr(od_cache, "max_entries", 2)
+    regions = ["us-east-1", "eu-west-1", "ap-south-1"]
+    for region in regions:
+        offer_server.bodies[f"/offers/{region}/index.json"] = offer_document(region, {"m5.large": 0.1})
+        ec2_sp_backend.get_on_demand_rate_table(region)
+
+    assert len(od_cache) == 2 and ("us-east-1", "20240101000000") not in od_cache
+    assert od_cache.stats()["evictions"] == 1
+
+
+def test_local_zone_skus_do_not_price_the_parent_region(od_cache, offer_server):
+    # Same instance type, OS and tenancy: the Local Zone and Wavelength SKUs come first in the file
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", skus=[
+        offer_sku("m5.large", 0.12, location="US East (Boston)", regionCode="us-east-1-bos-1"),
+        offer_sku("m5.large", 0.14, location="US East (Verizon) - Boston", regionCode="us-east-1-wl1-bos-wlz-1"),
+        offer_sku("m5.large", 0.096),
+        offer_sku("c5.large", 0.11, location="US East (Boston)", regionCode="us-east-1-bos-1"),
+    ])
+
+    rates = ec2_sp_backend.on_demand_rates("us-east-1", "RunInstances", ["m5.large", "c5.large"])
+
+    np.testing.assert_array_equal(rates, [0.096, np.nan])
+    assert len(ec2_sp_backend.get_on_demand_rate_table("us-east-1")) == 1
+
+
+def test_a_refreshed_offer_is_picked_up(od_cache, offer_server):
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"m5.large": 0.096})
+    assert ec2_sp_backend.on_demand_rates("us-east-1", "RunInstances", ["m5.large"])[0] == 0.096
+
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"m5.large": 0.1}, version="20240201000000")
+    pricing_store.ingest_region("us-east-1")
+
+    assert ec2_sp_backend.on_demand_rates("us-east-1", "RunInstances", ["m5.large"])[0] == 0.1
+    assert ("us-east-1", "20240201000000") in od_cache
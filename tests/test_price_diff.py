@@ -0,0 +1,74 @@
+import pytest
+
+import price_diff
+import pricing_store
+from conftest import offer_document
+
+PATH = "/offers/us-east-1/index.json"
+
+
+@pytest.fixture
+def feed(store, monkeypatch):
+    monkeypatch.setattr(price_diff, "CHANGE_FEED_FILE", str(store / "changes.jsonl"))
+
+
+def publish(offer_server, version, prices):
+    offer_server.bodies[PATH] = offer_document("us-east-1", prices, version=version)
+
+
+def changes(records):
+    return sorted((r["change"], r["instanceType"], r["oldPrice"], r["newPrice"]) for r in records)
+
+
+def test_first_ingest_has_no_feed_records(feed, offer_server):
+    publish(offer_server, "v1", {"m5.large": 0.096})
+
+    assert price_diff.refresh_offer_incremental("us-east-1") == []
+    assert pricing_store.read_manifest("us-east-1")["version"] == "v1"
+    assert price_diff.read_change_feed().empty
+
+
+def test_unchanged_version_is_not_ingested_again(feed, offer_server, monkeypatch):
+    publish(offer_server, "v1", {"m5.large": 0.096})
+    price_diff.refresh_offer_incremental("us-east-1")
+    monkeypatch.setattr(pricing_store, "ingest_offer_file", lambda region, path: pytest.fail("ingested again"))
+
+    assert price_diff.refresh_offer_incremental("us-east-1") == []
+
+
+def test_changed_version_records_its_price_changes(feed, offer_server):
+    publish(offer_server, "v1", {"c5.large": 0.085, "m5.large": 0.096, "t3.small": 0.02})
+    price_diff.refresh_offer_incremental("us-east-1")
+    publish(offer_server, "v2", {"c5.large": 0.09, "m5.large": 0.096})
+
+    records = price_diff.refresh_offer_incremental("us-east-1")
+
+    assert changes(records) == [("changed", "c5.large", 0.085, 0.09), ("removed", "t3.small", 0.02, None)]
+    assert {(r["fromVersion"], r["toVersion"]) for r in records} == {("v1", "v2")}
+    assert pricing_store.read_manifest("us-east-1")["version"] == "v2"
+    assert len(price_diff.read_change_feed("us-east-1")) == 2
+
+    publish(offer_server, "v3", {"c5.large": 0.09, "m5.large": 0.096, "r5.large": 0.126})
+    assert changes(price_diff.refresh_offer_incremental("us-east-1")) == [("added", "r5.large", None, 0.126)]
+
+
+def test_failed_ingest_is_retried_without_a_new_download(feed, offer_server, monkeypatch):
+    publish(offer_server, "v1", {"m5.large": 0.096})
+    price_diff.refresh_offer_incremental("us-east-1")
+    publish(offer_server, "v2", {"m5.large": 0.1})
+
+    def fail(region, path):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pricing_store, "ingest_offer_file", fail)
+        with pytest.raises(OSError):
+            price_diff.refresh_offer_incremental("us-east-1")
+    assert pricing_store.read_manifest("us-east-1")["version"] == "v1"
+
+    # The cached file is current, so the retry is answered with a 304
+    records = price_diff.refresh_offer_incremental("us-east-1")
+
+    assert offer_server.requests[-1][1].get("If-None-Match") == offer_server.etag(PATH)
+    assert changes(records) == [("changed", "m5.large", 0.096, 0.1)]
+    assert pricing_store.read_manifest("us-east-1")["version"] == "v2"
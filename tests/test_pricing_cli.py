@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+import pricing_cli
+from conftest import offer_document, offer_sku
+
+
+def test_ondemand_arguments_become_fetch_pricing_filters():
+    args = pricing_cli.build_parser().parse_args([
+        "ondemand", "--regions", "us-east-1", "--os", "Linux", "--os", "Windows", "--families", "m5", "c6g",
+        "--term-types", "Reserved", "--vcpu-min", "2", "--mem-max", "64", "-o", "out.csv"])
+
+    assert args.regions == ["us-east-1"] and args.output == "out.csv" and args.format is None
+    assert pricing_cli.ondemand_filters(args) == {
+        "instance_types": set(), "tenancies": set(), "operating_systems": {"Linux", "Windows"},
+        "purchase_options": set(), "offering_classes": set(), "lease_terms": set(), "pre_sw": set(),
+        "term_types": ["Reserved"], "families": {"m5", "c6g"}, "vcpu_range": (2, 128), "mem_range": (0.0, 64.0),
+    }
+
+
+@pytest.mark.parametrize("argv", [
+    ["ondemand", "--regions", "us-east-1"],                         # no output
+    ["ondemand", "--term-types", "Spot", "-o", "out.csv"],
+    ["savings-plans", "--terms", "5yr", "-o", "out.csv"],
+    ["savings-plans", "-o", "out.csv", "--format", "json"],
+    ["reserved", "-o", "out.csv"],
+])
+def test_invalid_arguments(argv):
+    with pytest.raises(SystemExit):
+        pricing_cli.build_parser().parse_args(argv)
+
+
+def test_savings_plan_dimensions_default_to_every_value():
+    args = pricing_cli.build_parser().parse_args([
+        "savings-plans", "--instance-types", "m5.large", "c5.large", "m6g.large", "--families", "m5", "m6g",
+        "--terms", "1yr", "-o", "sp.parquet"])
+    dims = pricing_cli.savings_plan_dimensions(args)
+
+    assert dims["instance_types"] == ["m5.large", "m6g.large"]
+    assert dims["terms"] == ["1yr"]
+    assert dims["sp_types"] == ["ComputeSavingsPlans", "EC2InstanceSavingsPlans"]
+    assert dims["purchasing_options"] == ["No Upfront", "Partial Upfront", "All Upfront"]
+    assert "Linux/UNIX" in dims["operating_systems"] and "Dedicated Host" in dims["tenancies"]
+
+
+def test_ondemand_export_against_the_store(store, offer_server, capsys):
+    reserved = [("1yr", "standard", "All Upfront", 500, 0)]
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", skus=[
+        offer_sku("m5.large", 0.096, reserved), offer_sku("c5.large", 0.085), offer_sku("r5.large", 0.126, vcpu="4")])
+    offer_server.bodies["/offers/eu-west-1/index.json"] = offer_document("eu-west-1", {"m5.large": 0.107})
+    offer_server.failures["/offers/ap-south-1/index.json"] = 503
+    output = store / "od.csv"
+
+    code = pricing_cli.main(["ondemand", "--regions", "us-east-1", "eu-west-1", "ap-south-1", "--vcpu-max", "2",
+                             "--workers", "2", "-o", str(output)])
+
+    result = pd.read_csv(output)
+    assert sorted(zip(result["Region"], result["Instance Type"], result["TermType"], result["PricePerUnit"])) == [
+        ("eu-west-1", "m5.large", "OnDemand", 0.107),
+        ("us-east-1", "c5.large", "OnDemand", 0.085),
+        ("us-east-1", "m5.large", "OnDemand", 0.096),
+        ("us-east-1", "m5.large", "Reserved", 0.0),
+        ("us-east-1", "m5.large", "Reserved", 500.0),
+    ]
+    # A failed region is reported without losing the others
+    out = capsys.readouterr().out
+    assert code == 1
+    assert "ap-south-1       FAILED" in out and "(1 region(s) failed)" in out
@@ -0,0 +1,103 @@
+import json
+
+import pandas as pd
+import pytest
+
+import pricing_filter
+import pricing_store
+from conftest import offer_document, offer_sku
+
+
+def test_region_frames_follow_the_offer_version_and_stay_within_budget(store, offer_server, monkeypatch):
+    cache = pricing_filter.region_frame_cache
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"m5.large": 0.096})
+    pricing_store.ingest_region("us-east-1")
+    assert pricing_filter.region_frame("us-east-1", "OnDemand")["PricePerUnit"].tolist() == [0.096]
+
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"m5.large": 0.1}, version="v2")
+    pricing_store.ingest_region("us-east-1")
+    assert pricing_filter.region_frame("us-east-1", "OnDemand")["PricePerUnit"].tolist() == [0.1]
+
+    # Only the newest frame fits a budget of one byte
+    monkeypatch.setattr(cache, "max_bytes", 1)
+    pricing_filter.region_frame("us-east-1", "Reserved")
+    assert len(cache) == 1 and ("us-east-1", "Reserved", "v2") in cache
+
+
+COLUMNS = ["Instance Type", "Tenancy", "Operating System", "Pre Installed S/W", "vCPU", "Memory (GiB)", "TermType",
+           "PurchaseOption", "OfferingClass", "LeaseContractLength", "Unit", "PricePerUnit"]
+RESERVED = [("1yr", "standard", "No Upfront", 0, 0.06), ("1yr", "convertible", "Partial Upfront", 250, 0.03),
+            ("3yr", "standard", "All Upfront", 1500, 0)]
+SKUS = [
+    offer_sku("m5.large", 0.096, RESERVED),
+    offer_sku("m5.large", 0.188, RESERVED[:1], operatingSystem="Windows", licenseModel="License Included"),
+    offer_sku("m5.large", 0.35, operatingSystem="Windows", preInstalledSw="SQL Web"),
+    offer_sku("m5.large", 0.106, tenancy="Dedicated"),
+    offer_sku("m5.xlarge", 0.192, RESERVED[1:], vcpu="4", memory="16 GiB"),
+    offer_sku("m5.4xlarge", 0.768, vcpu="16", memory="64 GiB", tenancy="Host"),
+    offer_sku("c5.large", 0.085, RESERVED, memory="4 GiB", operatingSystem="RHEL"),
+    offer_sku("c5.2xlarge", 0.34, vcpu="8", memory="16 GiB", operatingSystem="SUSE", preInstalledSw="SQL Std"),
+    offer_sku("r5.large", 0.126, memory="16 GiB"),
+]
+
+
+def row_loop_filter(document, filters):
+    """The row-by-row fetch_pricing filter the partition masks replaced, over the offer JSON."""
+    def allowed(value, values):
+        return not values or value in values
+
+    vcpu_min, vcpu_max = filters.get("vcpu_range", (0, 128))
+    mem_min, mem_max = filters.get("mem_range", (0.0, 2048.0))
+    rows = []
+    for sku, product in document["products"].items():
+        attrs = product["attributes"]
+        inst_type = attrs["instanceType"]
+        vcpu, mem = int(attrs["vcpu"]), pricing_store.parse_memory(attrs["memory"])
+        if not (allowed(inst_type, filters.get("instance_types")) and allowed(attrs["tenancy"], filters.get("tenancies"))
+                and allowed(attrs["operatingSystem"], filters.get("operating_systems"))
+                and allowed(attrs["preInstalledSw"], filters.get("pre_sw"))
+                and allowed(inst_type.split(".")[0], filters.get("families"))
+                and vcpu_min <= vcpu <= vcpu_max and mem_min <= mem <= mem_max):
+            continue
+        for term_type in filters.get("term_types") or ["OnDemand", "Reserved"]:
+            for term in document["terms"].get(term_type, {}).get(sku, {}).values():
+                t_attrs = term["termAttributes"]
+                if not (allowed(t_attrs.get("PurchaseOption"), filters.get("purchase_options"))
+                        and allowed(t_attrs.get("OfferingClass"), filters.get("offering_classes"))
+                        and allowed(t_attrs.get("LeaseContractLength"), filters.get("lease_terms"))):
+                    continue
+                for dim in term["priceDimensions"].values():
+                    rows.append((inst_type, attrs["tenancy"], attrs["operatingSystem"], attrs["preInstalledSw"], vcpu,
+                                 mem, term_type, t_attrs.get("PurchaseOption"), t_attrs.get("OfferingClass"),
+                                 t_attrs.get("LeaseContractLength"), dim["unit"], float(dim["pricePerUnit"]["USD"])))
+    return sorted(rows, key=repr)
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    # Empty sets and default ranges mean "any"
+    {"tenancies": set(), "operating_systems": set(), "pre_sw": set(), "vcpu_range": (0, 128), "mem_range": (0.0, 2048.0)},
+    {"tenancies": {"Dedicated", "Host"}},
+    {"operating_systems": {"Windows"}},
+    {"operating_systems": {"Windows"}, "pre_sw": {"NA"}},
+    {"pre_sw": {"SQL Web", "SQL Std"}},
+    # Values match exactly, as in the Pricing API attributes
+    {"tenancies": {"shared"}},
+    {"operating_systems": {"linux", "WINDOWS"}},
+    {"pre_sw": {"sql web"}},
+    {"families": {"m5"}, "vcpu_range": (4, 16)},
+    {"instance_types": {"m5.large", "c5.large"}, "mem_range": (4.0, 8.0)},
+    {"term_types": ["Reserved"], "purchase_options": {"All Upfront", "Partial Upfront"}},
+    {"offering_classes": {"convertible"}},
+    {"lease_terms": {"3yr"}, "operating_systems": {"RHEL"}},
+    {"term_types": ["OnDemand"], "purchase_options": {"No Upfront"}},
+])
+def test_masks_match_the_row_loop_filter(store, offer_server, filters):
+    body = offer_document("us-east-1", skus=SKUS)
+    offer_server.bodies["/offers/us-east-1/index.json"] = body
+    pricing_store.ingest_region("us-east-1")
+
+    result = pricing_filter.query_region("us-east-1", filters)[COLUMNS]
+    rows = sorted((tuple(None if pd.isna(v) else v for v in row) for row in result.itertuples(index=False)), key=repr)
+
+    assert rows == row_loop_filter(json.loads(body), filters)
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from query_cache import QueryResultCache, covers, fingerprint, normalize_filters
+
+
+def test_default_filters_normalize_away():
+    defaults = {
+        "vcpu_range": (0, 128),
+        "mem_range": (0, 2048.0),
+        "term_types": ["Reserved", "OnDemand"],
+        "families": set(),
+        "instance_types": [],
+    }
+    assert normalize_filters(defaults) == {}
+    assert normalize_filters(None) == {}
+    assert fingerprint("us-east-1", "v1", defaults) == fingerprint("us-east-1", "v1", {})
+
+
+def test_filters_normalize_to_sorted_values_and_float_ranges():
+    normalized = normalize_filters({"vcpu_range": (2, 8), "families": {"m5", "c5"}, "term_types": ["OnDemand"]})
+    assert normalized == {"vcpu_range": (2.0, 8.0), "families": ("c5", "m5"), "term_types": ("OnDemand",)}
+    assert fingerprint("us-east-1", "v1", {"families": ["m5", "c5"]}) == fingerprint("us-east-1", "v1", {"families": {"c5", "m5"}})
+
+
+@pytest.mark.parametrize("broad, narrow, expected", [
+    # A missing range is the default range
+    ({}, {"vcpu_range": (2.0, 8.0)}, True),
+    ({"vcpu_range": (2.0, 8.0)}, {}, False),
+    # Ranges wider than the default cover the default, not the other way round
+    ({"vcpu_range": (0.0, 256.0)}, {}, True),
+    ({}, {"vcpu_range": (0.0, 256.0)}, False),
+    ({"mem_range": (0.0, 4096.0)}, {"mem_range": (16.0, 3000.0)}, True),
+    ({"mem_range": (1.0, 4096.0)}, {}, False),
+    ({"vcpu_range": (2.0, 16.0)}, {"vcpu_range": (4.0, 8.0)}, True),
+    ({"vcpu_range": (4.0, 16.0)}, {"vcpu_range": (2.0, 8.0)}, False),
+    # Missing term types are both term types; other missing sets are no restriction
+    ({}, {"term_types": ("OnDemand",)}, True),
+    ({"term_types": ("OnDemand",)}, {}, False),
+    ({}, {"families": ("m5",)}, True),
+    ({"families": ("c5", "m5")}, {"families": ("m5",)}, True),
+    ({"families": ("m5",)}, {}, False),
+])
+def test_covers(broad, narrow, expected):
+    assert covers(broad, narrow) is expected
+
+
+def test_covers_after_normalization():
+    broad = normalize_filters({"vcpu_range": (0, 256), "mem_range": (0, 2048)})
+    narrow = normalize_filters({"vcpu_range": (0, 128), "mem_range": (8, 64)})
+    assert covers(broad, narrow) and not covers(narrow, broad)
+
+
+def frame(n):
+    return pd.DataFrame({"vCPU": range(n)})
+
+
+def test_key_locks_are_dropped():
+    cache = QueryResultCache(max_bytes=1 << 20, ttl=60)
+    cache.get_or_compute("a", lambda: frame(3))
+    assert cache._key_locks == {}
+
+    def fail():
+        raise RuntimeError("scan failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("b", fail)
+    assert cache._key_locks == {}
+
+
+def test_concurrent_requests_compute_once():
+    cache = QueryResultCache(max_bytes=1 << 20, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return frame(3)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("a", compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1 and len(results) == 8
+    assert cache._key_locks == {}
+
+
+def test_narrower_query_is_refined_from_a_wider_one():
+    cache = QueryResultCache(max_bytes=1 << 20, ttl=60)
+    refine = lambda broader, filters: broader[broader["vCPU"] <= filters["vcpu_range"][1]]
+    wide = normalize_filters({"vcpu_range": (0, 256)})
+    narrow = normalize_filters({"vcpu_range": (0, 4)})
+
+    cache.get_or_compute("wide", lambda: frame(10), scope=("us-east-1", "v1"), filters=wide, refine=refine)
+    result = cache.get_or_compute("narrow", lambda: pytest.fail("computed"), scope=("us-east-1", "v1"),
+                                  filters=narrow, refine=refine)
+
+    assert result["vCPU"].tolist() == [0, 1, 2, 3, 4]
+    assert cache.subset_hits == 1 and cache.misses == 1
+
+
+def test_evicted_and_expired_entries_leave_their_scope():
+    cache = QueryResultCache(max_bytes=1 << 20, ttl=60)
+    cache.memory.max_entries = 2
+    scope = ("us-east-1", "v1")
+    for i in range(3):
+        cache.get_or_compute(f"k{i}", lambda: frame(3), scope=scope, filters={"families": (f"f{i}",)})
+    assert set(cache._scopes[scope]) == {"k1", "k2"}
+
+    cache.ttl = -1
+    assert cache.get_or_compute("k1", lambda: frame(3)) is not None
+    assert set(cache._scopes[scope]) == {"k2"}
+    cache.get_or_compute("k2", lambda: frame(3))
+    assert scope not in cache._scopes
+
+
+def test_refined_result_expires_with_its_source(monkeypatch):
+    cache = QueryResultCache(max_bytes=1 << 20, ttl=60)
+    refine = lambda broader, filters: broader[broader["vCPU"] <= filters["vcpu_range"][1]]
+    scope = ("us-east-1", "v1")
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+
+    cache.get_or_compute("wide", lambda: frame(10), scope=scope, filters={}, refine=refine)
+    now[0] += 50
+    cache.get_or_compute("narrow", lambda: pytest.fail("computed"), scope=scope,
+                         filters=normalize_filters({"vcpu_range": (0, 4)}), refine=refine)
+    now[0] += 20
+
+    assert cache._get_memory("wide") is None and cache._get_memory("narrow") is None
+    assert cache.expired == 2
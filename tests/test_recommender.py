@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cost_model
+import recommender
+
+CATALOG = pd.DataFrame({
+    "InstanceType": ["t3.small", "m5.large", "m5.xlarge", "m6g.large"],
+    "vCPU": np.array([2, 2, 4, 2], dtype=np.int16),
+    "MemoryGiB": np.array([2, 8, 16, 8], dtype=np.float32),
+    "Architecture": ["x86_64", "x86_64", "x86_64", "arm64"],
+    "Burstable": [True, False, False, False],
+})
+ON_DEMAND = {"t3.small": 0.02, "m5.large": 0.10, "m5.xlarge": 0.20, "m6g.large": 0.08}
+REGION_FACTOR = {"us-east-1": 1.0, "eu-west-1": 1.2}
+
+
+@pytest.fixture(autouse=True)
+def rates(monkeypatch):
+    def on_demand_rates(region, usage_operation, instance_types, tenancy):
+        return np.array([ON_DEMAND[t] * REGION_FACTOR[region] for t in instance_types])
+
+    def savings_plan_rates(region, usage_operation, instance_types, tenancy, sp_type="ComputeSavingsPlans",
+                           term="1yr", purchasing_option="No Upfront"):
+        return on_demand_rates(region, usage_operation, instance_types, tenancy) * (0.7 if term == "1yr" else 0.5)
+
+    monkeypatch.setattr(recommender, "load_instances", lambda: CATALOG)
+    monkeypatch.setattr(recommender, "on_demand_rates", on_demand_rates)
+    monkeypatch.setattr(recommender, "savings_plan_rates", savings_plan_rates)
+    monkeypatch.setattr(cost_model, "savings_plan_rates", savings_plan_rates)
+
+
+def test_recommend_instances():
+    picks = recommender.recommend_instances(2, 8, "Linux/UNIX", ["us-east-1", "eu-west-1"], usage_months=12, top_k=3)
+    assert [(p["Region"], p["InstanceType"]) for p in picks] == [
+        ("us-east-1", "m6g.large"), ("eu-west-1", "m6g.large"), ("us-east-1", "m5.large")]
+    assert picks[0]["PricingModel"] == "1yr SP"
+    assert picks[0]["PreferredCost"] == round(0.08 * 0.7 * recommender.HOURS_PER_MONTH, 2)
+    assert picks[0]["vCPU"] == 2 and picks[0]["MemoryGiB"] == 8.0
+
+
+def test_recommend_instances_for_a_profile():
+    picks = recommender.recommend_instances(2, 8, "Linux", "us-east-1", usage_months=36, top_k=2,
+                                            architectures=["x86_64"], usage_profile=np.full(24, 2.0))
+    assert [p["InstanceType"] for p in picks] == ["m5.large", "m5.xlarge"]
+    # A flat profile commits to every instance on the cheapest (3yr) plan
+    assert picks[0]["Commitment"] == 2.0
+    assert picks[0]["PricingModel"].startswith("ComputeSavingsPlans 3yr")
+    assert picks[0]["PreferredCost"] == round(2 * 0.10 * 0.5 * recommender.HOURS_PER_MONTH, 2)
+
+
+def test_nothing_fits():
+    assert recommender.recommend_instances(64, 512, "Linux", "us-east-1", usage_months=12) == []
+    assert recommender.recommend_instances(64, 512, "Linux", "us-east-1", usage_months=12,
+                                           usage_profile=[1, 2]) == []
+
+
+def test_recommend_batch_reports_unknown_os_as_unmatched():
+    workloads = pd.DataFrame({
+        "vcpu_required": [2, 2, 4, 64],
+        "memory_required": [4, 4, 8, 512],
+        "os": ["Linux/UNIX", "Plan 9", "Linux", "Linux"],
+        "region": ["us-east-1", "us-east-1", "eu-west-1", "us-east-1"],
+        "usage_months": [1, 12, 12, 12],
+    })
+    results = recommender.recommend_batch(workloads)
+
+    assert results["InstanceType"].tolist()[0] == "m6g.large"
+    assert results["PricingModel"].tolist()[0] == "On-Demand"
+    assert pd.isna(results["InstanceType"].iat[1]) and pd.isna(results["PreferredCost"].iat[1])
+    assert results["InstanceType"].iat[2] == "m5.xlarge"
+    assert pd.isna(results["InstanceType"].iat[3])
+
+
+def test_unknown_os_still_raises_for_a_single_query():
+    with pytest.raises(ValueError):
+        recommender.recommend_instances(2, 8, "Plan 9", "us-east-1", usage_months=12)
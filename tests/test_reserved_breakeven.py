@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+import reserved_breakeven
+from cost_model import HOURS_PER_MONTH
+
+LEASE = reserved_breakeven.LEASE_HOURS["1yr"]
+
+
+def test_lease_hours_use_the_cost_model_month():
+    assert LEASE == 12 * HOURS_PER_MONTH
+    assert reserved_breakeven.LEASE_HOURS["3yr"] == 36 * HOURS_PER_MONTH
+
+
+def test_breakeven_against_an_hourly_rate():
+    # 1000 upfront saves 0.2/h: 5000 hours, in month 7 of 720 hours
+    month = reserved_breakeven.breakeven_month(np.array([1000.0, 0.0, 0.0, 3000.0]), np.array([0.1, 0.1, 0.1, 0.1]),
+                                               np.array([0.3, 0.3, 0.1, 0.3]), LEASE)
+    np.testing.assert_array_equal(month, [7, 1, np.nan, np.nan])
+
+
+def test_breakeven_includes_the_savings_plan_upfront():
+    # All Upfront RI (2000) against a Partial Upfront plan at an effective 0.25/h:
+    # the plan pays 1080 upfront and 0.125/h, so the RI catches up after 920 / 0.125 = 7360 hours
+    sp_upfront, sp_hourly = 0.25 * LEASE * 0.5, 0.25 * 0.5
+    month = reserved_breakeven.breakeven_month(np.array([2000.0]), np.array([0.0]), np.array([sp_hourly]), LEASE,
+                                               np.array([sp_upfront]))
+    np.testing.assert_array_equal(month, [11])
+    # Ignoring the plan's upfront, the RI would only pay off after 8000 hours
+    month = reserved_breakeven.breakeven_month(np.array([2000.0]), np.array([0.0]), np.array([0.25]), LEASE)
+    np.testing.assert_array_equal(month, [12])
+
+
+def test_compare_reserved_on_a_plain_frame(monkeypatch):
+    keys = {"Region": "us-east-1", "Operating System": "Linux", "Tenancy": "Shared", "Pre Installed S/W": "NA",
+            "License Model": "No License required", "OfferingClass": "standard", "LeaseContractLength": "1yr",
+            "TermType": "Reserved"}
+    rows = []
+    for instance_type in ("m5.large", "c5.large"):
+        for option, upfront, hourly in (("All Upfront", 2000.0, 0.0), ("No Upfront", 0.0, 0.2)):
+            for unit, price in (("Quantity", upfront), ("Hrs", hourly)):
+                rows.append({**keys, "Instance Type": instance_type, "PurchaseOption": option,
+                             "Unit": unit, "PricePerUnit": price})
+    # Not compacted: string columns, not categoricals
+    frame = pd.DataFrame(rows)
+    assert not isinstance(frame["Instance Type"].dtype, pd.CategoricalDtype)
+
+    monkeypatch.setattr(reserved_breakeven, "on_demand_rates",
+                        lambda region, operation, types, tenancy: np.full(len(types), 0.4))
+    monkeypatch.setattr(reserved_breakeven, "savings_plan_rates",
+                        lambda region, operation, types, tenancy, sp_type, term, option:
+                        np.full(len(types), 0.25 if sp_type == "ComputeSavingsPlans" else 0.3))
+
+    table = reserved_breakeven.compare_reserved(frame).set_index(["Instance Type", "PurchaseOption"])
+
+    assert len(table) == 4
+    all_upfront = table.loc[("m5.large", "All Upfront")]
+    assert all_upfront["Effective Hourly ($)"] == 2000.0 / LEASE
+    assert all_upfront["Break-even Month (On-Demand)"] == 7
+    # Against an All Upfront plan paying 0.25 * LEASE at purchase the RI is cheaper from the start
+    assert all_upfront["Break-even Month (Savings Plan)"] == 1
+    no_upfront = table.loc[("c5.large", "No Upfront")]
+    assert no_upfront["Cheapest Option"] == "Reserved Instance"
+    assert no_upfront["Break-even Month (Savings Plan)"] == 1
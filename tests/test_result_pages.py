@@ -0,0 +1,73 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import result_pages
+
+ROWS = 123  # two full pages and a partial one
+
+
+@pytest.fixture
+def cursor(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_pages, "RESULTS_DIR", str(tmp_path / "results"))
+    frame = pd.DataFrame({
+        "Instance Type": pd.Categorical([f"m5.{i % 3}xlarge" for i in range(ROWS)]),
+        "vCPU": [i % 7 for i in range(ROWS)],
+        "PricePerUnit": [i / 100 for i in range(ROWS)],
+    })
+    return result_pages.save_result(frame)
+
+
+def page(cursor, number, **changes):
+    return result_pages.read_page({**cursor, "page": number, **changes})
+
+
+def test_pages_split_the_stored_order(cursor):
+    assert cursor["rows"] == ROWS and cursor["numeric_columns"] == ["vCPU", "PricePerUnit"]
+    assert result_pages.page_count(cursor) == 3
+
+    first, second, last = page(cursor, 1), page(cursor, 2), page(cursor, 3)
+    assert len(first) == len(second) == result_pages.PAGE_SIZE
+    assert first.index[0] == 1 and first.index[-1] == 50 and second.index[0] == 51
+    assert len(last) == ROWS - 2 * result_pages.PAGE_SIZE
+    assert last.index.tolist() == list(range(101, ROWS + 1))
+    assert pd.concat([first, second, last])["PricePerUnit"].tolist() == [i / 100 for i in range(ROWS)]
+
+
+def test_out_of_range_pages_are_clamped(cursor):
+    pd.testing.assert_frame_equal(page(cursor, 0), page(cursor, 1))
+    pd.testing.assert_frame_equal(page(cursor, 99), page(cursor, 3))
+
+
+def test_filtered_and_sorted_pages(cursor):
+    filtered = {"filters": {"Instance Type": ["m5.1xlarge"], "vCPU": (2, 6)}, "sort_by": "PricePerUnit", "ascending": False}
+    expected = sorted((i / 100 for i in range(ROWS) if i % 3 == 1 and 2 <= i % 7 <= 6), reverse=True)
+
+    assert result_pages.matching_rows({**cursor, **filtered}) == len(expected)
+    assert result_pages.page_count({**cursor, **filtered}) == 1
+    assert page(cursor, 1, **filtered)["PricePerUnit"].tolist() == expected
+
+
+def test_a_result_with_no_matching_rows_has_one_empty_page(cursor):
+    nothing = {"filters": {"vCPU": (100, 200)}}
+    assert result_pages.page_count({**cursor, **nothing}) == 1
+    assert page(cursor, 1, **nothing).empty
+
+
+def test_iter_frames_covers_every_row_in_display_order(cursor):
+    ordered = {**cursor, "sort_by": "vCPU"}
+    frames = list(result_pages.iter_frames(ordered, chunk_rows=40))
+
+    assert [len(frame) for frame in frames] == [40, 40, 40, 3]
+    assert pd.concat(frames)["vCPU"].tolist() == sorted(i % 7 for i in range(ROWS))
+
+
+def test_expired_results_are_purged(cursor):
+    path = result_pages.result_path(cursor["result_id"])
+    old = time.time() - result_pages.RESULT_TTL - 1
+    os.utime(path, (old, old))
+
+    result_pages.purge_expired()
+    assert not os.path.exists(path)
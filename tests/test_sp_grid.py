@@ -0,0 +1,55 @@
+import numpy as np
+
+import ec2_sp_backend
+from conftest import offer_document
+from memory_cache import MemoryBoundedCache
+
+
+def sp_document(prefix, rates):
+    """A Compute Savings Plan document (1yr No Upfront) with Linux Shared rates by instance type."""
+    return {
+        "products": [{"sku": "CSP", "productFamily": "ComputeSavingsPlans",
+                      "attributes": {"purchaseTerm": "1yr", "purchaseOption": "No Upfront"}}],
+        "terms": {"savingsPlan": [{"sku": "CSP", "rates": [
+            {"discountedOperation": "RunInstances", "discountedUsageType": f"{prefix}-BoxUsage:{instance_type}",
+             "discountedRate": {"price": str(rate)}} for instance_type, rate in rates.items()]}]},
+    }
+
+
+def test_grid_joins_savings_plan_and_on_demand_rates(store, offer_server, monkeypatch):
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"m5.large": 0.096, "c5.large": 0.085})
+    offer_server.bodies["/offers/eu-west-1/index.json"] = offer_document("eu-west-1", {"m5.large": 0.107})
+    documents = {"us-east-1": sp_document("USE1", {"m5.large": 0.06, "c5.large": 0.05}),
+                 "eu-west-1": sp_document("EU", {"m5.large": 0.07, "c5.large": 0.06})}
+    monkeypatch.setattr(ec2_sp_backend, "sp_region_cache", MemoryBoundedCache(max_bytes=1 << 20))
+    monkeypatch.setattr(ec2_sp_backend, "get_sp_version_url", lambda region_code: f"/{region_code}")
+    monkeypatch.setattr(ec2_sp_backend, "get_pricing_by_region", lambda region_code, version_url: documents[region_code])
+
+    grid = ec2_sp_backend.get_savings_plan_grid(
+        ["us-east-1", "eu-west-1"], ["Linux/UNIX", "Red Hat Enterprise Linux"], ["Shared"], ["m5.large", "c5.large"],
+        ["ComputeSavingsPlans"], ["1yr", "3yr"], ["No Upfront"])
+
+    assert list(grid.columns) == ec2_sp_backend.SP_GRID_COLUMNS
+    assert len(grid) == 2 * 2 * 1 * 2 * 1 * 2 * 1
+    rows = grid.set_index(["AWS Region", "Operating System", "Instance Type", "Term"])
+    row = rows.loc[("us-east-1", "Linux/UNIX", "m5.large", "1yr")]
+    assert (row["Savings Plan Rate ($)"], row["On-Demand Rate ($)"]) == (0.06, 0.096)
+    assert row["Savings over On-Demand (%)"] == round((1 - 0.06 / 0.096) * 100, 1)
+
+    # No On-Demand rate for c5.large in eu-west-1, nor for any Red Hat SKU
+    row = rows.loc[("eu-west-1", "Linux/UNIX", "c5.large", "1yr")]
+    assert row["Savings Plan Rate ($)"] == 0.06
+    assert np.isnan(row["On-Demand Rate ($)"]) and np.isnan(row["Savings over On-Demand (%)"])
+    assert grid.loc[grid["Operating System"] == "Red Hat Enterprise Linux", "On-Demand Rate ($)"].isna().all()
+
+    # No 3yr plan published: no Savings Plan rate, but the On-Demand rate is still shown
+    three_year = grid[grid["Term"] == "3yr"]
+    assert three_year["Savings Plan Rate ($)"].isna().all()
+    assert three_year["Savings over On-Demand (%)"].isna().all()
+    assert rows.loc[("eu-west-1", "Linux/UNIX", "m5.large", "3yr"), "On-Demand Rate ($)"] == 0.107
+
+
+def test_empty_selection_gives_an_empty_grid():
+    grid = ec2_sp_backend.get_savings_plan_grid(["us-east-1"], [], ["Shared"], ["m5.large"],
+                                                ["ComputeSavingsPlans"], ["1yr"], ["No Upfront"])
+    assert grid.empty and list(grid.columns) == ec2_sp_backend.SP_GRID_COLUMNS
@@ -0,0 +1,103 @@
+import random
+
+import numpy as np
+import pytest
+
+import ec2_sp_backend
+from memory_cache import MemoryBoundedCache
+
+TERMS = ["1yr", "3yr"]
+PURCHASE_OPTIONS = ["No Upfront", "Partial Upfront", "All Upfront"]
+OPERATIONS = ["RunInstances", "RunInstances:0002", "RunInstances:0010"]
+TENANCIES = ["Shared", "Dedicated Instance", "Dedicated Host"]
+FAMILIES = ["m5", "c5", "r6g"]
+INSTANCE_TYPES = [f"{family}.{size}" for family in FAMILIES for size in ("large", "xlarge")] + ["x1.large"]
+
+
+def sp_document(rnd):
+    """
+    A Savings Plan document with the shapes the linear scan had to cope with: repeated products
+    and term entries for a SKU, repeated rates, unprefixed us-east-1 usage types and usage that
+    is not instance usage.
+    """
+    products, terms = [], []
+    plans = [("ComputeSavingsPlans", None)] + [("EC2InstanceSavingsPlans", family) for family in FAMILIES + [None]]
+    for n, (sp_type, family) in enumerate(plans * 2):
+        for term in TERMS:
+            for option in PURCHASE_OPTIONS:
+                if rnd.random() < 0.2:
+                    continue
+                sku = f"SKU{n}-{term}-{option}"
+                attributes = {"purchaseTerm": term, "purchaseOption": option}
+                if family:
+                    attributes["instanceType"] = family
+                products.append({"sku": sku, "productFamily": sp_type, "attributes": attributes})
+                for _ in range(rnd.choice([1, 1, 2])):
+                    terms.append({"sku": sku, "rates": sp_rates(rnd, [family] if family else FAMILIES)})
+    rnd.shuffle(products)
+    return {"products": products, "terms": {"savingsPlan": terms}}
+
+
+def sp_rates(rnd, families):
+    rates = []
+    for family in families:
+        for size in ("large", "xlarge"):
+            instance_type = f"{family}.{size}"
+            for usage_type in (f"USE1-BoxUsage:{instance_type}", f"BoxUsage:{instance_type}",
+                               f"USE2-BoxUsage:{instance_type}", f"USE1-DedicatedUsage:{instance_type}",
+                               f"USE1-HostUsage:{family}", f"USE1-SpotUsage:{instance_type}"):
+                for operation in OPERATIONS:
+                    for _ in range(rnd.choice([0, 1, 1, 2])):
+                        rates.append({"discountedOperation": operation, "discountedUsageType": usage_type,
+                                      "discountedRate": {"price": f"{rnd.random():.6f}"}})
+    rnd.shuffle(rates)
+    return rates
+
+
+def scan_savings_plan_rate(doc, region_code, usage_operation, instance_family, instance_type, tenancy, sp_type,
+                           term, purchasing_option):
+    """The linear scan over the document that get_savings_plan_rate used before the index."""
+    sku = next((p["sku"] for p in doc["products"]
+                if p["attributes"]["purchaseOption"] == purchasing_option and p["attributes"]["purchaseTerm"] == term
+                and p["productFamily"] == sp_type
+                and (sp_type == "ComputeSavingsPlans" or p["attributes"].get("instanceType") == instance_family)), None)
+    if not sku:
+        return None
+    term_entry = next(t for t in doc["terms"]["savingsPlan"] if t["sku"] == sku)
+    for rate in term_entry["rates"]:
+        if rate["discountedOperation"] != usage_operation:
+            continue
+        dut = rate["discountedUsageType"]
+        if tenancy == "Shared":
+            matched = dut.endswith("-BoxUsage:" + instance_type) or (
+                region_code == "us-east-1" and dut == "BoxUsage:" + instance_type)
+        elif tenancy == "Dedicated Instance":
+            matched = dut.endswith("DedicatedUsage:" + instance_type)
+        else:
+            matched = dut.endswith("HostUsage:" + instance_family)
+        if matched:
+            return float(rate["discountedRate"]["price"])
+    return None
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("region", ["us-east-1", "us-east-2"])
+def test_index_matches_a_linear_scan(monkeypatch, seed, region):
+    doc = sp_document(random.Random(seed))
+    monkeypatch.setattr(ec2_sp_backend, "sp_region_cache", MemoryBoundedCache(max_bytes=1 << 30))
+    monkeypatch.setattr(ec2_sp_backend, "get_sp_version_url", lambda region_code: "/fixture")
+    monkeypatch.setattr(ec2_sp_backend, "get_pricing_by_region", lambda region_code, version_url: doc)
+
+    for sp_type in ("ComputeSavingsPlans", "EC2InstanceSavingsPlans"):
+        for term in TERMS:
+            for option in PURCHASE_OPTIONS:
+                for operation in OPERATIONS:
+                    for tenancy in TENANCIES:
+                        expected = [scan_savings_plan_rate(doc, region, operation, it.split(".")[0], it, tenancy,
+                                                           sp_type, term, option) for it in INSTANCE_TYPES]
+                        rates = ec2_sp_backend.savings_plan_rates(region, operation, INSTANCE_TYPES, tenancy,
+                                                                  sp_type, term, option)
+                        np.testing.assert_array_equal(rates, [np.nan if e is None else e for e in expected])
+                        assert [ec2_sp_backend.get_savings_plan_rate(region, operation, it.split(".")[0], it, tenancy,
+                                                                     sp_type, term, option)
+                                for it in INSTANCE_TYPES] == expected
@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+import requests
+
+import ec2_sp_backend
+from memory_cache import MemoryBoundedCache
+
+PATH = "/savingsPlan/region_index.json"
+
+
+def region_index(*version_urls):
+    return json.dumps({"regions": [{"regionCode": "us-east-1", "versionUrl": url} for url in version_urls]}).encode()
+
+
+@pytest.fixture
+def index_server(tmp_path, monkeypatch, offer_server):
+    monkeypatch.setattr(ec2_sp_backend, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(ec2_sp_backend, "REGION_INDEX_CACHE_FILE", str(tmp_path / "sp_region_index.json"))
+    monkeypatch.setattr(ec2_sp_backend, "region_price_index_api_url", offer_server.url(PATH))
+    return offer_server
+
+
+def expire(path):
+    old = os.path.getmtime(path) - ec2_sp_backend.REGION_INDEX_TTL - 1
+    os.utime(path, (old, old))
+
+
+def test_fresh_copy_is_read_from_disk(index_server):
+    index_server.bodies[PATH] = region_index("/v1")
+    assert ec2_sp_backend.get_region_price_index()[0]["versionUrl"] == "/v1"
+
+    index_server.bodies[PATH] = region_index("/v2")
+    assert ec2_sp_backend.get_region_price_index()[0]["versionUrl"] == "/v1"
+    assert len(index_server.requests) == 1
+
+
+def test_expired_copy_is_downloaded_again(index_server):
+    index_server.bodies[PATH] = region_index("/v1")
+    ec2_sp_backend.get_region_price_index()
+
+    index_server.bodies[PATH] = region_index("/v2")
+    expire(ec2_sp_backend.REGION_INDEX_CACHE_FILE)
+    assert ec2_sp_backend.get_region_price_index()[0]["versionUrl"] == "/v2"
+    assert ec2_sp_backend.get_region_price_index()[0]["versionUrl"] == "/v2"
+    assert len(index_server.requests) == 2
+
+
+def test_stale_copy_is_used_when_the_download_fails(index_server):
+    index_server.bodies[PATH] = region_index("/v1")
+    ec2_sp_backend.get_region_price_index()
+
+    index_server.failures[PATH] = 503
+    expire(ec2_sp_backend.REGION_INDEX_CACHE_FILE)
+    assert ec2_sp_backend.get_region_price_index()[0]["versionUrl"] == "/v1"
+
+
+def test_no_copy_and_no_download(index_server):
+    index_server.failures[PATH] = 503
+    with pytest.raises(requests.HTTPError):
+        ec2_sp_backend.get_region_price_index()
+
+
+def test_rate_index_follows_the_published_version(index_server, monkeypatch):
+    monkeypatch.setattr(ec2_sp_backend, "sp_region_cache", MemoryBoundedCache(max_bytes=1 << 20))
+    downloads = []
+
+    def get_pricing_by_region(region_code, version_url):
+        downloads.append(version_url)
+        return {"products": [], "terms": {"savingsPlan": []}}
+
+    monkeypatch.setattr(ec2_sp_backend, "get_pricing_by_region", get_pricing_by_region)
+    index_server.bodies[PATH] = region_index("/v1")
+    ec2_sp_backend.get_sp_rate_index("us-east-1")
+    ec2_sp_backend.get_sp_rate_index("us-east-1")
+    assert downloads == ["/v1"]
+
+    index_server.bodies[PATH] = region_index("/v2")
+    expire(ec2_sp_backend.REGION_INDEX_CACHE_FILE)
+    ec2_sp_backend.get_sp_rate_index("us-east-1")
+    assert downloads == ["/v1", "/v2"]
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+import pricing_store
+from conftest import offer_document, offer_sku
+
+SKUS = [
+    offer_sku("m5.large", 0.096, [("1yr", "standard", "No Upfront", 0, 0.06)]),
+    offer_sku("m5.large", 0.35, operatingSystem="Windows", preInstalledSw="SQL Web"),
+    offer_sku("c6g.xlarge", 0.136, [("3yr", "convertible", "All Upfront", 1500, 0)], tenancy="Dedicated"),
+]
+
+
+def sidecar(region):
+    return os.path.join(pricing_store.region_dir(region), pricing_store.METADATA_FILE)
+
+
+@pytest.fixture
+def builds(store, offer_server, monkeypatch):
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", skus=SKUS)
+    calls = []
+    build = pricing_store.build_metadata
+    monkeypatch.setattr(pricing_store, "build_metadata", lambda region: calls.append(region) or build(region))
+    return calls
+
+
+def test_sidecar_is_written_by_the_ingest_and_read_back(builds):
+    metadata = pricing_store.load_metadata("us-east-1")
+
+    assert builds == ["us-east-1"]  # by the ingest
+    assert metadata == {
+        "version": "20240101000000",
+        "OperatingSystem": ["Linux", "Windows"],
+        "Tenancy": ["Dedicated", "Shared"],
+        "PreInstalledSw": ["NA", "SQL Web"],
+        "PurchaseOption": ["All Upfront", "No Upfront"],
+        "OfferingClass": ["convertible", "standard"],
+        "LeaseContractLength": ["1yr", "3yr"],
+        "InstanceType": ["c6g.xlarge", "m5.large"],
+        "Family": ["c6g", "m5"],
+    }
+    with open(sidecar("us-east-1")) as f:
+        assert json.load(f) == metadata
+    assert pricing_store.load_metadata("us-east-1") == metadata
+    assert builds == ["us-east-1"]
+
+
+def test_stale_or_missing_sidecar_is_rebuilt(builds):
+    pricing_store.load_metadata("us-east-1")
+    with open(sidecar("us-east-1")) as f:
+        metadata = json.load(f)
+    with open(sidecar("us-east-1"), "w") as f:
+        json.dump({**metadata, "version": "20230101000000", "OperatingSystem": ["Plan 9"]}, f)
+
+    assert pricing_store.load_metadata("us-east-1") == metadata
+    assert len(builds) == 2
+
+    os.remove(sidecar("us-east-1"))
+    assert pricing_store.load_metadata("us-east-1") == metadata
+    assert os.path.exists(sidecar("us-east-1")) and len(builds) == 3
+
+
+def test_reingest_refreshes_the_sidecar(builds, offer_server):
+    pricing_store.load_metadata("us-east-1")
+    offer_server.bodies["/offers/us-east-1/index.json"] = offer_document("us-east-1", {"r7g.large": 0.107}, version="v2")
+    pricing_store.ingest_region("us-east-1")
+
+    metadata = pricing_store.load_metadata("us-east-1")
+    assert metadata["version"] == "v2" and metadata["InstanceType"] == ["r7g.large"]
+    assert metadata["PurchaseOption"] == [] and len(builds) == 2